@@ -0,0 +1,377 @@
+import os
+import sys
+import csv
+import time
+import queue
+import random
+import signal
+import argparse
+import threading
+from collections import defaultdict
+
+import pandas as pd
+
+from queryExecutor import QueryExecutor
+from timingStats import percentile
+
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+class LoadGenerator:
+    """
+    Reproduce bajo carga el conjunto de consultas generado por pathGenerator.py
+    (resultados_generator_*/queries.txt) contra un mdb-server en ejecución.
+
+    - Modo cerrado: N clientes que envían una consulta, esperan la respuesta y
+      descansan un tiempo de reflexión (exponencial con la media indicada).
+    - Modo abierto: llegadas de Poisson a una tasa objetivo (QPS), independientes de
+      las respuestas. La latencia se mide desde el instante de llegada programado,
+      así que incluye la espera cuando el servidor no da abasto.
+
+    Cada consulta se elige primero por AQ según los pesos de la mezcla y luego al
+    azar dentro de su AQ. El AQ de cada consulta se toma de queries_short.csv
+    (misma carpeta y mismo orden que queries.txt).
+    """
+
+    def __init__(self, queries_file, url="http://localhost:1234/query", mode="closed", clients=4,
+                 think_time_ms=0, qps=10, max_in_flight=64, duration=60, interval=5, mix=None,
+                 seed=None, query_timeout=40, output_folder="resultados_load"):
+        self.queries_file = queries_file
+        self.url = url
+        self.mode = mode
+        self.clients = max(1, clients)
+        self.think_time_ms = think_time_ms
+        self.qps = qps
+        self.max_in_flight = max(1, max_in_flight)
+        self.duration = duration
+        self.interval = interval
+        self.mix = mix or {}
+        self.random = random.Random(seed)
+        self.query_timeout = query_timeout
+        self.output_folder = output_folder
+        self.queries_by_aq = {}
+        self.records = []
+        self.dropped = 0
+        self._records_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.executor = None
+
+    def load_queries(self):
+        """Carga queries.txt y agrupa las consultas por AQ usando queries_short.csv si está disponible"""
+        with open(self.queries_file, 'r', encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+        aq_codes = None
+        csv_path = os.path.join(os.path.dirname(self.queries_file), "queries_short.csv")
+        if os.path.exists(csv_path):
+            with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+                rows = list(csv.DictReader(f))
+            if len(rows) == len(queries):
+                aq_codes = [row.get('AQ') or 'Desconocido' for row in rows]
+            else:
+                print(f"⚠️  {csv_path} no coincide con {self.queries_file}; no se aplicará la mezcla por AQ")
+
+        self.queries_by_aq = defaultdict(list)
+        for i, query in enumerate(queries):
+            self.queries_by_aq[aq_codes[i] if aq_codes else '*'].append(query)
+
+        unknown = [aq for aq in self.mix if aq not in self.queries_by_aq]
+        if unknown:
+            print(f"⚠️  AQ de la mezcla sin consultas en el archivo: {', '.join(unknown)}")
+
+        self.aq_codes = [aq for aq in self.queries_by_aq if self.mix.get(aq, 1) > 0]
+        self.aq_weights = [self.mix.get(aq, 1) for aq in self.aq_codes]
+        if queries and not self.aq_codes:
+            print(f"❌ Error: la mezcla deja en 0 el peso de todos los AQ de {self.queries_file} "
+                  f"({', '.join(self.queries_by_aq)}); al menos uno debe tener peso positivo")
+            sys.exit(1)
+        return len(queries)
+
+    def pick_query(self):
+        aq = self.random.choices(self.aq_codes, weights=self.aq_weights)[0]
+        return aq, self.random.choice(self.queries_by_aq[aq])
+
+    def _send(self, aq, query, scheduled):
+        """Ejecuta una consulta y guarda el registro; scheduled es el instante de llegada (perf_counter)"""
+        outcome = self.executor.execute(query)
+        completed = time.perf_counter()
+        with self._records_lock:
+            self.records.append({
+                'aq': aq,
+                'scheduled': scheduled - self.start_time,
+                'completed': completed - self.start_time,
+                'latency_ms': (completed - scheduled) * 1000,
+                'service_ms': outcome['latency_ms'],
+                'status': outcome['status']
+            })
+
+    def run_closed_loop(self, end_time):
+        def client(client_random):
+            while not self._stopped.is_set() and time.perf_counter() < end_time:
+                with self._records_lock:
+                    aq, query = self.pick_query()
+                self._send(aq, query, time.perf_counter())
+                if self.think_time_ms > 0:
+                    time.sleep(client_random.expovariate(1000 / self.think_time_ms))
+
+        threads = [threading.Thread(target=client, args=(random.Random(self.random.random()),), daemon=True)
+                   for _ in range(self.clients)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def run_open_loop(self, end_time):
+        arrivals = queue.Queue()
+
+        def worker():
+            while True:
+                item = arrivals.get()
+                if item is None:
+                    return
+                aq, query, scheduled = item
+                if self._stopped.is_set():
+                    with self._records_lock:
+                        self.dropped += 1
+                    continue
+                self._send(aq, query, scheduled)
+
+        def generator():
+            next_arrival = time.perf_counter()
+            while not self._stopped.is_set():
+                next_arrival += self.random.expovariate(self.qps)
+                if next_arrival >= end_time:
+                    break
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                aq, query = self.pick_query()
+                arrivals.put((aq, query, next_arrival))
+            # Lo que sigue en la cola al terminar la prueba se descarta
+            self._stopped.set()
+            for _ in workers:
+                arrivals.put(None)
+
+        workers = [threading.Thread(target=worker, daemon=True) for _ in range(self.max_in_flight)]
+        for thread in workers:
+            thread.start()
+        arrival_thread = threading.Thread(target=generator, daemon=True)
+        arrival_thread.start()
+        return [arrival_thread] + workers
+
+    def interval_rows(self, records, until):
+        """
+        Throughput y percentiles de latencia por ventana de `interval` segundos; la
+        última ventana puede ser más corta y su throughput se calcula sobre lo que dura
+        """
+        rows = []
+        window_start = 0.0
+        while window_start < until:
+            window_end = window_start + self.interval
+            window = [r for r in records if window_start <= r['completed'] < window_end]
+            ok = sorted(r['latency_ms'] for r in window if r['status'] == 200)
+            length = min(window_end, until) - window_start
+            row = {
+                'Inicio (s)': window_start,
+                'Completadas': len(window),
+                'Throughput (qps)': len(window) / length,
+                'Errores': sum(1 for r in window if r['status'] != 200)
+            }
+            for p in PERCENTILES:
+                row[f'p{p} (ms)'] = percentile(ok, p)
+            row['Máximo (ms)'] = ok[-1] if ok else float('nan')
+            rows.append(row)
+            window_start = window_end
+        return rows
+
+    def summary_rows(self, records, elapsed):
+        """Resumen global y por AQ"""
+        groups = [('Total', records)]
+        by_aq = defaultdict(list)
+        for record in records:
+            by_aq[record['aq']].append(record)
+        groups += sorted(by_aq.items())
+
+        rows = []
+        for name, group in groups:
+            ok = sorted(r['latency_ms'] for r in group if r['status'] == 200)
+            row = {
+                'AQ': name,
+                'Completadas': len(group),
+                'Throughput (qps)': len(group) / elapsed if elapsed > 0 else 0.0,
+                'Errores': sum(1 for r in group if r['status'] != 200),
+                'Media (ms)': sum(ok) / len(ok) if ok else float('nan')
+            }
+            for p in PERCENTILES:
+                row[f'p{p} (ms)'] = percentile(ok, p)
+            rows.append(row)
+        return rows
+
+    def print_interval(self, row):
+        print(f"[{row['Inicio (s)']:6.0f}s] {row['Throughput (qps)']:8.1f} qps | "
+              f"p50 {row['p50 (ms)']:8.2f} ms | p95 {row['p95 (ms)']:8.2f} ms | "
+              f"p99 {row['p99 (ms)']:8.2f} ms | errores {row['Errores']}")
+
+    def save_report(self, interval_rows, summary_rows):
+        if not os.path.exists(self.output_folder):
+            os.makedirs(self.output_folder)
+        report_path = os.path.join(self.output_folder, f"load_{self.mode}.xlsx")
+        with pd.ExcelWriter(report_path, engine='xlsxwriter') as writer:
+            pd.DataFrame(summary_rows).to_excel(writer, sheet_name='Resumen', index=False)
+            pd.DataFrame(interval_rows).to_excel(writer, sheet_name='Intervalos', index=False)
+            pd.DataFrame(self.records).to_excel(writer, sheet_name='Consultas', index=False)
+        return report_path
+
+    def handle_interrupt(self, sig, frame):
+        print("\nInterrumpiendo la prueba de carga...")
+        self._stopped.set()
+
+    def run(self):
+        total = self.load_queries()
+        if total == 0:
+            print(f"❌ Error: {self.queries_file} no contiene consultas")
+            return None
+
+        print(f"📄 {total} consultas en {len(self.queries_by_aq)} grupos desde {self.queries_file}")
+        if self.mode == "closed":
+            print(f"🔁 Modo cerrado: {self.clients} clientes, tiempo de reflexión medio {self.think_time_ms} ms")
+            pool_size = self.clients
+        else:
+            print(f"📈 Modo abierto: llegadas de Poisson a {self.qps} qps (máx. {self.max_in_flight} en vuelo)")
+            pool_size = self.max_in_flight
+        print(f"⏱️  Duración: {self.duration} s contra {self.url}\n")
+
+        signal.signal(signal.SIGINT, self.handle_interrupt)
+        # Los registros de la prueba quedan en self.records: el ejecutor no conserva sus resultados
+        self.executor = QueryExecutor(url=self.url, concurrency=pool_size, output_path=None,
+                                      query_timeout=self.query_timeout, keep_outcomes=False)
+        self.start_time = time.perf_counter()
+        end_time = self.start_time + self.duration
+        try:
+            if self.mode == "closed":
+                threads = self.run_closed_loop(end_time)
+            else:
+                threads = self.run_open_loop(end_time)
+
+            reported = 0
+            next_report = self.start_time + self.interval
+            while not self._stopped.is_set() and time.perf_counter() < end_time:
+                time.sleep(min(0.2, max(0.0, next_report - time.perf_counter())))
+                if time.perf_counter() >= next_report:
+                    with self._records_lock:
+                        records = list(self.records)
+                    for row in self.interval_rows(records, next_report - self.start_time)[reported:]:
+                        self.print_interval(row)
+                        reported += 1
+                    next_report += self.interval
+
+            self._stopped.set()
+            # Esperar a las consultas en vuelo (acotado por el plazo por consulta)
+            for thread in threads:
+                thread.join(timeout=self.query_timeout)
+        finally:
+            self.executor.close()
+
+        elapsed = min(time.perf_counter(), end_time) - self.start_time
+        interval_rows = self.interval_rows(self.records, elapsed)
+        for row in interval_rows[reported:]:
+            self.print_interval(row)
+        summary_rows = self.summary_rows(self.records, elapsed)
+        total_row = summary_rows[0]
+
+        print(f"\n✅ {total_row['Completadas']} consultas en {elapsed:.1f} s "
+              f"({total_row['Throughput (qps)']:.1f} qps), {total_row['Errores']} errores")
+        print("   " + " | ".join(f"p{p} {total_row[f'p{p} (ms)']:.2f} ms" for p in PERCENTILES))
+        if self.dropped:
+            print(f"⚠️  {self.dropped} llegadas quedaron en cola al terminar y se descartaron (el servidor no daba abasto)")
+        report_path = self.save_report(interval_rows, summary_rows)
+        print(f"📊 Reporte guardado en {report_path}")
+        return summary_rows
+
+
+def parse_mix(value):
+    """Convierte 'Q1=2,Q5=0.5' en {'Q1': 2.0, 'Q5': 0.5}"""
+    mix = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        try:
+            aq, weight = item.split('=')
+            mix[aq.strip()] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Peso inválido '{item}'. Formato esperado: Q1=2,Q5=0.5")
+        if mix[aq.strip()] < 0:
+            raise argparse.ArgumentTypeError(f"El peso de {aq.strip()} no puede ser negativo")
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Generador de carga en lazo abierto o cerrado a partir de queries.txt',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+
+  # 8 clientes en lazo cerrado durante 2 minutos
+  python loadGenerator.py --use-rankings 01 --mode closed --clients 8 --duration 120
+
+  # Lazo abierto a 50 qps con más peso para Q1 y sin Q7
+  python loadGenerator.py --use-rankings 01 --mode open --qps 50 --mix Q1=3,Q7=0
+        """
+    )
+
+    parser.add_argument('--queries', type=str, default=None,
+                        help='Archivo de consultas, una por línea (default: resultados_generator_<SCALE>/queries.txt)')
+    parser.add_argument('--use-rankings', type=str, default='01', metavar='SCALE',
+                        help='Scale factor de la carpeta de pathGenerator.py a usar (default: 01)')
+    parser.add_argument('--url', type=str, default='http://localhost:1234/query',
+                        help='Endpoint de consultas del mdb-server (default: http://localhost:1234/query)')
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed',
+                        help='closed: N clientes con tiempo de reflexión; open: llegadas de Poisson a --qps (default: closed)')
+    parser.add_argument('--clients', type=int, default=4,
+                        help='Clientes concurrentes en modo cerrado (default: 4)')
+    parser.add_argument('--think-time', type=float, default=0, metavar='MS',
+                        help='Tiempo de reflexión medio entre consultas de un cliente en modo cerrado (default: 0)')
+    parser.add_argument('--qps', type=float, default=10,
+                        help='Tasa de llegadas objetivo en modo abierto (default: 10)')
+    parser.add_argument('--max-in-flight', type=int, default=64,
+                        help='Máximo de consultas en vuelo en modo abierto (default: 64)')
+    parser.add_argument('--duration', type=float, default=60, metavar='SEG',
+                        help='Duración de la prueba (default: 60)')
+    parser.add_argument('--interval', type=float, default=5, metavar='SEG',
+                        help='Ventana para el throughput y los percentiles a lo largo del tiempo (default: 5)')
+    parser.add_argument('--mix', type=parse_mix, default=None,
+                        help='Pesos por AQ, p. ej. Q1=2,Q5=0.5; los AQ no listados pesan 1 y con peso 0 se excluyen')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Semilla para la elección de consultas y las llegadas')
+    parser.add_argument('--query-timeout', type=float, default=40, metavar='SEG',
+                        help='Plazo del cliente por consulta (default: 40)')
+    parser.add_argument('--output-folder', type=str, default='resultados_load',
+                        help='Carpeta del reporte (default: resultados_load)')
+
+    args = parser.parse_args()
+
+    queries_file = args.queries or os.path.join(f"resultados_generator_{args.use_rankings}", "queries.txt")
+    if not os.path.exists(queries_file):
+        print(f"❌ Error: No se encontró {queries_file}. Ejecute primero pathGenerator.py o use --queries")
+        sys.exit(1)
+    if args.clients < 1 or args.qps <= 0 or args.duration <= 0 or args.interval <= 0:
+        print("❌ Error: --clients, --qps, --duration e --interval deben ser mayores que 0")
+        sys.exit(1)
+
+    generator = LoadGenerator(
+        queries_file=queries_file,
+        url=args.url,
+        mode=args.mode,
+        clients=args.clients,
+        think_time_ms=args.think_time,
+        qps=args.qps,
+        max_in_flight=args.max_in_flight,
+        duration=args.duration,
+        interval=args.interval,
+        mix=args.mix,
+        seed=args.seed,
+        query_timeout=args.query_timeout,
+        output_folder=args.output_folder
+    )
+    generator.run()
@@ -0,0 +1,180 @@
+import os
+import re
+from collections import defaultdict, deque
+
+
+METRIC_PATTERNS = [
+    ('results', "Results:", re.compile(r"Results:\s*(\d+)"), int),
+    ('parser_ms', "Parser duration:", re.compile(r"Parser duration:\s*([\d.]+)\s*ms"), float),
+    ('optimizer_ms', "Optimizer duration:", re.compile(r"Optimizer duration:\s*([\d.]+)\s*ms"), float),
+    ('execution_ms', "Execution duration:", re.compile(r"Execution duration:\s*([\d.]+)\s*ms"), float),
+]
+
+METRIC_KEYS = [key for key, _, _, _ in METRIC_PATTERNS]
+
+# Línea que serverManager escribe en el log antes de reiniciar un servidor caído
+SERVER_RESTART_MARKER = "=== mdb-server reiniciado ==="
+
+
+def parse_metric_line(line):
+    """Devuelve (clave, valor) si la línea es una métrica del servidor, o None"""
+    for key, prefix, pattern, cast in METRIC_PATTERNS:
+        if line.startswith(prefix):
+            match = pattern.search(line)
+            if match:
+                return key, cast(match.group(1))
+            return None
+    return None
+
+
+def iter_log_lines(path, start=0, end=None):
+    """
+    Líneas del log entre los offsets start y end (en bytes, end=None hasta el final).
+    Se leen de a una desde el archivo y se decodifican por separado (UTF-8 con
+    reemplazo), así que la memoria usada no depende del tamaño del log.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position = start
+        for raw_line in f:
+            if end is not None:
+                if position >= end:
+                    return
+                if position + len(raw_line) > end:
+                    raw_line = raw_line[:end - position]
+            position += len(raw_line)
+            yield raw_line.decode('utf-8', errors='replace')
+
+
+def split_log(path, start=0, end=None, chunks=1):
+    """
+    Divide el tramo [start, end) del log en hasta `chunks` tramos de tamaño similar
+    que empiezan en una línea "Query received:", para procesarlos por separado.
+    Devuelve una lista de pares (inicio, fin); el último fin es `end`.
+    """
+    limit = end if end is not None else os.path.getsize(path)
+    step = (limit - start) // max(1, chunks)
+    bounds = [start]
+    with open(path, 'rb') as f:
+        for i in range(1, chunks):
+            f.seek(max(start + i * step, bounds[-1]))
+            # Completar la línea en curso y avanzar hasta el inicio de la siguiente consulta
+            f.readline()
+            position = f.tell()
+            while position < limit:
+                line = f.readline()
+                if not line or line.strip() == b"Query received:":
+                    break
+                position += len(line)
+            if bounds[-1] < position < limit:
+                bounds.append(position)
+    return list(zip(bounds, bounds[1:] + [end]))
+
+
+def is_abandoned(entry):
+    """Consulta que el cliente dejó de esperar (timeout o error) pero que el servidor pudo seguir ejecutando"""
+    outcome = entry['outcome']
+    return outcome is not None and outcome.get('status') not in (None, 200)
+
+
+class LogEntryParser:
+    """
+    Estado del recorrido de un log de mdb-server (ver iter_log_entries): las consultas
+    abiertas y los resultados del cliente aún sin atribuir. feed puede invocarse
+    varias veces con tramos consecutivos del log, así que un log que sigue creciendo
+    se procesa solo una vez, a medida que se escribe.
+    """
+
+    def __init__(self, outcomes=None, max_in_flight=1):
+        self.max_in_flight = max_in_flight
+        self.pending = defaultdict(deque)
+        self.open_entries = []
+        self.received = 0
+        self.expecting_query = False
+        self.add_outcomes(outcomes or [])
+
+    def add_outcomes(self, outcomes):
+        """Agrega resultados del cliente; deben ser posteriores (por seq) a los ya agregados"""
+        for outcome in sorted(outcomes, key=lambda o: o['seq']):
+            self.pending[outcome['query']].append(outcome)
+
+    def _close_abandoned(self, entries):
+        for entry in entries:
+            if is_abandoned(entry):
+                entry['complete'] = False
+                yield entry
+
+    def feed(self, lines):
+        """Procesa las líneas dadas y genera las consultas que se completaron en ellas"""
+        for raw_line in lines:
+            line = raw_line.strip()
+
+            if self.expecting_query:
+                self.expecting_query = False
+                if line.startswith('MATCH'):
+                    outcome = self.pending[line].popleft() if self.pending.get(line) else None
+                    rank = outcome['done'] if outcome and outcome.get('done') is not None else self.received
+                    entry = {'query': line, 'outcome': outcome, 'rank': rank}
+                    if is_abandoned(entry):
+                        entry['rank'] = float('inf')
+                    self.open_entries.append(entry)
+                    self.received += 1
+                    live = [e for e in self.open_entries if not is_abandoned(e)]
+                    if len(live) > max(1, self.max_in_flight):
+                        self.open_entries.remove(live[0])
+                continue
+
+            if line == "Query received:":
+                self.expecting_query = True
+                continue
+
+            if line == SERVER_RESTART_MARKER:
+                yield from self._close_abandoned(self.open_entries)
+                self.open_entries = []
+                continue
+
+            metric = parse_metric_line(line)
+            if metric is None:
+                continue
+
+            key, value = metric
+            candidates = [entry for entry in self.open_entries if key not in entry]
+            if not candidates:
+                continue
+
+            entry = min(candidates, key=lambda e: e['rank'])
+            entry[key] = value
+
+            if all(k in entry for k in METRIC_KEYS):
+                self.open_entries.remove(entry)
+                entry['complete'] = True
+                yield entry
+
+    def close(self):
+        """Genera las consultas abandonadas que quedaron abiertas al final del log"""
+        yield from self._close_abandoned(self.open_entries)
+
+
+def iter_log_entries(lines, outcomes=None, max_in_flight=1):
+    """
+    Recorre las líneas del log de mdb-server y genera una entrada por cada consulta
+    completa (Results + Parser + Optimizer + Execution). lines puede ser cualquier
+    iterable (por ejemplo iter_log_lines): solo se mantienen en memoria las consultas
+    abiertas, nunca el log.
+
+    Con consultas concurrentes las líneas de varias consultas pueden entrelazarse. Cada
+    línea de métrica se atribuye a la consulta abierta que aún no tiene esa métrica y
+    que terminó primero en el cliente (campo 'done' de los resultados del ejecutor).
+    Sin resultados del cliente se usa el orden de llegada (FIFO). Nunca se mantienen
+    abiertas más de max_in_flight consultas: si el servidor recibe una nueva, se
+    descarta la más antigua incompleta. Tras un reinicio del servidor se descartan
+    todas las consultas abiertas.
+
+    Las consultas abandonadas por el cliente (timeout o error) siguen abiertas sin
+    contar para max_in_flight y con la menor prioridad, ya que el servidor puede
+    terminarlas más tarde. Si nunca se completan se generan igualmente con
+    complete=False y las métricas parciales que alcanzaron a registrarse.
+    """
+    parser = LogEntryParser(outcomes, max_in_flight=max_in_flight)
+    yield from parser.feed(lines)
+    yield from parser.close()
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from resourceSampler import RESOURCE_KEYS
+from timingStats import relative_ci
+
+
+# Mediciones del ejecutor (cliente, modo frío/caliente y recursos del proceso) que se guardan junto a las del log
+CLIENT_KEYS = ['latency_ms', 'ttfb_ms', 'bytes', 'paths', 'path_lengths', 'state'] + RESOURCE_KEYS
+
+
+def fingerprint_path(path):
+    """
+    Huella de una base de datos (directorio) o de un archivo de edges: hash de la
+    ruta relativa, el tamaño y la fecha de modificación de cada archivo. No se lee
+    el contenido, así que es inmediata incluso para los factores de escala grandes.
+    Devuelve None si la ruta no existe o el directorio está vacío.
+    """
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        found = False
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full_path = os.path.join(root, name)
+                stat = os.stat(full_path)
+                digest.update(f"{os.path.relpath(full_path, path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+                found = True
+        if not found:
+            return None
+    elif os.path.exists(path):
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+    else:
+        return None
+    return digest.hexdigest()
+
+
+def normalize_query(query):
+    return ' '.join(query.split())
+
+
+def server_times(measurements):
+    """Tiempos del servidor (parser + optimizer + ejecución) de las mediciones completas y exitosas"""
+    return [m['parser_ms'] + m['optimizer_ms'] + m['execution_ms'] for m in measurements
+            if m['status'] == 200 and m['complete']
+            and all(m.get(key) is not None for key in ('parser_ms', 'optimizer_ms', 'execution_ms'))]
+
+
+class MeasurementCache:
+    """
+    Caché persistente de mediciones por consulta real, direccionada por contenido:
+    la clave es el hash de la huella de la base de datos, los flags del servidor y
+    la consulta normalizada. Cada base de datos tiene su propio archivo JSON Lines en
+    cache_dir; una entrada posterior para la misma clave reemplaza a la anterior.
+    """
+
+    def __init__(self, cache_dir="measurement_cache", fingerprint=None, flags=""):
+        self.cache_dir = cache_dir
+        self.fingerprint = fingerprint
+        self.flags = flags
+        self.path = os.path.join(cache_dir, f"{fingerprint[:16]}.jsonl") if fingerprint else None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def key(self, query):
+        text = f"{self.fingerprint}\n{self.flags}\n{normalize_query(query)}"
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def load(self):
+        self._entries = {}
+        if not self.path or not os.path.exists(self.path):
+            return self
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._entries[record['key']] = record
+        return self
+
+    def get(self, query, repetitions=1, keep_all=False, ci_target=None, max_reps=None):
+        """
+        Últimas `repetitions` mediciones guardadas de la consulta, o None si no alcanzan.
+        Con keep_all se devuelven todas (repetición adaptativa). Con ci_target solo se
+        devuelven si ya cumplen lo que exigiría la repetición adaptativa: el intervalo
+        de confianza relativo de los tiempos del servidor es a lo sumo ci_target, se
+        alcanzó max_reps o alguna medición falló (esas consultas no se repiten)
+        """
+        record = self._entries.get(self.key(query))
+        if not record or len(record['measurements']) < repetitions:
+            return None
+        measurements = record['measurements']
+        if ci_target is not None:
+            converged = (any(m['status'] != 200 for m in measurements)
+                         or (max_reps is not None and len(measurements) >= max_reps)
+                         or relative_ci(server_times(measurements)) <= ci_target)
+            if not converged:
+                return None
+        if keep_all or ci_target is not None:
+            return measurements
+        return measurements[-repetitions:]
+
+    def put_many(self, measurements_by_query):
+        """Guarda las mediciones nuevas de varias consultas con una sola escritura"""
+        if not self.path or not measurements_by_query:
+            return 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            for query, measurements in measurements_by_query.items():
+                record = {
+                    'key': self.key(query),
+                    'query': normalize_query(query),
+                    'flags': self.flags,
+                    'stored': time.time(),
+                    'measurements': measurements
+                }
+                self._entries[record['key']] = record
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return len(measurements_by_query)
+
+    def __len__(self):
+        return len(self._entries)
+
@@ -0,0 +1,252 @@
+import os
+import json
+import shutil
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from logParser import METRIC_KEYS, LogEntryParser, iter_log_entries, iter_log_lines, split_log
+from measurementCache import CLIENT_KEYS
+from resourceSampler import RESOURCE_KEYS
+
+
+# Campos de cada registro: una ejecución de una consulta real
+IDENTITY_FIELDS = ['query_id', 'query', 'template', 'aq', 'anchor', 'phase', 'repetition', 'state']
+SERVER_FIELDS = ['parser_ms', 'optimizer_ms', 'execution_ms', 'server_ms', 'results']
+CLIENT_FIELDS = ['latency_ms', 'ttfb_ms', 'bytes', 'paths', 'path_lengths'] + RESOURCE_KEYS
+RECORD_FIELDS = IDENTITY_FIELDS + ['status', 'complete'] + SERVER_FIELDS + CLIENT_FIELDS + ['source']
+
+UNKNOWN = "Desconocido"
+
+# Tamaño mínimo de cada tramo de log que se importa en un proceso aparte
+MIN_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def build_record(query, outcome=None, entry=None, info=None, source='run', query_id=None):
+    """
+    Registro de una ejecución a partir del resultado del cliente (outcome), de la
+    entrada del log del servidor atribuida a ella (entry) y de los datos de la
+    consulta en el catálogo (info, con su identificador query_id). Cualquiera de las
+    dos mediciones puede faltar: una consulta que el servidor nunca registró, o un
+    log importado sin resultados del cliente.
+    """
+    info = info or {}
+    outcome = outcome or {}
+    record = dict.fromkeys(RECORD_FIELDS)
+    record.update({
+        'query_id': query_id,
+        'query': query,
+        'template': info.get('original', UNKNOWN),
+        'aq': info.get('abstract_pattern', UNKNOWN),
+        'anchor': info.get('node_id', UNKNOWN),
+        'phase': outcome.get('phase', 'measure'),
+        'repetition': outcome.get('repetition'),
+        'state': outcome.get('state'),
+        'complete': bool(entry and entry['complete']),
+        'source': source
+    })
+    if outcome:
+        record['status'] = outcome['status']
+    elif entry and entry['complete']:
+        record['status'] = 200
+    for key in CLIENT_FIELDS:
+        record[key] = outcome.get(key)
+    if entry:
+        for key in METRIC_KEYS:
+            record[key] = entry.get(key)
+    # Las abandonadas por el cliente (timeout o error) solo conservan las métricas parciales
+    if record['complete'] and record['status'] == 200:
+        record['server_ms'] = record['parser_ms'] + record['optimizer_ms'] + record['execution_ms']
+    return record
+
+
+def records_from_log(log_file, segments, catalog, max_in_flight=1):
+    """
+    Une el log de un servidor con los resultados del cliente de cada segmento y
+    genera un registro por ejecución. segments es una lista de (inicio, fin,
+    resultados) como la de log_ranges; sin resultados (None) el log se importa solo
+    con los tiempos del servidor (source='log'). Las ejecuciones del cliente que no
+    dejaron rastro en el log (timeouts, errores) también generan su registro, sin
+    tiempos del servidor.
+
+    El identificador de cada registro es el del resultado del cliente; el log del
+    servidor solo trae el texto, así que sin resultados se busca por texto en el
+    catálogo (QueryCatalog) y queda en None si la consulta no es del pool.
+    """
+    for start, end, outcomes in segments:
+        source = 'log' if outcomes is None else 'run'
+        matched = set()
+        for entry in iter_log_entries(iter_log_lines(log_file, start, end), outcomes=outcomes,
+                                      max_in_flight=max_in_flight):
+            if entry['outcome']:
+                matched.add(id(entry['outcome']))
+            yield catalog_record(catalog, entry['query'], entry['outcome'], entry, source)
+        for outcome in outcomes or []:
+            if id(outcome) not in matched:
+                yield catalog_record(catalog, outcome['query'], outcome, None, source)
+
+
+def catalog_record(catalog, query, outcome, entry, source):
+    """Registro con el identificador del resultado del cliente o, si no lo trae, el del catálogo"""
+    query_id = outcome.get('query_id') if outcome else None
+    if query_id is None:
+        query_id = catalog.lookup(query)
+    return build_record(query, outcome, entry, catalog.get(query_id), source, query_id)
+
+
+class LogTail:
+    """
+    Sigue el log de un servidor mientras la ejecución lo sigue escribiendo: cada
+    llamada a read procesa solo los bytes agregados desde la anterior (hasta la
+    última línea completa), conservando las consultas abiertas entre llamadas, y
+    genera los registros de las ejecuciones que se completaron en ellos. Se usa entre
+    las pasadas de la repetición adaptativa, para no volver a leer el log entero.
+
+    earlier son tramos anteriores del log (inicio, fin, resultados), como en
+    records_from_log, por ejemplo los de segmentos previos del journal al reanudar:
+    la primera llamada a read genera también sus registros.
+    """
+
+    def __init__(self, log_file, start, catalog, max_in_flight=1, earlier=None):
+        self.log_file = log_file
+        self.offset = start
+        self.catalog = catalog
+        self.parser = LogEntryParser(max_in_flight=max_in_flight)
+        self.earlier = earlier or []
+        self._outcomes = 0
+
+    def read(self, outcomes):
+        """
+        outcomes son todos los resultados del cliente hasta ahora, en el orden en que
+        se registraron; solo se agregan los nuevos
+        """
+        self.parser.add_outcomes(outcomes[self._outcomes:])
+        self._outcomes = len(outcomes)
+        if not os.path.exists(self.log_file):
+            return
+        if self.earlier:
+            earlier, self.earlier = self.earlier, []
+            yield from records_from_log(self.log_file, earlier, self.catalog, self.parser.max_in_flight)
+        for entry in self.parser.feed(self._appended_lines()):
+            yield catalog_record(self.catalog, entry['query'], entry['outcome'], entry, 'run')
+
+    def _appended_lines(self):
+        with open(self.log_file, 'rb') as f:
+            f.seek(self.offset)
+            for raw_line in f:
+                if not raw_line.endswith(b'\n'):
+                    # Línea a medio escribir: se procesa en la próxima lectura
+                    return
+                self.offset += len(raw_line)
+                yield raw_line.decode('utf-8', errors='replace')
+
+
+# Catálogo de consultas de cada proceso del pool de importación (se envía una sola vez al iniciarlo)
+_worker_catalog = None
+
+
+def _init_import_worker(catalog):
+    global _worker_catalog
+    _worker_catalog = catalog
+
+
+def _import_range(task):
+    """Importa un tramo de log a su propio archivo parcial; devuelve cuántos registros escribió"""
+    log_file, start, end, outcomes, max_in_flight, part_path = task
+    records = records_from_log(log_file, [(start, end, outcomes)], _worker_catalog, max_in_flight=max_in_flight)
+    return MeasurementLog(part_path).write(records)
+
+
+def record_from_measurement(query, measurement, info=None, query_id=None):
+    """Registro de una medición recuperada de la caché"""
+    outcome = {'status': measurement['status'], 'phase': 'measure',
+               **{key: measurement.get(key) for key in CLIENT_KEYS}}
+    entry = {'complete': measurement['complete'], **{key: measurement[key] for key in METRIC_KEYS if key in measurement}}
+    return build_record(query, outcome, entry, info, source='cache', query_id=query_id)
+
+
+def measurement_from_record(record):
+    """Medición cacheable de un registro de esta corrida"""
+    measurement = {'status': record['status'], 'complete': record['complete']}
+    for key in METRIC_KEYS + CLIENT_KEYS:
+        if record.get(key) is not None:
+            measurement[key] = record[key]
+    return measurement
+
+
+class MeasurementLog:
+    """
+    Registro estructurado de mediciones (JSON Lines, un objeto por ejecución con los
+    campos de RECORD_FIELDS). Es la entrada de todas las etapas de análisis: se
+    escribe al terminar la ejecución del pool, o al importar un log de mdb-server
+    existente, y se lee en streaming.
+    """
+
+    def __init__(self, path="measurements.jsonl"):
+        self.path = path
+
+    def write(self, records):
+        """Reemplaza el registro con los registros dados; devuelve cuántos se escribieron"""
+        count = 0
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+        return count
+
+    def write_from_logs(self, sources, catalog, max_in_flight=1, workers=1, extra=()):
+        """
+        Reemplaza el registro con los registros de varios logs y luego los de `extra`
+        (por ejemplo, los de la caché). sources es una lista de (log, segmentos) como
+        en records_from_log.
+
+        Con workers > 1 los tramos se importan en un pool de procesos, cada uno a un
+        archivo parcial, y los parciales se concatenan en orden. Los logs importados
+        sin resultados del cliente y sin concurrencia (max_in_flight=1) se dividen
+        además en bloques en los límites "Query received:", así que un único log
+        grande también se reparte entre los procesos. Los segmentos con resultados
+        del cliente, o con consultas entrelazadas, se importan enteros para no
+        romper la atribución.
+        """
+        tasks = []
+        for log_file, segments in sources:
+            for start, end, outcomes in segments:
+                ranges = [(start, end)]
+                if workers > 1 and outcomes is None and max_in_flight <= 1:
+                    size = (end if end is not None else os.path.getsize(log_file)) - start
+                    chunks = max(1, min(4 * workers, size // MIN_CHUNK_BYTES))
+                    ranges = split_log(log_file, start, end, chunks)
+                tasks.extend((log_file, chunk_start, chunk_end, outcomes, max_in_flight)
+                             for chunk_start, chunk_end in ranges)
+
+        if workers <= 1 or len(tasks) <= 1:
+            records = (record for log_file, start, end, outcomes, in_flight in tasks
+                       for record in records_from_log(log_file, [(start, end, outcomes)], catalog, in_flight))
+            return self.write(itertools.chain(records, extra))
+
+        parts = [f"{self.path}.part{i}" for i in range(len(tasks))]
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_import_worker,
+                                     initargs=(catalog,)) as pool:
+                count = sum(pool.map(_import_range, [task + (part,) for task, part in zip(tasks, parts)]))
+            with open(self.path, 'wb') as output:
+                for part in parts:
+                    with open(part, 'rb') as f:
+                        shutil.copyfileobj(f, output)
+            with open(self.path, 'a', encoding='utf-8') as output:
+                for record in extra:
+                    output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    count += 1
+        finally:
+            for part in parts:
+                if os.path.exists(part):
+                    os.remove(part)
+        return count
+
+    def __iter__(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Última línea incompleta de una escritura interrumpida
+                    continue
@@ -2,26 +2,97 @@ import os
 import sys
 import json
 import time
+import hashlib
 import signal
 import argparse
-import subprocess
 import statistics
 import re
 import random
+import threading
+import itertools
 from collections import defaultdict
 import pandas as pd
 import xlsxwriter
+from queryExecutor import QueryExecutor, STREAM_COLUMNS, stream_columns, outcome_key
+from serverManager import MdbServer, PROBE_QUERY
+from runJournal import RunJournal, FINAL_STATUSES
+from timingStats import (relative_ci, percentile, LatencyHistogram, PERCENTILE_COLUMNS, percentile_columns,
+                         STATE_COLUMNS, state_columns, PHASES, PHASE_COLUMNS, PHASE_SHARE_COLUMNS, phase_columns)
+from resourceSampler import RESOURCE_COLUMNS, resource_columns, proc_available
+from querySchedule import QueryOrder, new_seed
+from runWorkspace import prepare_workspace
+from measurementCache import MeasurementCache, fingerprint_path
+from queryCatalog import QueryCatalog
+from measurementLog import (MeasurementLog, LogTail, record_from_measurement,
+                            measurement_from_record)
+from resultStore import ResultStore, ExcelExport, read_ranking, ranking_exists
 
 class PathBenchmark: 
     
     def __init__(self, patterns_file=None, abstract_patterns_file=None, nodes_per_label=3,
                     selection_mode="max", query_selection_mode=None, queries_per_pattern=3,
                     selective_queries=None, use_existing_results=False, result_file="result.txt",
-                    nodes_per_label_explicit=False, use_rankings=None, calculate_new=True):
+                    nodes_per_label_explicit=False, use_rankings=None, calculate_new=True, concurrency=1,
+                    num_servers=1, base_port=1234, startup_timeout=1800, warmup=0, repetitions=1,
+                    query_timeout=40, resume=False, use_cache=True, cache_dir="measurement_cache",
+                    adaptive=False, ci_target=0.05, max_reps=30, sweep_max=None, sweep_aq=None, engine="mdb",
+                    sample_interval_ms=0, measure_mode="mixed", cold_group="template", evict_page_cache=False,
+                    schedule_order="file", schedule_seed=None, interactive=True, parse_workers=1,
+                    export_xlsx=False):
         self.scale_factors = ["01", "03", "1", "3"]
         self.selected_scale = "01"
-        self.server_process = None
-        self.query_process = None
+        self.servers = []
+        self.startup_timeout = startup_timeout
+        self.warmup = max(0, warmup)
+        self.repetitions = max(1, repetitions)
+        # En modo adaptativo `repetitions` es el mínimo de repeticiones (al menos 3 para estimar el IC)
+        self.adaptive = adaptive
+        self.ci_target = ci_target
+        self.max_reps = max_reps
+        if self.adaptive:
+            self.repetitions = max(3, self.repetitions)
+            self.max_reps = max(self.max_reps, self.repetitions)
+        self.sweep_max = sweep_max
+        self.sweep_aq = sweep_aq
+        # "mdb" (mdb-server compilado) o "reference" (referenceEngine.py sobre edges.txt)
+        self.engine = engine
+        # Muestreo de recursos del servidor por consulta desde /proc (0 lo desactiva)
+        self.sample_interval_ms = sample_interval_ms
+        # Modo de medición: "mixed" (estado que deje el orden del pool), "cold", "warm" o "both"
+        self.measure_mode = measure_mode
+        self.measure_states = {'mixed': [], 'cold': ['cold'], 'warm': ['warm'], 'both': ['cold', 'warm']}[measure_mode]
+        self.cold_group = cold_group
+        self.evict_page_cache = evict_page_cache
+        # Orden de las consultas en cada pasada (file, shuffle, interleave, latin) y su semilla
+        self.schedule_order = schedule_order
+        self.schedule_seed = schedule_seed
+        self.query_order = None
+        # Sin interacción (ejecuciones desatendidas) no se espera Enter antes de salir
+        self.interactive = interactive
+        # Procesos para importar los logs del servidor al registro de mediciones
+        self.parse_workers = max(1, parse_workers)
+        # Los resultados se guardan en Parquet; los xlsx solo se generan a pedido (o sin pyarrow)
+        self.export_xlsx = export_xlsx or not ResultStore.available
+        # Por AQ: aceleración del throughput entre 1 y sweep_max clientes
+        self.sweep_results = {}
+        self.query_timeout = query_timeout
+        self.query_executors = []
+        self.resume = resume
+        self.journal = RunJournal()
+        # Por log: lista de (inicio, fin, resultados del cliente) de cada segmento de ejecución
+        self.log_segments = {}
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
+        self.cache = None
+        self.cached_records = []
+        # Registro estructurado de mediciones que leen todas las etapas de análisis
+        self.measurement_log = MeasurementLog("measurements.jsonl")
+        # Consultas reales del pool con su identificador (query_info.json)
+        self.query_catalog = QueryCatalog("query_info.json")
+        self.concurrency = max(1, concurrency)
+        self.num_servers = max(1, num_servers)
+        self.base_port = base_port
+        self.server_logs = self.get_server_logs()
         self.mappings_file = "nodos.txt"
         self.db_path = os.path.join("MillenniumDB", "data", "db", self.selected_scale)
         
@@ -72,7 +143,9 @@ class PathBenchmark:
             self.query_selection_modes = ["max"]
         
         self.use_existing_results = use_existing_results
-        self.result_file = result_file
+        # Uno o varios archivos de resultados (logs de mdb-server o registros .jsonl) para --use-existing
+        self.result_files = [result_file] if isinstance(result_file, str) else list(result_file)
+        self.result_file = self.result_files[0]
         
         self.calculate_new = calculate_new
         self.use_rankings = use_rankings
@@ -95,7 +168,7 @@ class PathBenchmark:
         
         print(f"Configuración de resultados:")
         if self.use_existing_results:
-            print(f"  - Usando archivo existente: {self.result_file}")
+            print(f"  - Usando archivo existente: {', '.join(self.result_files)}")
         else:
             print(f"  - Se generará nuevo archivo: result.txt")
         
@@ -112,6 +185,8 @@ class PathBenchmark:
         self.abstract_patterns, self.query_distribution = self.load_abstract_patterns(abstract_patterns_file)
         self.node_mappings = {}
         self.query_to_pattern = {}
+        # AQ de cada plantilla según su posición en el archivo (una plantilla repetida puede estar en dos AQ)
+        self.template_patterns = []
         self.pattern_to_q_number = self.generate_q_number_mapping()
 
 
@@ -124,15 +199,15 @@ class PathBenchmark:
             print(f"❌ Carpeta no encontrada: {ranking_base_path}")
             return False
         
+        # Cada ranking puede estar en Parquet o en xlsx
         required_files = [
-            "abstract_queries_rank.xlsx",
-            "template_queries_rank.xlsx"
+            "abstract_queries_rank",
+            "template_queries_rank"
         ]
         
         missing_files = []
         for file in required_files:
-            file_path = os.path.join(ranking_base_path, file)
-            if not os.path.exists(file_path):
+            if not ranking_exists(ranking_base_path, file):
                 missing_files.append(file)
             else:
                 print(f"✅ Encontrado: {file}")
@@ -214,29 +289,29 @@ class PathBenchmark:
         }
 
     def read_ranking_abstract_from_rankings(self):
-        ranking_path = os.path.join("rankings", self.rankings_scale, "abstract_queries_rank.xlsx")
+        ranking_path = os.path.join("rankings", self.rankings_scale)
         
-        if not os.path.exists(ranking_path):
-            print(f"❌ Error: No se encontró {ranking_path}")
+        if not ranking_exists(ranking_path, "abstract_queries_rank"):
+            print(f"❌ Error: No se encontró abstract_queries_rank en {ranking_path}")
             return []
         
         try:
-            df = pd.read_excel(ranking_path, sheet_name='Ranking')
+            df = read_ranking(ranking_path, "abstract_queries_rank", 'Ranking')
             return df.to_dict('records')
         except Exception as e:
             print(f"❌ Error leyendo {ranking_path}: {e}")
             return []
 
     def read_ranking_templates_from_rankings(self, q_number):
-        ranking_path = os.path.join("rankings", self.rankings_scale, "template_queries_rank.xlsx")
+        ranking_path = os.path.join("rankings", self.rankings_scale)
         
-        if not os.path.exists(ranking_path):
-            print(f"❌ Error: No se encontró {ranking_path}")
+        if not ranking_exists(ranking_path, "template_queries_rank"):
+            print(f"❌ Error: No se encontró template_queries_rank en {ranking_path}")
             return []
         
         sheet_name = f"Q{q_number}"
         try:
-            df = pd.read_excel(ranking_path, sheet_name=sheet_name)
+            df = read_ranking(ranking_path, "template_queries_rank", sheet_name)
             return df.to_dict('records')
         except Exception as e:
             print(f"❌ Error leyendo sheet {sheet_name} de {ranking_path}: {e}")
@@ -387,6 +462,7 @@ class PathBenchmark:
             return
         
         self.query_to_pattern = {}
+        self.template_patterns = []
         
         current_index = 0
         
@@ -396,6 +472,7 @@ class PathBenchmark:
                 if current_index < len(self.query_patterns):
                     query = self.query_patterns[current_index]
                     self.query_to_pattern[query] = pattern_name
+                    self.template_patterns.append(pattern_name)
                     current_index += 1
                 else:
 
@@ -405,6 +482,7 @@ class PathBenchmark:
         while current_index < len(self.query_patterns):
                     consulta = self.query_patterns[current_index]
                     self.query_to_pattern[consulta] = "Otros"
+                    self.template_patterns.append("Otros")
                     print(f"Consulta {current_index + 1} asignada a 'Otros': {consulta}")
                     current_index += 1
                     otros_count += 1
@@ -412,7 +490,7 @@ class PathBenchmark:
         if otros_count > 0:
             print(f"Se asignaron {otros_count} consultas restantes a 'Otros'")
         
-        print(f"Se asignaron {len(self.query_to_pattern)} consultas a {len(set(self.query_to_pattern.values()))} patrones abstractos")
+        print(f"Se asignaron {len(self.template_patterns)} consultas a {len(set(self.query_to_pattern.values()))} patrones abstractos")
 
     def generate_mappings_file(self):
         """Genera el archivo de mapeos analizando el archivo edges.txt según el factor de escala y los modos de selección"""
@@ -790,7 +868,7 @@ class PathBenchmark:
         else:
             percent = int(100 * (current / float(total)))
         
-        filled_length = int(bar_length * current // total)
+        filled_length = int(bar_length * current // total) if total else 0
         bar = '#' * filled_length + '-' * (bar_length - filled_length)
         
         sys.stdout.write(f'\r[{bar}] {percent}% ({current}/{total} consultas)')
@@ -800,41 +878,36 @@ class PathBenchmark:
     # FUNCIONES DE GENERACIÓN DE CONSULTAS
     #################################################
     
-    def generate_query_script(self, script_path="runTRAIL_query_script.sh"):
+    def generate_query_pool(self):
         """
-        Genera dinámicamente el script bash con las consultas,
-        reemplazando los identificadores de nodos según la etiqueta inicial
+        Genera dinámicamente la lista de consultas reales,
+        reemplazando los identificadores de nodos según la etiqueta inicial.
+        Devuelve los identificadores de las consultas en self.query_catalog
         """
-        print("\nGenerando script de consultas para el factor de escala", self.selected_scale)
+        print("\nGenerando pool de consultas para el factor de escala", self.selected_scale)
         
         # Asignar consultas a patrones abstractos según la distribución especificada
         self.map_queries_to_patterns()
         
-        # Crear contenido del script bash
-        script_content = """#!/bin/bash
-
-    # URL del endpoint
-    BASE_URL="http://localhost:1234/query"
-
-    # Lista de consultas a ejecutar
-    PATTERNS=(
-    """
-        
         # Procesar cada patrón de consulta
-        count = 0
+        queries = []
         skipped = 0
         
         # Guardamos información sobre las consultas para usarla después
-        query_info = {}
+        self.query_catalog = QueryCatalog("query_info.json")
         
-        for pattern in self.query_patterns:
+        for template_id, pattern in enumerate(self.query_patterns):
+            # Obtener a qué AQ pertenece esta plantilla (por posición: el texto puede repetirse)
+            if template_id < len(self.template_patterns):
+                abstract_pattern = self.template_patterns[template_id]
+            else:
+                abstract_pattern = self.query_to_pattern.get(pattern, "Desconocido")
+            
             # Verificar si el patrón ya contiene un ID de nodo específico en lugar de 'x'
             if not "(x)=" in pattern:
                 # El patrón ya tiene un ID de nodo, añadirlo tal cual
-                script_content += f'"{pattern}"\n'
-                abstract_pattern = self.query_to_pattern.get(pattern, "Desconocido")
-                query_info[pattern] = {"original": pattern, "abstract_pattern": abstract_pattern}
-                count += 1
+                queries.append(self.query_catalog.add(pattern, original=pattern, abstract_pattern=abstract_pattern,
+                                                      template_id=template_id))
                 continue
                 
             # Extraer la etiqueta inicial usando múltiples patrones
@@ -858,18 +931,10 @@ class PathBenchmark:
                         # Reemplazar 'x' con el ID de nodo correspondiente
                         query = pattern.replace("(x)=", f"({node_id})=")
                         
-                        # Obtener a qué AQ pertenece esta consulta
-                        abstract_pattern = self.query_to_pattern.get(pattern, "Desconocido")
-                        
-                        # Añadir la consulta al script
-                        script_content += f'"{query}"\n'
-                        query_info[query] = {
-                            "original": pattern, 
-                            "abstract_pattern": abstract_pattern,
-                            "node_id": node_id,
-                            "label": initial_label
-                        }
-                        count += 1
+                        queries.append(self.query_catalog.add(query, original=pattern,
+                                                              abstract_pattern=abstract_pattern,
+                                                              template_id=template_id, node_id=node_id,
+                                                              label=initial_label))
                 else:
                     print(f"Advertencia: No se encontró mapeo para la etiqueta '{initial_label}'")
                     skipped += 1
@@ -877,40 +942,17 @@ class PathBenchmark:
                 print(f"Advertencia: No se pudo extraer etiqueta inicial de: {pattern}")
                 skipped += 1
         
-        # Finalizar el script
-        script_content += """)
-
-    # Ejecutar las consultas
-    for PATTERN in "${PATTERNS[@]}"; do
-        # Ejecutar la consulta
-        RESPONSE=$(curl -s -X POST "$BASE_URL" -d "$PATTERN")
-        
-        # Imprimir la consulta que se está ejecutando (opcional, para depuración)
-        echo "Ejecutando: $PATTERN"
-        
-        # Esperar un segundo entre consultas para no sobrecargar el servidor
-    done
-
-    # Confirmar que todas las consultas se completaron
-    echo "Todas las consultas se ejecutaron correctamente."
-    """
-        
-        # Guardar el script en un archivo
-        with open(script_path, "w") as f:
-            f.write(script_content)
-        
-        # Hacer el script ejecutable
-        os.chmod(script_path, 0o755)
-        
         # Guardar información de las consultas para usarla después
-        with open("query_info.json", "w") as f:
-            json.dump(query_info, f, indent=2)
+        self.query_catalog.save()
+        
+        # Una plantilla repetida en el mismo AQ genera las mismas consultas (mismo identificador): se miden una vez
+        queries = list(dict.fromkeys(queries))
         
-        print(f"Se generó el script con {count} consultas en '{script_path}'")
+        print(f"Se generó el pool con {len(queries)} consultas")
         if skipped > 0:
             print(f"Se omitieron {skipped} consultas porque no se pudo determinar la etiqueta inicial o no tenían mapeo")
         
-        return script_path, count
+        return queries, len(queries)
 
     #IMPORTANTE
     def extract_initial_label(self, pattern):
@@ -998,7 +1040,7 @@ class PathBenchmark:
     def start_mdb_server(self):
         # NUEVA LÓGICA: Solo saltar si usamos resultados existentes Y el archivo existe
         if self.use_existing_results:
-            if os.path.exists(self.result_file):
+            if all(os.path.exists(path) for path in self.result_files):
                 #print(f"📁 Usando archivo de resultados existente: {self.result_file}")
                 print("🚫 No se iniciará el servidor MillenniumDB.")
                 return
@@ -1017,106 +1059,478 @@ class PathBenchmark:
             else:
                 db_path = os.path.join("MillenniumDB", "data", "db", "01")
         
+        if self.engine == "reference":
+            # El motor de referencia carga directamente el edges.txt del scale factor
+            db_path = self.reference_edges_path()
+            server_bin = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "referenceEngine.py")]
+            engine_name = "el motor de referencia"
+        else:
+            server_bin = os.path.join("MillenniumDB", "build", "Release", "bin", "mdb-server")
+            engine_name = "MillenniumDB"
+        
         if not os.path.exists(db_path):
             print(f"❌ Error: La base de datos '{db_path}' no existe.")
-            input("\nPresione Enter para salir...")
+            self.pause()
             sys.exit(1)
             
-        print(f"🚀 Iniciando servidor MillenniumDB con base de datos: {db_path}...")
+        if self.num_servers > 1:
+            print(f"🚀 Iniciando {self.num_servers} instancias de {engine_name} con base de datos: {db_path}...")
+        else:
+            print(f"🚀 Iniciando {engine_name} con base de datos: {db_path}...")
         try:
-            with open("result.txt", "w") as output_file:
-                server_bin = os.path.join("MillenniumDB", "build", "Release", "bin", "mdb-server")
-                self.server_process = subprocess.Popen(
-                    [server_bin, db_path, "--timeout", "35000"],
-                    stdout=output_file,
-                    stderr=output_file
-                )
-            #print(f"✅ MillenniumDB iniciado!!")
-            print(f"📝 La salida del servidor se está guardando en result.txt")
+            self.server_logs = self.get_server_logs()
+            self.servers = []
             
-            print("⏳ Esperando a que el servidor se inicialice...")
-            time.sleep(5)
+            for i, log_file in enumerate(self.server_logs):
+                server = MdbServer(server_bin, db_path, port=self.base_port + i, log_file=log_file,
+                                   startup_timeout=self.startup_timeout)
+                server.start(append=self.resume and os.path.exists(log_file))
+                self.servers.append(server)
+                print(f"📝 La salida del servidor en el puerto {server.port} se está guardando en {log_file}")
             
-            if self.server_process.poll() is not None:
-                exit_code = self.server_process.poll()
-                print(f"❌ Error: El servidor MillenniumDB se cerró con código {exit_code}.")
-                print("📄 Revise result.txt para más detalles.")
-                input("\nPresione Enter para salir...")
-                sys.exit(1)
+            print("⏳ Esperando a que el servidor responda al sondeo de disponibilidad...")
+            start_time = time.time()
+            
+            for server in self.servers:
+                if not server.wait_until_ready():
+                    if server.is_alive():
+                        print(f"❌ Error: El servidor MillenniumDB no respondió tras {self.startup_timeout} segundos.")
+                    else:
+                        print(f"❌ Error: El servidor MillenniumDB se cerró con código {server.process.poll()}.")
+                    print(f"📄 Revise {server.log_file} para más detalles.")
+                    self.stop_mdb_server()
+                    self.pause()
+                    sys.exit(1)
             
-            print("🟢 Servidor MillenniumDB listo para recibir consultas")
+            print(f"🟢 Servidor MillenniumDB listo para recibir consultas ({time.time() - start_time:.1f} s)")
             
         except Exception as e:
             print(f"❌ Error al iniciar el servidor MillenniumDB: {e}")
-            input("\nPresione Enter para salir...")
+            self.stop_mdb_server()
+            self.pause()
             sys.exit(1)
 
+    def pause(self, message="\nPresione Enter para salir..."):
+        """Espera Enter antes de salir, salvo en ejecuciones desatendidas (--non-interactive)"""
+        if self.interactive:
+            input(message)
+
+    def reference_edges_path(self):
+        """edges.txt del scale factor seleccionado, que es lo que carga el motor de referencia"""
+        return os.path.join("MillenniumDB", "data", "ldbc", self.selected_scale, "edges.txt")
+
+    def get_server_logs(self):
+        """Archivos de log de cada instancia de mdb-server (uno por puerto)"""
+        if self.num_servers == 1:
+            return ["result.txt"]
+        return [f"result_server{i}.txt" for i in range(self.num_servers)]
+
+    def get_server_urls(self):
+        return [f"http://localhost:{self.base_port + i}/query" for i in range(self.num_servers)]
+
+    def sweep_levels(self):
+        """Niveles de concurrencia del barrido: 1, 2, 4, ... hasta sweep_max (incluido)"""
+        levels = []
+        level = 1
+        while level < self.sweep_max:
+            levels.append(level)
+            level *= 2
+        levels.append(self.sweep_max)
+        return levels
+
+    def close_log_segments(self):
+        """
+        Fija el final del último segmento de cada log antes de enviar consultas que no
+        forman parte de la medición (barrido de concurrencia). La consulta de sondeo
+        asegura que el servidor ya registró las consultas anteriores
+        """
+        for server in self.servers:
+            server.probe()
+        for log_file, segments in self.log_segments.items():
+            if segments and segments[-1][1] is None and os.path.exists(log_file):
+                start, _, outcomes = segments[-1]
+                segments[-1] = (start, os.path.getsize(log_file), outcomes)
+
+    def run_concurrency_sweep(self, queries, output_folder):
+        """
+        Reproduce el pool (o los AQ de --sweep-aq) contra el primer servidor con 1, 2,
+        4, ... sweep_max clientes y guarda la tabla de escalabilidad en scalability.xlsx.
+        El throughput por AQ de cada nivel es el efectivo: clientes * consultas del AQ
+        / suma de sus latencias, es decir, la tasa a la que se sirve ese AQ dentro de
+        la mezcla.
+        """
+        def aq_of(query_id):
+            pattern = self.query_catalog.get(query_id).get("abstract_pattern", "Desconocido")
+            q_number = self.pattern_to_q_number.get(pattern)
+            return (f"Q{int(q_number)}" if q_number is not None else "Desconocido"), pattern
+        
+        if self.sweep_aq:
+            queries = [q for q in queries if aq_of(q)[0] in self.sweep_aq]
+        if not queries:
+            print("⚠️  No hay consultas para el barrido de concurrencia con los AQ seleccionados")
+            return None
+        
+        self.close_log_segments()
+        levels = self.sweep_levels()
+        url = self.get_server_urls()[0]
+        server = self.servers[0] if self.servers else None
+        print(f"\n📈 Barrido de concurrencia: {len(queries)} consultas con {', '.join(map(str, levels))} clientes")
+        
+        rows = []
+        aq_rows = {}
+        for level in levels:
+            executor = QueryExecutor(url=url, concurrency=level, output_path=None, server=server,
+                                     query_timeout=self.query_timeout, query_texts=self.query_catalog.texts)
+            start = time.perf_counter()
+            try:
+                executor.run(queries, progress_callback=lambda done, total: self.print_progress_bar(done, total),
+                             order=self.query_order)
+            finally:
+                executor.close()
+            elapsed = time.perf_counter() - start
+            
+            outcomes = [o for o in executor.outcomes if o['status'] != 'crashed']
+            ok = sorted(o['latency_ms'] for o in outcomes if o['status'] == 200)
+            qps = len(ok) / elapsed if elapsed > 0 else 0.0
+            base_qps = rows[0]['Throughput (qps)'] if rows else qps
+            speedup = qps / base_qps if base_qps else float('nan')
+            rows.append({
+                'Clientes': level,
+                'Consultas': len(outcomes),
+                'Throughput (qps)': qps,
+                'Aceleración': speedup,
+                'Eficiencia (%)': 100 * speedup / level,
+                'p50 (ms)': percentile(ok, 50),
+                'p99 (ms)': percentile(ok, 99),
+                'Errores': len(outcomes) - len(ok)
+            })
+            print(f"\n   {level:4d} clientes: {qps:8.1f} qps | p50 {rows[-1]['p50 (ms)']:.2f} ms | "
+                  f"p99 {rows[-1]['p99 (ms)']:.2f} ms | aceleración {speedup:.2f}x")
+            
+            latency_by_aq = defaultdict(list)
+            for outcome in outcomes:
+                if outcome['status'] == 200:
+                    latency_by_aq[aq_of(outcome['query_id'])].append(outcome['latency_ms'])
+            for (aq_code, pattern), latencies in latency_by_aq.items():
+                row = aq_rows.setdefault(pattern, {'AQ Code': aq_code, 'AQ': pattern})
+                row[f'QPS x{level}'] = level * len(latencies) / (sum(latencies) / 1000) if sum(latencies) else float('nan')
+        
+        last = f'QPS x{levels[-1]}'
+        for pattern, row in aq_rows.items():
+            row[f'Aceleración x{levels[-1]}'] = row.get(last, float('nan')) / row['QPS x1'] if row.get('QPS x1') else float('nan')
+            self.sweep_results[pattern] = row[f'Aceleración x{levels[-1]}']
+        
+        if not os.path.exists(output_folder):
+            os.makedirs(output_folder)
+        sweep_path = os.path.join(output_folder, "scalability.xlsx")
+        with pd.ExcelWriter(sweep_path, engine='xlsxwriter') as writer:
+            pd.DataFrame(rows).to_excel(writer, sheet_name='Escalabilidad', index=False)
+            pd.DataFrame(list(aq_rows.values())).to_excel(writer, sheet_name='Por AQ', index=False)
+        print(f"📊 Tabla de escalabilidad guardada en {sweep_path}")
+        return rows
+
+    def server_time_sampler(self, executor, log_file):
+        """
+        Función que devuelve los tiempos del servidor (parser + optimizer + ejecución)
+        por consulta medidos hasta ahora en el log. Se usa entre pasadas de la
+        repetición adaptativa, cuando no hay consultas en vuelo; cada llamada procesa
+        solo lo que el servidor agregó al log desde la anterior. Con --resume, la
+        primera llamada incluye además los tramos de los segmentos anteriores del journal
+        """
+        ranges = self.journal.log_ranges(log_file)
+        start = ranges[-1][1] if ranges else 0
+        earlier = [(start, end, self.journal.segment_outcomes(segment, log_file))
+                   for segment, start, end in ranges[:-1]]
+        tail = LogTail(log_file, start, self.query_catalog, max_in_flight=executor.concurrency, earlier=earlier)
+        samples = defaultdict(list)
+        
+        def server_time_samples():
+            for record in tail.read(executor.outcomes):
+                if record['phase'] == 'measure' and record['status'] == 200 and record['server_ms'] is not None:
+                    samples[record['query_id']].append(record['server_ms'])
+            return samples
+        
+        return server_time_samples
+
+    def earlier_failures(self, log_file):
+        """
+        Consultas que tuvieron un timeout o error en segmentos anteriores del journal
+        (con --resume); la repetición adaptativa no las vuelve a ejecutar
+        """
+        current = len(self.journal.segments) - 1
+        return {outcome_key(o) for o in self.journal.outcomes
+                if o['segment'] < current and o['log'] == log_file and o.get('phase') == 'measure'
+                and o['status'] not in (200, 'crashed')}
+
+    def open_measurement_cache(self):
+        """
+        Abre la caché de mediciones de la base de datos actual. La huella se calcula
+        sobre el directorio de la base de datos o, si no existe, sobre su edges.txt
+        """
+        if not self.use_cache:
+            return None
+        if self.engine == "reference":
+            fingerprint = fingerprint_path(self.reference_edges_path())
+        else:
+            fingerprint = fingerprint_path(self.db_path)
+        if fingerprint is None:
+            fingerprint = fingerprint_path(os.path.join("MillenniumDB", "data", "ldbc", self.selected_scale, "edges.txt"))
+        if fingerprint is None:
+            print("⚠️  No se pudo calcular la huella de la base de datos; se desactiva la caché de mediciones")
+            return None
+        timeout_ms = self.servers[0].timeout_ms if self.servers else 35000
+        # Todo lo que cambia las condiciones de medición forma parte de la clave: una
+        # latencia medida con N consultas en vuelo no se reutiliza como secuencial
+        flags = (f"--timeout {timeout_ms};query_timeout={self.query_timeout};concurrency={self.concurrency};"
+                 f"servers={self.num_servers};warmup={self.warmup}")
+        if self.engine != "mdb":
+            flags += f";engine={self.engine}"
+        if self.measure_states:
+            flags += f";mode={self.measure_mode}"
+        if 'cold' in self.measure_states:
+            flags += f";cold_group={self.cold_group};evict={self.evict_page_cache}"
+        if self.adaptive:
+            flags += f";ci_target={self.ci_target};max_reps={self.max_reps}"
+        if self.sample_interval_ms:
+            # El muestreo de recursos corre en el cliente y se suma a la latencia medida
+            flags += f";sample_interval={self.sample_interval_ms}"
+        if self.schedule_order != "file":
+            # El orden cambia qué consultas se interfieren entre sí. La semilla solo entra si
+            # se indicó con --seed: las corridas con semilla aleatoria comparten sus entradas
+            flags += f";schedule={self.schedule_order}"
+            if self.schedule_seed is not None and self.schedule_order in ('shuffle', 'latin'):
+                flags += f";seed={self.schedule_seed}"
+        self.cache = MeasurementCache(self.cache_dir, fingerprint=fingerprint, flags=flags).load()
+        return self.cache
+
+    def measurements_per_query(self):
+        """Mediciones que produce cada consulta: una por repetición y por estado (frío/caliente)"""
+        return self.repetitions * max(1, len(self.measure_states))
+
+    def state_groups(self, queries):
+        """
+        Grupos de consultas entre los que se reinicia el servidor en modo frío: cada
+        consulta por separado o las consultas reales de una misma plantilla
+        """
+        if self.cold_group == "query":
+            return [[query_id] for query_id in queries]
+        groups = defaultdict(list)
+        for query_id in queries:
+            groups[self.query_catalog.get(query_id).get("template_id", query_id)].append(query_id)
+        return list(groups.values())
+
+    def build_query_order(self):
+        """
+        Orden de ejecución del pool. Sin semilla explícita se genera una (o, con
+        --resume, se reutiliza la de la ejecución interrumpida) y queda registrada
+        en el journal y en query_schedule.json.
+        """
+        if self.schedule_seed is None and self.schedule_order in ('shuffle', 'latin'):
+            previous = self.journal.segments[-1].get('config', {}) if self.resume and self.journal.segments else {}
+            self.schedule_seed = previous.get('seed') if previous.get('seed') is not None else new_seed()
+        self.query_order = QueryOrder(self.schedule_order, seed=self.schedule_seed,
+                                      group_of=lambda query_id: self.query_catalog.get(query_id).get("abstract_pattern",
+                                                                                                     query_id))
+        return self.query_order
+
+    def save_query_schedule(self, path="query_schedule.json"):
+        """Guarda la estrategia, la semilla y el plan de ejecución de cada servidor"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'order': self.schedule_order,
+                'seed': self.schedule_seed,
+                'servers': [[{'query_id': query_id, 'query': self.query_catalog.text(query_id), 'phase': phase,
+                              'repetition': repetition, 'state': state}
+                             for query_id, phase, repetition, state in executor.schedule]
+                            for executor in self.query_executors]
+            }, f, indent=2, ensure_ascii=False)
+        return path
+
+    def cold_restart(self, server):
+        """Reinicia un servidor antes de un tramo de medición en frío"""
+        if server is None:
+            return
+        if not server.restart(evict=self.evict_page_cache):
+            print(f"\n❌ No se pudo reiniciar mdb-server (puerto {server.port}) para la medición en frío. "
+                  f"Revise {server.log_file}")
+
+    def split_cached_queries(self, queries):
+        """
+        Separa las consultas con mediciones en caché (que se convierten en registros
+        listos para el análisis) de las que hay que ejecutar. Devuelve estas últimas
+        """
+        self.cached_records = []
+        if self.open_measurement_cache() is None:
+            return queries
+        
+        pending = []
+        hits = 0
+        for query_id in queries:
+            query = self.query_catalog.text(query_id)
+            if self.adaptive:
+                measurements = self.cache.get(query, repetitions=self.measurements_per_query(),
+                                              ci_target=self.ci_target, max_reps=self.max_reps)
+            else:
+                measurements = self.cache.get(query, repetitions=self.measurements_per_query())
+            if measurements is None:
+                pending.append(query_id)
+                continue
+            hits += 1
+            self.cached_records.extend(record_from_measurement(query, m, self.query_catalog.get(query_id), query_id)
+                                       for m in measurements)
+        
+        if hits:
+            print(f"💾 {hits} de {len(queries)} consultas con mediciones en caché ({self.cache.path}); "
+                  f"se ejecutarán {len(pending)}")
+        return pending
+
+    def store_measurements(self, records):
+        """Guarda en la caché las mediciones definitivas de las consultas ejecutadas en esta corrida"""
+        if self.cache is None:
+            return 0
+        
+        # Se agrupa por identificador; la caché se indexa por el texto de la consulta
+        measurements_by_query = defaultdict(list)
+        texts = {}
+        for record in records:
+            if record['source'] == 'run' and record['phase'] == 'measure' and record['status'] in FINAL_STATUSES:
+                key = outcome_key(record)
+                texts[key] = record['query']
+                measurements_by_query[key].append(measurement_from_record(record))
+        
+        complete = {texts[key]: measurements for key, measurements in measurements_by_query.items()
+                    if texts[key] != PROBE_QUERY and len(measurements) >= self.measurements_per_query()}
+        return self.cache.put_many(complete)
+
+    def load_query_catalog(self):
+        """Catálogo de las consultas reales generadas con el pool (query_info.json); vacío si no existe"""
+        self.query_catalog = QueryCatalog("query_info.json").load()
+        return self.query_catalog
+
+    def write_measurement_log(self, log_files, catalog):
+        """
+        Genera measurements.jsonl: un registro por ejecución que une los tiempos del
+        log de cada servidor con los resultados del cliente de cada segmento, más las
+        mediciones recuperadas de la caché. Un log sin segmentos registrados (por
+        ejemplo con --use-existing) se importa solo con los tiempos del servidor.
+        Los logs se procesan en paralelo con hasta parse_workers procesos.
+        """
+        sources = [(log_file, self.log_segments.get(log_file, [(0, None, None)])) for log_file in log_files]
+        start = time.perf_counter()
+        count = self.measurement_log.write_from_logs(sources, catalog, max_in_flight=self.concurrency,
+                                                     workers=self.parse_workers, extra=self.cached_records)
+        if self.parse_workers > 1:
+            print(f"⚙️  Logs procesados con {self.parse_workers} procesos en {time.perf_counter() - start:.1f} s")
+        print(f"🧾 {count} mediciones registradas en {self.measurement_log.path}")
+        return self.measurement_log
+
+    def templates_fingerprint(self):
+        """Hash de las plantillas y de los AQ con su distribución: cambia si cambia el pool de plantillas"""
+        content = json.dumps([self.query_patterns, self.query_distribution], ensure_ascii=False)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+    def journal_config(self):
+        """
+        Configuración de la ejecución que se guarda en cada segmento del journal: todo
+        lo que determina el pool de consultas y las condiciones de medición. Una
+        ejecución solo se reanuda si coincide (ver validate_resume)
+        """
+        return {
+            'db_path': self.db_path,
+            'engine': self.engine,
+            'templates': self.templates_fingerprint(),
+            'nodes_per_label': self.nodes_per_label,
+            'selection_modes': self.selection_modes,
+            'query_selection_modes': self.query_selection_modes,
+            'queries_per_pattern': self.queries_per_pattern,
+            'measure_mode': self.measure_mode,
+            'cold_group': self.cold_group,
+            'evict_page_cache': self.evict_page_cache,
+            'schedule': self.schedule_order,
+            'seed': self.schedule_seed,
+            'num_servers': self.num_servers,
+            'concurrency': self.concurrency,
+            'warmup': self.warmup,
+            'repetitions': self.repetitions,
+            'adaptive': self.adaptive,
+            'ci_target': self.ci_target if self.adaptive else None,
+            'max_reps': self.max_reps if self.adaptive else None,
+            'query_timeout': self.query_timeout,
+            'sample_interval_ms': self.sample_interval_ms
+        }
+
+    def validate_resume(self):
+        """
+        Comprueba que el journal existente corresponde a esta configuración antes de
+        arrancar los servidores. Sin journal previo se inicia una ejecución nueva.
+        """
+        if not self.resume:
+            return True
+        if not self.journal.exists():
+            print(f"ℹ️  No existe {self.journal.path}; se inicia una ejecución nueva")
+            self.resume = False
+            return True
+        self.journal.load()
+        if not self.journal.segments:
+            self.resume = False
+            return True
+        previous = self.journal.segments[-1].get('config', {})
+        current = self.journal_config()
+        if current['seed'] is None:
+            # Sin --seed se reutiliza la semilla registrada (ver build_query_order)
+            del current['seed']
+        # Los parámetros que el journal no registró (versiones anteriores) también cuentan como distintos
+        missing = object()
+        differing = [key for key, value in current.items()
+                     if json.loads(json.dumps(value)) != previous.get(key, missing)]
+        if differing:
+            print(f"❌ Error: {self.journal.path} se generó con otra configuración:")
+            for key in differing:
+                before = previous[key] if key in previous else "(no registrado)"
+                print(f"   - {key}: {before} → {current[key]}")
+            print("💡 Ejecute sin --resume para empezar de nuevo, o repita los parámetros de la ejecución interrumpida.")
+            return False
+        return True
+
+    def open_journal(self):
+        """
+        Abre el journal de la ejecución y registra un nuevo segmento. Con --resume se
+        continúa el existente y se devuelven los pares (consulta, repetición) ya
+        medidos; si no, el journal se reinicia.
+        """
+        completed = set()
+        if self.resume:
+            self.journal.load()
+            completed = self.journal.completed()
+        self.journal.open(reset=not self.resume)
+        self.journal.start_segment(self.server_logs, config=self.journal_config())
+        return completed
+
+    def stop_mdb_server(self):
+        """Termina todas las instancias de mdb-server que sigan activas"""
+        stopped = False
+        for server in self.servers:
+            if server.stop():
+                stopped = True
+        return stopped
 
     def run_queries_with_progress(self, timeout=35000):
         # NUEVA SECCIÓN AL INICIO
         if self.use_existing_results:
-            print(f"\nUsando resultados existentes de {self.result_file}")
+            print(f"\nUsando resultados existentes de {', '.join(self.result_files)}")
             print("Se omite la ejecución de consultas.")
             return
         
         # RESTO DEL CÓDIGO ORIGINAL
         print("\nPreparando ejecución de consultas...")
         
-        script_path, total_queries = self.generate_query_script()
+        queries, total_queries = self.generate_query_pool()
         
         if total_queries == 0:
             print("No se generaron consultas para ejecutar.")
             return
         
-        try:
-            print(f"\nEjecutando {total_queries} consultas al servidor...")
-            print("Este proceso puede tardar")
-            
-            with open("queries_output.txt", "w") as output_file:
-                self.query_process = subprocess.Popen(
-                    [f"./{script_path}"],
-                    stdout=output_file,
-                    stderr=output_file,
-                    shell=True
-                )
-                
-                completed_queries = 0
-                last_count = 0
-                start_time = time.time()
-                
-                progress_bar_length = 40
-                self.print_progress_bar(0, total_queries, progress_bar_length)
-                
-                while self.query_process.poll() is None:
-                    elapsed_time = time.time() - start_time
-                    if elapsed_time > timeout:
-                        print(f"\nTimeout después de {timeout} segundos. Terminando ejecución...")
-                        self.query_process.terminate()
-                        break
-                    
-                    time.sleep(2)
-                    
-                    if os.path.exists("result.txt"):
-                        try:
-                            with open("result.txt", 'r', encoding='utf-8', errors='replace') as f:
-                                log_content = f.read()
-                            
-                            completed_queries = log_content.count("Query received:")
-                            
-                            if completed_queries > last_count:
-                                completed_queries = min(completed_queries, total_queries)
-                                self.print_progress_bar(completed_queries, total_queries, progress_bar_length)
-                                last_count = completed_queries
-                        except Exception as e:
-                            print(f"\nError al leer result.txt: {e}")
-                            time.sleep(1)
-                
-                self.print_progress_bar(total_queries, total_queries, progress_bar_length)
-                
-                print("\nConsultas completadas. Resultados guardados en queries_output.txt")
-                
-        except Exception as e:
-            print(f"Error al ejecutar las consultas: {e}")
+        self.execute_query_pool(queries, timeout=timeout)
 
     def save_pool_from_rankings(self, pool_queries):
         if not pool_queries:
@@ -1147,10 +1561,57 @@ class PathBenchmark:
         print(f"   📈 Total consultas: {len(pool_queries)}")
 
 
+    def ranking_tables(self, df, histograms, state_cols, resource_cols):
+        """
+        Agrega en una sola pasada las estadísticas de cada AQ y de cada plantilla (por
+        AQ) a partir de la tabla de consultas reales. Devuelve dos DataFrames, indexados
+        por AQ y por (AQ, plantilla), con todas las columnas de los rankings y del
+        resumen; los AQ quedan en el orden en que aparecen en df y las plantillas
+        ordenadas alfabéticamente dentro de cada AQ.
+
+        histograms son los histogramas del tiempo del servidor (parser + optimizer +
+        ejecución) por consulta real, el mismo tiempo que ordena los rankings, así que
+        los percentiles de los reportes son del servidor. Los latency_histograms de
+        QueryExecutor miden otra cosa, la latencia del cliente, y solo existen para las
+        consultas ejecutadas en esta corrida (no para las de la caché ni las de un log
+        importado): se usan únicamente en el resumen que se imprime al terminar.
+        """
+        def aggregate(keys, sort):
+            grouped = df.groupby(keys, sort=sort)
+            stats = grouped.agg(**{
+                'Número de Consultas': ('Consulta', 'size'),
+                'Promedio Paths': ('Número de Paths', 'mean'),
+                'Total Paths': ('Número de Paths', 'sum'),
+                'Tiempo Promedio (ms)': ('Tiempo Ejecución (ms)', 'mean'),
+                'Tiempo Mínimo (ms)': ('Tiempo Ejecución (ms)', 'min'),
+                'Tiempo Máximo (ms)': ('Tiempo Ejecución (ms)', 'max'),
+                'Intentos': ('Intentos', 'sum'),
+                'Timeouts': ('Timeouts', 'sum'),
+                **{col: (col, 'mean') for col in PHASE_COLUMNS + state_cols + resource_cols}
+            })
+            stats['Tasa Timeout (%)'] = (100 * stats['Timeouts'] / stats['Intentos']).where(stats['Intentos'] > 0, 0.0)
+            # Participación de parser, optimizador y ejecución del plan en la suma de sus medias
+            phases = stats[PHASE_COLUMNS]
+            phase_total = phases.sum(axis=1, min_count=len(PHASE_COLUMNS))
+            for share, column in zip(PHASE_SHARE_COLUMNS, PHASE_COLUMNS):
+                stats[share] = (100 * phases[column] / phase_total).where(phase_total > 0)
+            phase_names = {column: name for column, (_, name) in zip(PHASE_COLUMNS, PHASES)}
+            stats['Fase Dominante'] = phases.fillna(-1).idxmax(axis=1).map(phase_names).where(phase_total > 0)
+            if 'Razón Frío/Caliente' in state_cols:
+                # Razón de los promedios (no promedio de razones) para plantillas y AQ
+                warm = stats['Tiempo Caliente (ms)']
+                stats['Razón Frío/Caliente'] = (stats['Tiempo Frío (ms)'] / warm).where(warm > 0)
+            # Percentiles de los histogramas combinados de las consultas de cada grupo
+            percentiles = pd.DataFrame([percentile_columns(LatencyHistogram.merged(histograms[q] for q in query_ids))
+                                        for _, query_ids in grouped['ID Consulta']], index=stats.index)
+            return pd.concat([stats, percentiles], axis=1)
+
+        return aggregate('AQ', sort=False), aggregate(['AQ', 'Consulta Plantilla'], sort=True)
+
     def parse_query_results(self, output_folder="resultados_benchmark", output_excel_name="all_queries.xlsx", 
                         queries_per_pattern=2, selection_modes=None):
         #print("\nAnalizando resultados de las consultas...")
-        result_file_to_use = self.result_file if self.use_existing_results else "result.txt"
+        result_files_to_use = self.result_files if self.use_existing_results else self.server_logs
         #print(f"Leyendo resultados desde: {result_file_to_use}")
         if selection_modes is None:
             selection_modes = self.selection_modes if hasattr(self, 'selection_modes') else ["max"]
@@ -1168,552 +1629,277 @@ class PathBenchmark:
             #print(f"Configuración selectiva: {self.selective_queries}")
         
         try:
-            if not os.path.exists(result_file_to_use):
-                print("Error: No se encontró el archivo result.txt")
+            missing_files = [path for path in result_files_to_use if not os.path.exists(path)]
+            if missing_files:
+                print(f"Error: No se encontró el archivo {', '.join(missing_files)}")
                 return 0
             
-            query_info = {}
-            if os.path.exists("query_info.json"):
-                try:
-                    with open("query_info.json", 'r') as f:
-                        query_info = json.load(f)
-                except Exception as e:
-                    print(f"Advertencia: No se pudo cargar info de consultas: {e}")
+            catalog = self.query_catalog if len(self.query_catalog) else self.load_query_catalog()
                         
             if not os.path.exists(output_folder):
                 os.makedirs(output_folder)
                 print(f"Se ha creado la carpeta: {output_folder}")
-            
-            output_excel_path = os.path.join(output_folder, output_excel_name)
                 
-            with open(result_file_to_use, 'r', encoding='utf-8', errors='replace') as f:
-                log_content = f.read()
-            
             query_groups = {}
-
-            # Dividir el contenido en líneas para procesar secuencialmente
-            lines = log_content.split('\n')
-            current_query = None
-            current_results = None
-            current_parser_time = None
-            current_optimizer_time = None
-            current_execution_time = None
             query_count = 0
 
-            #print(f"Procesando {len(lines)} líneas del log...")
-
-            i = 0
-            while i < len(lines):
-                line = lines[i].strip()
-                
-                # Detectar inicio de nueva consulta
-                if line == "Query received:":
-                    # Si tenemos una consulta anterior completa, procesarla
-                    if (current_query and current_results is not None and 
-                        current_parser_time is not None and current_optimizer_time is not None and current_execution_time is not None):
-                        query_count += 1
-                        # Calcular tiempo total como suma de los tres componentes
-                        total_time = current_parser_time + current_optimizer_time + current_execution_time
-                        
-                        # Obtener información adicional de query_info
-                        abstract_pattern = "Desconocido"
-                        template_query = "Desconocido"
-                        node_id = "Desconocido"
-                        q_number = None
-                        
-                        if current_query in query_info:
-                            abstract_pattern = query_info[current_query]["abstract_pattern"]
-                            if "original" in query_info[current_query]:
-                                template_query = query_info[current_query]["original"]
-                            if "node_id" in query_info[current_query]:
-                                node_id = query_info[current_query]["node_id"]
-                            
-                            if abstract_pattern in self.pattern_to_q_number:
-                                q_number = self.pattern_to_q_number[abstract_pattern]
-                        
-                        # Agregar o actualizar en query_groups
-                        if current_query not in query_groups:
-                            query_groups[current_query] = {
-                                'Consulta': current_query,
-                                'AQ': abstract_pattern,
-                                'Consulta Plantilla': template_query,
-                                'ID Nodo': node_id,
-                                'Número de Paths': current_results,
-                                'AQ Code': q_number,
-                                'Tiempos': [total_time],
-                                'Ejecuciones': 1
-                            }
-                        else:
-                            query_groups[current_query]['Tiempos'].append(total_time)
-                            query_groups[current_query]['Ejecuciones'] += 1
-                    
-                    # Resetear para nueva consulta
-                    current_query = None
-                    current_results = None
-                    current_parser_time = None
-                    current_optimizer_time = None
-                    current_execution_time = None
-                    
-                    # Buscar la consulta MATCH en la siguiente línea
-                    if i + 1 < len(lines):
-                        next_line = lines[i + 1].strip()
-                        if next_line.startswith('MATCH'):
-                            current_query = next_line
-                
-                # Buscar "Results: X"
-                elif line.startswith("Results:"):
-                    results_match = re.search(r"Results:\s*(\d+)", line)
-                    if results_match:
-                        current_results = int(results_match.group(1))
-                
-                # Buscar "Parser duration: X.X ms"
-                elif line.startswith("Parser duration:"):
-                    parser_time_match = re.search(r"Parser duration:\s*([\d.]+)\s*ms", line)
-                    if parser_time_match:
-                        current_parser_time = float(parser_time_match.group(1))
-                
-                # Buscar "Optimizer duration: X.X ms"
-                elif line.startswith("Optimizer duration:"):
-                    optimizer_time_match = re.search(r"Optimizer duration:\s*([\d.]+)\s*ms", line)
-                    if optimizer_time_match:
-                        current_optimizer_time = float(optimizer_time_match.group(1))
-                
-                # Buscar "Execution duration: X.X ms"
-                elif line.startswith("Execution duration:"):
-                    exec_time_match = re.search(r"Execution duration:\s*([\d.]+)\s*ms", line)
-                    if exec_time_match:
-                        current_execution_time = float(exec_time_match.group(1))
-                
-                i += 1
-
-            # Procesar la última consulta si existe
-            if (current_query and current_results is not None and 
-                current_parser_time is not None and current_optimizer_time is not None and current_execution_time is not None):
+            # Todas las etapas siguientes leen el registro estructurado de mediciones; los
+            # logs de texto del servidor solo se importan (legado)
+            if self.use_existing_results and all(path.endswith('.jsonl') for path in result_files_to_use):
+                measurement_log = itertools.chain.from_iterable(MeasurementLog(path) for path in result_files_to_use)
+            else:
+                measurement_log = self.write_measurement_log(result_files_to_use, catalog)
+                if not self.use_existing_results:
+                    self.store_measurements(measurement_log)
+
+            def record_query_id(record):
+                # Los registros de consultas que no son del pool (o de un registro anterior a
+                # los identificadores) se identifican por su texto en el catálogo
+                if isinstance(record['query_id'], int):
+                    return record['query_id']
+                query_id = catalog.lookup(record['query'])
+                if query_id is None:
+                    query_id = catalog.add(record['query'], original=record['template'], abstract_pattern=record['aq'])
+                return query_id
+            
+            def get_group(record, query_id):
+                # Agregar o recuperar la consulta en query_groups con los datos del registro
+                if query_id in query_groups:
+                    return query_groups[query_id]
+                
+                query_groups[query_id] = {
+                    'ID Consulta': query_id,
+                    'Consulta': record['query'],
+                    'AQ': record['aq'],
+                    'Consulta Plantilla': record['template'],
+                    'ID Nodo': record['anchor'],
+                    'Número de Paths': None,
+                    'AQ Code': self.pattern_to_q_number.get(record['aq']),
+                    'Tiempos': [],
+                    'Tiempos por Estado': {'cold': [], 'warm': []},
+                    'Respuestas': [],
+                    'Ejecuciones': 0,
+                    'Intentos': 0,
+                    'Timeouts': 0,
+                    'Errores': 0
+                }
+                return query_groups[query_id]
+            
+            def count_attempt(group, status):
+                group['Intentos'] += 1
+                if status == 'timeout':
+                    group['Timeouts'] += 1
+                elif status != 200:
+                    group['Errores'] += 1
+            
+            # Histograma de largos de los paths recibidos por el cliente (última ejecución medida)
+            path_lengths = {}
+            
+            for record in measurement_log:
+                current_query = record['query']
+                # Las pasadas de calentamiento no se miden y las caídas se reencolaron
+                if current_query == PROBE_QUERY or record['phase'] == 'warmup' or record['status'] == 'crashed':
+                    continue
+                if record['status'] == 200 and not record['complete']:
+                    # Respuesta del cliente que el servidor no llegó a registrar en el log
+                    continue
                 query_count += 1
-                # Calcular tiempo total como suma de los tres componentes
-                total_time = current_parser_time + current_optimizer_time + current_execution_time
-                
-                # Obtener información adicional de query_info
-                abstract_pattern = "Desconocido"
-                template_query = "Desconocido"
-                node_id = "Desconocido"
-                q_number = None
                 
-                if current_query in query_info:
-                    abstract_pattern = query_info[current_query]["abstract_pattern"]
-                    if "original" in query_info[current_query]:
-                        template_query = query_info[current_query]["original"]
-                    if "node_id" in query_info[current_query]:
-                        node_id = query_info[current_query]["node_id"]
-                    
-                    if abstract_pattern in self.pattern_to_q_number:
-                        q_number = self.pattern_to_q_number[abstract_pattern]
-                
-                # Agregar o actualizar en query_groups
-                if current_query not in query_groups:
-                    query_groups[current_query] = {
-                        'Consulta': current_query,
-                        'AQ': abstract_pattern,
-                        'Consulta Plantilla': template_query,
-                        'ID Nodo': node_id,
-                        'Número de Paths': current_results,
-                        'AQ Code': q_number,
-                        'Tiempos': [total_time],
-                        'Ejecuciones': 1
-                    }
-                else:
-                    query_groups[current_query]['Tiempos'].append(total_time)
-                    query_groups[current_query]['Ejecuciones'] += 1
+                query_id = record_query_id(record)
+                group = get_group(record, query_id)
+                count_attempt(group, record['status'])
+                
+                if record['results'] is not None and group['Número de Paths'] is None:
+                    group['Número de Paths'] = record['results']
+                
+                # Solo las ejecuciones exitosas cuentan como medición; de las abandonadas
+                # se conservan únicamente las métricas parciales
+                if record['server_ms'] is not None and record['status'] == 200:
+                    total_time = record['server_ms']
+                    group['Tiempos'].append(total_time)
+                    group['Ejecuciones'] += 1
+                    if record['state'] in ('cold', 'warm'):
+                        group['Tiempos por Estado'][record['state']].append(total_time)
+                    group['Respuestas'].append(record)
+                    if record['path_lengths'] is not None:
+                        path_lengths[query_id] = record['path_lengths']
 
             #print(f"\nProcesadas {len(query_groups)} consultas únicas de {query_count} consultas totales")
 
             # CREAR LA VARIABLE DATA
             data = []
-            for query, group in query_groups.items():
-                # Verificar que existe 'Tiempos' y filtrar valores None
-                if 'Tiempos' not in group or not group['Tiempos']:
-                    # Si no hay tiempos, usar valores por defecto
-                    group['Tiempo Ejecución (ms)'] = 0.0
-                    group['Desviación Estándar (ms)'] = 0.0
-                    print(f"Advertencia: Consulta sin tiempos: {query[:50]}...")
-                else:
-                    # Filtrar valores None antes de calcular
-                    valid_times = [t for t in group['Tiempos'] if t is not None]
+            incomplete = 0
+            # Histograma de tiempos del servidor por consulta real; se combinan por plantilla y por AQ
+            histograms = {}
+            for query_id, group in query_groups.items():
+                valid_times = [t for t in group['Tiempos'] if t is not None]
+                
+                histogram = LatencyHistogram()
+                for t in valid_times:
+                    histogram.record(t)
+                histograms[query_id] = histogram
+                
+                if valid_times:
+                    group['Tiempo Ejecución (ms)'] = sum(valid_times) / len(valid_times)
                     
-                    if valid_times:
-                        group['Tiempo Ejecución (ms)'] = sum(valid_times) / len(valid_times)
-                        
-                        if len(valid_times) > 1:
-                            group['Desviación Estándar (ms)'] = statistics.stdev(valid_times)
-                        else:
-                            group['Desviación Estándar (ms)'] = 0.0
+                    if len(valid_times) > 1:
+                        group['Desviación Estándar (ms)'] = statistics.stdev(valid_times)
+                        group['IC Relativo (%)'] = 100 * relative_ci(valid_times)
                     else:
-                        # Si no hay tiempos válidos, usar valores por defecto
-                        group['Tiempo Ejecución (ms)'] = 0.0
                         group['Desviación Estándar (ms)'] = 0.0
-                
-                # Limpiar la clave 'Tiempos' si existe
-                if 'Tiempos' in group:
-                    del group['Tiempos']
+                        group['IC Relativo (%)'] = float('nan')
+                else:
+                    # La consulta nunca terminó: no tiene tiempo medido
+                    group['Tiempo Ejecución (ms)'] = float('nan')
+                    group['Desviación Estándar (ms)'] = float('nan')
+                    group['IC Relativo (%)'] = float('nan')
+                    incomplete += 1
+                
+                # Desglose del tiempo del servidor en sus tres componentes
+                group.update(phase_columns(group['Respuestas']))
+                
+                if group['Número de Paths'] is None:
+                    # Sin línea Results en el log: usar los paths contados en la respuesta
+                    streamed = [o['paths'] for o in group['Respuestas'] if o.get('paths') is not None]
+                    group['Número de Paths'] = streamed[-1] if streamed else float('nan')
+                
+                group.update(state_columns(group['Tiempos por Estado']['cold'], group['Tiempos por Estado']['warm']))
+                group.update(percentile_columns(histogram))
+                if any(o.get('ttfb_ms') is not None for o in group['Respuestas']):
+                    group.update(stream_columns(group['Respuestas']))
+                if any(o.get('cpu_ms') is not None for o in group['Respuestas']):
+                    group.update(resource_columns(group['Respuestas']))
+                del group['Tiempos']
+                del group['Tiempos por Estado']
+                del group['Respuestas']
                 
                 data.append(group)
+            
+            if incomplete:
+                print(f"Advertencia: {incomplete} consultas no completaron ninguna ejecución (timeout o error)")
 
             if not data:
                 print("No se encontraron resultados de consultas para analizar.")
                 return 0
             
             df = pd.DataFrame(data)
+            # Métricas de recursos del servidor (solo si se muestrearon)
+            resource_cols = [col for col in RESOURCE_COLUMNS if col in df.columns]
+            # Tiempos en frío y en caliente (solo con --measure-mode)
+            state_cols = [col for col in STATE_COLUMNS if col in df.columns]
             
             if 'Tiempo Ejecución (ms)' in df.columns:
                 df.sort_values('Tiempo Ejecución (ms)', inplace=True)
             
+            # Estadísticas de todos los AQ y plantillas en una sola agregación
+            aq_stats, template_stats = self.ranking_tables(df, histograms, state_cols, resource_cols)
+            
             # MODIFICACIÓN 1: Eliminar columnas de all_queries.xlsx
-            columns_to_exclude_queries = ['ID Nodo', 'Ejecuciones', 'Desviación Estándar (ms)', 'AQ Code']
-            columns_to_keep_queries = [col for col in df.columns if col not in columns_to_exclude_queries]
+            # (las repeticiones y la desviación solo se muestran si hubo más de una ejecución medida)
+            columns_to_exclude_queries = ['ID Nodo', 'AQ Code', 'Intentos']
+            if df['Ejecuciones'].max() <= 1:
+                columns_to_exclude_queries += ['Ejecuciones', 'Desviación Estándar (ms)', 'IC Relativo (%)']
+            columns_to_keep_paths = [col for col in df.columns if col not in columns_to_exclude_queries]
+            columns_to_keep_queries = [col for col in columns_to_keep_paths
+                                       if col not in PERCENTILE_COLUMNS and col not in STREAM_COLUMNS]
             df_clean_queries = df[columns_to_keep_queries]
+            df_clean_paths = df[columns_to_keep_paths]
             
-            df_clean_queries.to_excel(output_excel_path, index=False)
-            print(f"Se guardaron {len(data)} consultas únicas en {output_excel_path}")
+            if not self.selective_queries:
+                print("\nModo estándar: procesando todos los patrones")
             
-            pattern_excel_path = os.path.join(output_folder, "paths_and_times_per_real_query.xlsx")
-            with pd.ExcelWriter(pattern_excel_path, engine='xlsxwriter') as writer:
-                # MODIFICACIÓN 2: También aplicar limpieza a paths_and_times_per_real_query.xlsx
-                df_clean_queries.to_excel(writer, sheet_name='Todos', index=False)
-                
-                workbook = writer.book
-                bold_format = workbook.add_format({'bold': True})
-                num_format = workbook.add_format({'num_format': '0'})
-                bold_num_format = workbook.add_format({'bold': True, 'num_format': '0'})
-                
-                worksheet = writer.sheets['Todos']
-                num_rows = len(df_clean_queries) + 1
-                
-                paths_col_idx = None
-                time_col_idx = None
-                
-                for i, col in enumerate(df_clean_queries.columns):
-                    if col == 'Número de Paths':
-                        paths_col_idx = i
-                    elif col == 'Tiempo Ejecución (ms)':
-                        time_col_idx = i
-                
-                if paths_col_idx is not None:
-                    paths_avg = df['Número de Paths'].mean()
-                    worksheet.write(num_rows + 1, 0, "Promedio de Paths:", bold_format)
-                    worksheet.write(num_rows + 1, paths_col_idx, paths_avg, bold_num_format)
-                
-                if time_col_idx is not None:
-                    time_avg = df['Tiempo Ejecución (ms)'].mean()
-                    worksheet.write(num_rows + 2, 0, "Promedio de Tiempo (ms):", bold_format)
-                    worksheet.write(num_rows + 2, time_col_idx, time_avg, bold_num_format)
-                
-                patterns = df['AQ'].unique()
-                
-                pool_final_queries = []
-                
-                if self.selective_queries:
-                    n_abstract = self.selective_queries.get('n_abstract', len(patterns))
-                    n_templates = self.selective_queries.get('n_templates', 2)
-                    n_real = self.selective_queries.get('n_real', 2)
-                    if n_abstract == '*':
-                        n_abstract = len(patterns)
-                    
-                    #print(f"\nModo selectivo: Seleccionando top {n_abstract} abstract queries con mayor promedio de paths")
-                    #print(f"Para cada abstract query: {n_templates} plantillas, {n_real} consultas reales por plantilla")
-                    
-                    pattern_averages = []
-                    for pattern in patterns:
-                        pattern_df = df[df['AQ'] == pattern]
-                        non_zero_df = pattern_df[pattern_df['Número de Paths'] > 0]
-                        
-                        if len(non_zero_df) > 0:
-                            avg_paths = non_zero_df['Número de Paths'].mean()
-                            q_number = None
-                            if pattern in self.pattern_to_q_number:
-                                q_number = self.pattern_to_q_number[pattern]
-                            
-                            pattern_averages.append({
-                                'pattern': pattern,
-                                'avg_paths': avg_paths,
-                                'q_number': q_number,
-                                'df': non_zero_df
-                            })
-                    
-                    pattern_averages.sort(key=lambda x: x['avg_paths'], reverse=True)
-                    
-                    selected_patterns = pattern_averages[:n_abstract]
-                    
-                    for item in selected_patterns:
-                        pattern = item['pattern']
-                        pattern_df = item['df']
-                        q_number = item['q_number']
-                        
-                        template_groups = {}
-                        for _, row in pattern_df.iterrows():
-                            template = row['Consulta Plantilla']
-                            if template not in template_groups:
-                                template_groups[template] = []
-                            template_groups[template].append(row)
-                        
-                        sorted_templates = []
-                        for template, rows in template_groups.items():
-                            avg_paths = sum(row['Número de Paths'] for row in rows) / len(rows)
-                            sorted_templates.append((template, avg_paths, rows))
-                        
-                        sorted_templates.sort(key=lambda x: x[1], reverse=True)
-                        
-                        # Si n_templates es '*', usar todas las plantillas
-                        if n_templates == '*':
-                            selected_templates = sorted_templates
-                        else:
-                            selected_templates = sorted_templates[:n_templates]
-                        
-                        #print(f"  - Patrón '{pattern}': {len(selected_templates)} plantillas seleccionadas")
-                        
-                        for template, avg_paths, rows in selected_templates:
-                            sorted_rows = sorted(rows, key=lambda row: row['Número de Paths'], reverse=True)
-                            selected_queries = sorted_rows[:n_real]
-                            
-                            for row in selected_queries:
-                                pool_final_queries.append({
-                                    'Consulta': row['Consulta'],
-                                    'AQ': pattern,
-                                    'Consulta Plantilla': row['Consulta Plantilla'],
-                                    'ID Nodo': row.get('ID Nodo', ''),
-                                    'Número de Paths': row['Número de Paths'],
-                                    'Tiempo Ejecución (ms)': row['Tiempo Ejecución (ms)'],
-                                    'Ejecuciones': row.get('Ejecuciones', 1),
-                                    'Desviación Estándar (ms)': row.get('Desviación Estándar (ms)', 0),
-                                    'Tipo': 'Selective',
-                                    'AQ Code': q_number
-                                })
-                    
-                    #print(f"\nTotal de consultas seleccionadas: {len(pool_final_queries)}")
-                
-                else:
-                    print("\nModo estándar: procesando todos los patrones")
-                    
-                for pattern in patterns:
-                    pattern_df = df[df['AQ'] == pattern]
-                    
-                    q_number = None
-                    if pattern in self.pattern_to_q_number:
-                        q_number = self.pattern_to_q_number[pattern]
-                    
-                    pattern_df = pattern_df.sort_values('Número de Paths', ascending=False)
-                    
-                    # Aplicar limpieza también a cada patrón
-                    pattern_df_clean = pattern_df[columns_to_keep_queries]
-                    
-                    sheet_name = self.sanitize_sheet_name(pattern)
-                    
-                    pattern_df_clean.to_excel(writer, sheet_name=sheet_name, index=False)
-                    
-                    worksheet = writer.sheets[sheet_name]
-                    num_rows = len(pattern_df_clean) + 1
-                    
-                    paths_col_idx = None
-                    time_col_idx = None
-                    
-                    for i, col in enumerate(pattern_df_clean.columns):
-                        if col == 'Número de Paths':
-                            paths_col_idx = i
-                        elif col == 'Tiempo Ejecución (ms)':
-                            time_col_idx = i
-                    
-                    if paths_col_idx is not None:
-                        paths_avg = pattern_df['Número de Paths'].mean()
-                        worksheet.write(num_rows + 1, 0, "Promedio de Paths:", bold_format)
-                        worksheet.write(num_rows + 1, paths_col_idx, paths_avg, bold_num_format)
-                    
-                    if time_col_idx is not None:
-                        time_avg = pattern_df['Tiempo Ejecución (ms)'].mean()
-                        worksheet.write(num_rows + 2, 0, "Promedio de Tiempo (ms):", bold_format)
-                        worksheet.write(num_rows + 2, time_col_idx, time_avg, bold_num_format)
-                    
-                    non_zero_df = pattern_df[pattern_df['Número de Paths'] > 0]
-                    
-                    if len(non_zero_df) > 0:
-                        n_queries = len(non_zero_df)
-                        
-                        template_groups = {}
-                        for _, row in non_zero_df.iterrows():
-                            template = row['Consulta Plantilla']
-                            if template not in template_groups:
-                                template_groups[template] = []
-                            template_groups[template].append(row)
-                
-                summary_data = []
-                for pattern in patterns:
-                    pattern_df = df[df['AQ'] == pattern]
-                    
-                    q_number = None
-                    if pattern in self.pattern_to_q_number:
-                        q_number = self.pattern_to_q_number[pattern]
-                    
-                    summary_data.append({
-                        'AQ': pattern,
-                        'AQ Code': q_number,
-                        'Número de Consultas': len(pattern_df),
-                        'Tiempo Promedio (ms)': pattern_df['Tiempo Ejecución (ms)'].mean(),
-                        'Tiempo Mínimo (ms)': pattern_df['Tiempo Ejecución (ms)'].min(),
-                        'Tiempo Máximo (ms)': pattern_df['Tiempo Ejecución (ms)'].max(),
-                        'Total Paths': pattern_df['Número de Paths'].sum(),
-                        'Promedio Paths': pattern_df['Número de Paths'].mean()
-                    })
-                
-                summary_df = pd.DataFrame(summary_data)
-                summary_df.to_excel(writer, sheet_name='Resumen', index=False)
-                
-                worksheet = writer.sheets['Resumen']
-                num_rows = len(summary_df) + 1
-                
-                worksheet.write(num_rows + 1, 0, "TOTAL / PROMEDIO GENERAL:", bold_format)
-                
-                for i, col in enumerate(summary_df.columns):
-                    if col == 'Número de Consultas':
-                        total = summary_df['Número de Consultas'].sum()
-                        worksheet.write(num_rows + 1, i, total, bold_format)
-                    elif col == 'Total Paths':
-                        total = summary_df['Total Paths'].sum()
-                        worksheet.write(num_rows + 1, i, total, bold_format)
-                    elif col == 'Tiempo Promedio (ms)':
-                        avg = summary_df['Tiempo Promedio (ms)'].mean()
-                        worksheet.write(num_rows + 1, i, avg, bold_num_format)
-                    elif col == 'Promedio Paths':
-                        avg = summary_df['Promedio Paths'].mean()
-                        worksheet.write(num_rows + 1, i, avg, bold_num_format)
-            
-            print(f"Se guardaron resultados organizados por AQ en {pattern_excel_path}")
-
-            # GENERAR RANKING DE TEMPLATES POR ABSTRACT QUERY
-            print("\nGenerando template_queries_rank.xlsx...")
-            ranking_templates_path = os.path.join(output_folder, "template_queries_rank.xlsx")
-            
-            with pd.ExcelWriter(ranking_templates_path, engine='xlsxwriter') as writer:
-                workbook = writer.book
-                bold_format = workbook.add_format({'bold': True})
-                num_format = workbook.add_format({'num_format': '0'})
-                bold_num_format = workbook.add_format({'bold': True, 'num_format': '0'})
-                
-                # Procesar cada AQ
-                for pattern in patterns:
-                    pattern_df = df[df['AQ'] == pattern]
-                    
-                    if pattern_df.empty:
-                        continue
-                    
-                    q_number = None
-                    if pattern in self.pattern_to_q_number:
-                        q_number = self.pattern_to_q_number[pattern]
-                    
-                    # Agrupar por Template Query y calcular estadísticas
-                    template_stats = []
-                    template_groups = pattern_df.groupby('Consulta Plantilla')
-                    
-                    for template, template_group in template_groups:
-                        promedio_paths = template_group['Número de Paths'].mean()
-                        promedio_tiempo = template_group['Tiempo Ejecución (ms)'].mean()
-                        
-                        template_stats.append({
-                            'Template Query': template,
-                            'Promedio Paths': promedio_paths,
-                            'Tiempo Promedio (ms)': promedio_tiempo
+            pattern_groups = df.groupby('AQ', sort=False)
+            
+            summary_columns = ['Número de Consultas', 'Tiempo Promedio (ms)', 'Tiempo Mínimo (ms)', 'Tiempo Máximo (ms)',
+                               'Total Paths', 'Promedio Paths'] + PERCENTILE_COLUMNS + PHASE_SHARE_COLUMNS
+            summary_df = aq_stats[summary_columns].reset_index()
+            summary_df.insert(1, 'AQ Code', summary_df['AQ'].map(self.pattern_to_q_number))
+            
+            length_df = None
+            if path_lengths:
+                length_data = []
+                for pattern, query_ids in pattern_groups['ID Consulta']:
+                    counts = defaultdict(int)
+                    for query_id in query_ids:
+                        for length, count in (path_lengths.get(query_id) or {}).items():
+                            counts[int(length)] += count
+                    total_paths = sum(counts.values())
+                    for length in sorted(counts):
+                        length_data.append({
+                            'AQ': pattern,
+                            'Largo (aristas)': length,
+                            'Paths': counts[length],
+                            'Porcentaje (%)': 100 * counts[length] / total_paths
                         })
-                    
-                    # Ordenar por promedio de paths (descendente)
-                    template_stats.sort(key=lambda x: x['Promedio Paths'], reverse=True)
-                    
-                    # Agregar ranking
-                    for i, stats in enumerate(template_stats, 1):
-                        stats['Ranking'] = i
-                    
-                    # Crear DataFrame para este patrón
-                    template_ranking_df = pd.DataFrame(template_stats)
-                    
-                    # MODIFICACIÓN 4: Solo mantener las columnas especificadas para template_queries_rank.xlsx
-                    column_order = ['Ranking', 'Template Query', 'Promedio Paths', 'Tiempo Promedio (ms)']
-                    template_ranking_df = template_ranking_df[column_order]
-                    
-                    # Crear nombre de hoja
-                    if q_number is not None:
-                        sheet_name = f"Q{int(q_number)}"
-                    else:
-                        sheet_name = self.sanitize_sheet_name(pattern)[:31]
-                    
-                    # Escribir a Excel
-                    template_ranking_df.to_excel(writer, sheet_name=sheet_name, index=False)
-                    
-                    # Formatear la hoja
-                    worksheet = writer.sheets[sheet_name]
-                    
-                    # Aplicar formato numérico a columnas de números
-                    for col_num, col_name in enumerate(template_ranking_df.columns):
-                        if col_name in ['Promedio Paths', 'Tiempo Promedio (ms)']:
-                            col_letter = chr(65 + col_num)
-                            worksheet.set_column(f'{col_letter}2:{col_letter}{len(template_ranking_df)+1}', None, num_format)
-                    
-                    # Agregar estadísticas al final
-                    num_rows = len(template_ranking_df) + 1
-                    
-                    # Promedio general de todos los templates
-                    if template_ranking_df['Promedio Paths'].notna().any():
-                        promedio_general_paths = template_ranking_df['Promedio Paths'].mean()
-                        worksheet.write(num_rows + 1, 0, "Promedio General Paths:", bold_format)
-                        worksheet.write(num_rows + 1, 2, promedio_general_paths, bold_num_format)
-                    
-                    if template_ranking_df['Tiempo Promedio (ms)'].notna().any():
-                        promedio_general_tiempo = template_ranking_df['Tiempo Promedio (ms)'].mean()
-                        worksheet.write(num_rows + 2, 0, "Promedio General Tiempo:", bold_format)
-                        worksheet.write(num_rows + 2, 3, promedio_general_tiempo, bold_num_format)
-            
-            print(f"Se creó el archivo template_queries_rank.xlsx con rankings de templates por abstract query")
-            
-            print("\nGenerando abstract_queries_rank.xlsx...")
-            abstract_stats = []
-
-            for pattern in patterns:
-                pattern_df = df[df['AQ'] == pattern]
-                if not pattern_df.empty:
-                    q_number = None
-                    if pattern in self.pattern_to_q_number:
-                        q_number = self.pattern_to_q_number[pattern]
-                    
-                    paths_promedio = pattern_df['Número de Paths'].mean()
-                    tiempo_promedio = pattern_df['Tiempo Ejecución (ms)'].mean()
-                    
-                    abstract_stats.append({
-                        'AQ Code': f"Q{int(q_number)}" if q_number is not None else "Desconocido",
-                        'AQ': pattern,
-                        'Promedio Paths': paths_promedio,
-                        'Tiempo Promedio (ms)': tiempo_promedio
-                    })
-
-            ranking_df = pd.DataFrame(abstract_stats)
+                if length_data:
+                    length_df = pd.DataFrame(length_data)
+            
+            # RANKING DE TEMPLATES POR ABSTRACT QUERY (una hoja por AQ)
+            template_rankings = []
+            # MODIFICACIÓN 4: Solo mantener las columnas especificadas para template_queries_rank.xlsx
+            column_order = (['Ranking', 'Template Query', 'Promedio Paths', 'Tiempo Promedio (ms)'] + PERCENTILE_COLUMNS
+                            + ['Tasa Timeout (%)'] + PHASE_COLUMNS + PHASE_SHARE_COLUMNS + ['Fase Dominante']
+                            + state_cols + resource_cols)
+            for pattern in aq_stats.index:
+                q_number = self.pattern_to_q_number.get(pattern)
+                
+                # Plantillas del AQ ordenadas por promedio de paths (descendente)
+                template_ranking_df = (template_stats.loc[pattern]
+                                       .sort_values('Promedio Paths', ascending=False, kind='stable')
+                                       .rename_axis('Template Query').reset_index())
+                template_ranking_df['Ranking'] = range(1, len(template_ranking_df) + 1)
+                template_ranking_df = template_ranking_df[column_order]
+                
+                # Nombre de la hoja
+                if q_number is not None:
+                    sheet_name = f"Q{int(q_number)}"
+                else:
+                    sheet_name = self.sanitize_sheet_name(pattern)[:31]
+                template_rankings.append((sheet_name, pattern, template_ranking_df))
+            
+            ranking_df = aq_stats.reset_index()
+            ranking_df.insert(0, 'AQ Code', ranking_df['AQ'].map(
+                lambda pattern: f"Q{int(self.pattern_to_q_number[pattern])}"
+                if self.pattern_to_q_number.get(pattern) is not None else "Desconocido"))
             if not ranking_df.empty:
                 ranking_df.sort_values('Promedio Paths', ascending=False, inplace=True)
                 
                 ranking_df.insert(0, 'Ranking', range(1, len(ranking_df) + 1))
                 
-                ranking_df = ranking_df[['Ranking', 'AQ Code', 'AQ', 'Promedio Paths', 'Tiempo Promedio (ms)']]
-                
-                ranking_path = os.path.join(output_folder, "abstract_queries_rank.xlsx")
-                
-                with pd.ExcelWriter(ranking_path, engine='xlsxwriter') as writer:
-                    ranking_df.to_excel(writer, sheet_name='Ranking', index=False)
-                    
-                    workbook = writer.book
-                    worksheet = writer.sheets['Ranking']
-                    num_format = workbook.add_format({'num_format': '0'})
-                    
-                    for i, col in enumerate(ranking_df.columns):
-                        if col in ['Promedio Paths', 'Tiempo Promedio (ms)']:
-                            col_letter = chr(65 + i)
-                            worksheet.set_column(f'{col_letter}2:{col_letter}{len(ranking_df)+1}', None, num_format)
-                
-                print(f"Se creó el archivo abstract_queries_rank.xlsx con el ranking de {len(ranking_df)} patrones abstractos")
+                ranking_columns = (['Ranking', 'AQ Code', 'AQ', 'Promedio Paths', 'Tiempo Promedio (ms)'] + PERCENTILE_COLUMNS
+                                   + ['Tasa Timeout (%)'] + PHASE_COLUMNS + PHASE_SHARE_COLUMNS + ['Fase Dominante']
+                                   + state_cols + resource_cols)
+                if self.sweep_results:
+                    # Dimensión de escalabilidad del barrido de concurrencia
+                    speedup_column = f'Aceleración x{self.sweep_max}'
+                    ranking_df[speedup_column] = ranking_df['AQ'].map(self.sweep_results)
+                    ranking_columns.append(speedup_column)
+                ranking_df = ranking_df[ranking_columns]
+            
+            # Almacén columnar: formato principal de los resultados
+            store = ResultStore(output_folder)
+            if store.available:
+                store.write("all_queries", df)
+                store.write("aq_summary", summary_df)
+                if length_df is not None:
+                    store.write("path_lengths", length_df)
+                if template_rankings:
+                    store.write("template_queries_rank", pd.concat(
+                        [frame.assign(**{'AQ Code': sheet_name, 'AQ': pattern})[['AQ Code', 'AQ'] + column_order]
+                         for sheet_name, pattern, frame in template_rankings], ignore_index=True))
+                if not ranking_df.empty:
+                    store.write("abstract_queries_rank", ranking_df)
+                print(f"Se guardaron {len(data)} consultas únicas y los rankings en {output_folder}/*.parquet")
             else:
-                print("No se pudo crear abstract_queries_rank.xlsx porque no hay datos suficientes")
+                print("⚠️  pyarrow no está instalado: los resultados se guardan solo en xlsx")
+            
+            if self.export_xlsx:
+                self.export_results_xlsx(output_folder, output_excel_name, df, aq_stats, pattern_groups,
+                                         df_clean_queries, df_clean_paths, columns_to_keep_paths, summary_df,
+                                         length_df, template_rankings, ranking_df)
+            
+            if ranking_df.empty:
+                print("No se pudo crear el ranking de abstract queries porque no hay datos suficientes")
 
             # Copiar rankings a la carpeta rankings/
             self.copy_rankings_to_folder(output_folder)
@@ -1723,23 +1909,17 @@ class PathBenchmark:
             print("🎯 RANKINGS GENERADOS EXITOSAMENTE")
             print("="*60)
             print(f"\n📊 Rankings guardados en:")
-            print(f"   - rankings/abstract_queries_rank.xlsx")
-            print(f"   - rankings/template_queries_rank.xlsx")
+            extensions = "/".join((["parquet"] if ResultStore.available else []) + (["xlsx"] if self.export_xlsx else []))
+            print(f"   - rankings/abstract_queries_rank.{extensions}")
+            print(f"   - rankings/template_queries_rank.{extensions}")
             print(f"   - rankings/rankingsNodes/")
             print(f"\n✅ Proceso completado. Los rankings están listos para usar.")
 
             # Terminar el servidor si está activo
-            if hasattr(self, 'server_process') and self.server_process and self.server_process.poll() is None:
-                print("\nTerminando el servidor MillenniumDB...")
-                self.server_process.terminate()
-                try:
-                    self.server_process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    self.server_process.kill()
-                print("Servidor terminado.")
+            if self.stop_mdb_server():
+                print("\nServidor MillenniumDB terminado.")
 
-            print("\nPresione Enter para salir...")
-            input()
+            self.pause()
             sys.exit(0)
 
             # Esta línea nunca se ejecutará
@@ -1751,6 +1931,78 @@ class PathBenchmark:
             traceback.print_exc()
             return 0
     
+    def export_results_xlsx(self, output_folder, output_excel_name, df, aq_stats, pattern_groups, df_clean_queries,
+                            df_clean_paths, columns_to_keep_paths, summary_df, length_df, template_rankings, ranking_df):
+        """
+        Exporta los resultados del análisis a los libros xlsx (all_queries,
+        paths_and_times_per_real_query y los dos rankings), con xlsxwriter en modo
+        constant_memory: cada hoja se escribe fila a fila, con las filas de resumen
+        después de la tabla.
+        """
+        def write_averages(export, worksheet, frame, rows, paths_avg, time_avg):
+            if 'Número de Paths' in frame.columns:
+                worksheet.write(rows + 1, 0, "Promedio de Paths:", export.bold_format)
+                worksheet.write(rows + 1, frame.columns.get_loc('Número de Paths'), export.cell(paths_avg),
+                                export.bold_num_format)
+            if 'Tiempo Ejecución (ms)' in frame.columns:
+                worksheet.write(rows + 2, 0, "Promedio de Tiempo (ms):", export.bold_format)
+                worksheet.write(rows + 2, frame.columns.get_loc('Tiempo Ejecución (ms)'), export.cell(time_avg),
+                                export.bold_num_format)
+        
+        output_excel_path = os.path.join(output_folder, output_excel_name)
+        with ExcelExport(output_excel_path) as export:
+            export.write_frame('Sheet1', df_clean_queries)
+        print(f"Se guardaron {len(df)} consultas únicas en {output_excel_path}")
+        
+        pattern_excel_path = os.path.join(output_folder, "paths_and_times_per_real_query.xlsx")
+        with ExcelExport(pattern_excel_path) as export:
+            # MODIFICACIÓN 2: También aplicar limpieza a paths_and_times_per_real_query.xlsx
+            worksheet = export.write_frame('Todos', df_clean_paths)
+            write_averages(export, worksheet, df_clean_paths, len(df_clean_paths) + 1,
+                           df['Número de Paths'].mean(), df['Tiempo Ejecución (ms)'].mean())
+            
+            for pattern, pattern_df in pattern_groups:
+                pattern_df_clean = pattern_df.sort_values('Número de Paths', ascending=False)[columns_to_keep_paths]
+                worksheet = export.write_frame(self.sanitize_sheet_name(pattern), pattern_df_clean)
+                write_averages(export, worksheet, pattern_df_clean, len(pattern_df_clean) + 1,
+                               aq_stats.at[pattern, 'Promedio Paths'], aq_stats.at[pattern, 'Tiempo Promedio (ms)'])
+            
+            worksheet = export.write_frame('Resumen', summary_df)
+            num_rows = len(summary_df) + 1
+            worksheet.write(num_rows + 1, 0, "TOTAL / PROMEDIO GENERAL:", export.bold_format)
+            for i, col in enumerate(summary_df.columns):
+                if col in ['Número de Consultas', 'Total Paths']:
+                    worksheet.write(num_rows + 1, i, export.cell(summary_df[col].sum()), export.bold_format)
+                elif col in ['Tiempo Promedio (ms)', 'Promedio Paths']:
+                    worksheet.write(num_rows + 1, i, export.cell(summary_df[col].mean()), export.bold_num_format)
+            
+            if length_df is not None:
+                export.write_frame('Largo de Paths', length_df)
+        print(f"Se guardaron resultados organizados por AQ en {pattern_excel_path}")
+        
+        ranking_templates_path = os.path.join(output_folder, "template_queries_rank.xlsx")
+        with ExcelExport(ranking_templates_path) as export:
+            for sheet_name, pattern, template_ranking_df in template_rankings:
+                worksheet = export.write_frame(sheet_name, template_ranking_df,
+                                               number_columns=['Promedio Paths', 'Tiempo Promedio (ms)'])
+                
+                # Promedio general de todos los templates, al final de la hoja
+                num_rows = len(template_ranking_df) + 1
+                if template_ranking_df['Promedio Paths'].notna().any():
+                    worksheet.write(num_rows + 1, 0, "Promedio General Paths:", export.bold_format)
+                    worksheet.write(num_rows + 1, 2, template_ranking_df['Promedio Paths'].mean(), export.bold_num_format)
+                if template_ranking_df['Tiempo Promedio (ms)'].notna().any():
+                    worksheet.write(num_rows + 2, 0, "Promedio General Tiempo:", export.bold_format)
+                    worksheet.write(num_rows + 2, 3, template_ranking_df['Tiempo Promedio (ms)'].mean(),
+                                    export.bold_num_format)
+        print(f"Se creó el archivo template_queries_rank.xlsx con rankings de templates por abstract query")
+        
+        if not ranking_df.empty:
+            ranking_path = os.path.join(output_folder, "abstract_queries_rank.xlsx")
+            with ExcelExport(ranking_path) as export:
+                export.write_frame('Ranking', ranking_df, number_columns=['Promedio Paths', 'Tiempo Promedio (ms)'])
+            print(f"Se creó el archivo abstract_queries_rank.xlsx con el ranking de {len(ranking_df)} patrones abstractos")
+
     def copy_rankings_to_folder(self, output_folder):
         """Copia los archivos de ranking a la carpeta rankings/"""
         try:
@@ -1759,17 +2011,13 @@ class PathBenchmark:
             if not os.path.exists(rankings_dest):
                 os.makedirs(rankings_dest, exist_ok=True)
             
-            source_abstract = os.path.join(output_folder, "abstract_queries_rank.xlsx")
-            if os.path.exists(source_abstract):
-                import shutil
-                dest_abstract = os.path.join(rankings_dest, "abstract_queries_rank.xlsx")
-                shutil.copy2(source_abstract, dest_abstract)
-            
-            source_templates = os.path.join(output_folder, "template_queries_rank.xlsx")
-            if os.path.exists(source_templates):
-                import shutil
-                dest_templates = os.path.join(rankings_dest, "template_queries_rank.xlsx")
-                shutil.copy2(source_templates, dest_templates)
+            # Cada ranking en los formatos que se hayan generado (Parquet y/o xlsx)
+            for name in ["abstract_queries_rank", "template_queries_rank"]:
+                for extension in [".parquet", ".xlsx"]:
+                    source = os.path.join(output_folder, name + extension)
+                    if os.path.exists(source):
+                        import shutil
+                        shutil.copy2(source, os.path.join(rankings_dest, name + extension))
             
             source_nodes = "rankingsNodes"
             if os.path.exists(source_nodes):
@@ -1783,7 +2031,10 @@ class PathBenchmark:
             print(f"⚠️ Error copiando rankings: {e}")
 
 
-    def run_benchmark(self):
+    def run_benchmark(self, concurrency=None):
+            if concurrency is not None:
+                self.concurrency = max(1, concurrency)
+            
             if hasattr(self, 'db_path') and self.db_path:
                 base_name = os.path.basename(self.db_path)
                 output_folder = f"resultados_analizer{base_name}"
@@ -1801,21 +2052,27 @@ class PathBenchmark:
                     self.generate_mappings_file()
                     self.node_mappings = self.load_mappings(self.mappings_file)
                 
-                print("📝 Generando script con TODAS las templates queries...")
-                script_path, total_queries = self.generate_query_script()
+                print("📝 Generando pool con TODAS las templates queries...")
+                queries, total_queries = self.generate_query_pool()
                 
-                if script_path and total_queries > 0:
-                    print(f"🚀 EJECUTANDO {total_queries} consultas al servidor...")
-                    print(f"Script a ejecutar: {script_path}")
+                if total_queries > 0:
+                    pending = self.split_cached_queries(queries)
+                    if pending:
+                        print(f"🚀 EJECUTANDO {len(pending)} consultas al servidor...")
+                        self.execute_query_pool(pending, concurrency=self.concurrency)
+                    else:
+                        # Todo el pool salió de la caché: no hay nada que leer de los logs
+                        self.log_segments = {log_file: [] for log_file in self.server_logs}
                     
-                    self.execute_query_script(script_path, total_queries)
+                    if self.sweep_max:
+                        self.run_concurrency_sweep(queries, output_folder)
                 else:
-                    print("❌ ERROR: No se pudo generar el script de consultas")
+                    print("❌ ERROR: No se pudo generar el pool de consultas")
                     return
                 
                 print("\n✅ Todas las consultas ejecutadas. Procediendo al análisis selectivo...")
             else:
-                print(f"📁 USANDO RESULTADOS EXISTENTES: {self.result_file}")
+                print(f"📁 USANDO RESULTADOS EXISTENTES: {', '.join(self.result_files)}")
             
             num_queries = self.parse_query_results(
                 output_folder=output_folder, 
@@ -1852,9 +2109,10 @@ class PathBenchmark:
                 print(f"- Consultas reales por template: {self.selective_queries.get('n_real', 3)}")
             
             total_time = 0
+            store = ResultStore(output_folder)
             if num_queries > 0:
                 try:
-                    df = pd.read_excel(output_excel_path)
+                    df = store.read("all_queries") if store.exists("all_queries") else pd.read_excel(output_excel_path)
                     if 'Tiempo Ejecución (ms)' in df.columns:
                         total_time = df['Tiempo Ejecución (ms)'].sum() / 1000
                         
@@ -1865,7 +2123,7 @@ class PathBenchmark:
                             })
                             
                 except Exception as e:
-                    print(f"Aviso: No se pudo leer el archivo Excel para cálculos: {e}")
+                    print(f"Aviso: No se pudieron leer los resultados para cálculos: {e}")
                     total_time = random.uniform(2, 10)
             else:
                 total_time = random.uniform(2, 10)
@@ -1878,97 +2136,196 @@ class PathBenchmark:
             else:
                 print(f"- Rendimiento medio: {random.uniform(800, 2000):.2f} ops/sec")
                     
-            print(f"- Resultados guardados en: {output_excel_path}")
+            print(f"- Resultados guardados en: {store.path('all_queries') if store.available else output_excel_path}")
             print(f"- Resultados por AQ: {os.path.join(output_folder, 'paths_and_times_per_real_query.xlsx')}")
             print(f"- Pool final de consultas: {os.path.join(output_folder, 'pool_final.xlsx')}")
 
-            input("\nPresione Enter para salir...")
+            self.pause()
             
-            if self.server_process and self.server_process.poll() is None:
-                print("Terminando el servidor MillenniumDB...")
-                self.server_process.terminate()
-                try:
-                    self.server_process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    self.server_process.kill()
+            if self.stop_mdb_server():
                 print("Servidor MillenniumDB terminado.")
 
 
 
 
 
-    def execute_query_script(self, script_path, total_queries, timeout=35000):
+    def execute_query_pool(self, queries, timeout=35000, concurrency=None):
         """
-        Nueva función específica para ejecutar el script de consultas
+        Ejecuta el pool de consultas reales directamente contra el servidor,
+        reutilizando conexiones HTTP persistentes y manteniendo hasta
+        `concurrency` consultas en vuelo. Con varias instancias de mdb-server el
+        pool se reparte en round-robin y cada instancia recibe su propio ejecutor.
         """
+        if concurrency is None:
+            concurrency = self.concurrency
+        total_queries = len(queries)
         try:
             print(f"\n⚡ Ejecutando {total_queries} consultas al servidor...")
+            if concurrency > 1:
+                print(f"   Concurrencia del cliente: {concurrency} consultas en vuelo por servidor")
+            if self.num_servers > 1:
+                print(f"   Repartidas entre {self.num_servers} servidores")
+            if self.adaptive:
+                print(f"   Repetición adaptativa: entre {self.repetitions} y {self.max_reps} repeticiones por consulta, "
+                      f"hasta que el IC 95% de la media quede bajo ±{100 * self.ci_target:.1f}%")
+            elif self.warmup or self.repetitions > 1:
+                print(f"   Calentamiento: {self.warmup} pasadas descartadas, {self.repetitions} repeticiones medidas por consulta")
+            if self.measure_states:
+                descriptions = {'cold': "en frío (reinicio del servidor antes de cada "
+                                        + ("consulta" if self.cold_group == "query" else "plantilla")
+                                        + (" y descarte de la caché de páginas" if self.evict_page_cache else "") + ")",
+                                'warm': "en caliente (cada consulta se ejecuta una vez sin medir justo antes)"}
+                for state in self.measure_states:
+                    print(f"   Medición {descriptions[state]}")
+            order = self.build_query_order()
+            print(f"   Orden de ejecución: {order.describe()}")
+            completed = self.open_journal()
+            if self.measure_states:
+                segments = QueryExecutor.build_state_segments(self.state_groups(queries), self.measure_states,
+                                                              self.repetitions, completed, order=order)
+                total_executions = sum(len(schedule) for _, schedule in segments)
+            else:
+                total_executions = len(QueryExecutor.build_schedule(queries, self.warmup, self.repetitions, completed))
+            if self.adaptive:
+                # Cota superior: el progreso termina antes si las consultas convergen
+                total_executions += len(queries) * (self.max_reps - self.repetitions)
+            if completed:
+                print(f"   Reanudando: {len(completed)} ejecuciones medidas ya estaban en {self.journal.path}; "
+                      f"quedan {total_executions}")
             print("Este proceso puede tardar varios minutos...")
             
-            with open("queries_output.txt", "w") as output_file:
-                self.query_process = subprocess.Popen(
-                    [f"./{script_path}"],
-                    stdout=output_file,
-                    stderr=output_file,
-                    shell=True
-                )
-                
-                completed_queries = 0
-                last_count = 0
-                start_time = time.time()
-                
-                progress_bar_length = 40
-                self.print_progress_bar(0, total_queries, progress_bar_length)
-                
-                while self.query_process.poll() is None:
-                    elapsed_time = time.time() - start_time
-                    if elapsed_time > timeout:
-                        print(f"\nTimeout después de {timeout} segundos. Terminando ejecución...")
-                        self.query_process.terminate()
-                        break
-                    
-                    time.sleep(2)
-                    
-                    if os.path.exists("result.txt"):
-                        try:
-                            with open("result.txt", 'r', encoding='utf-8', errors='replace') as f:
-                                log_content = f.read()
-                            
-                            completed_queries = log_content.count("Query received:")
-                            
-                            if completed_queries > last_count:
-                                completed_queries = min(completed_queries, total_queries)
-                                self.print_progress_bar(completed_queries, total_queries, progress_bar_length)
-                                last_count = completed_queries
-                        except Exception as e:
-                            print(f"\nError al leer result.txt: {e}")
-                            time.sleep(1)
-                
-                self.print_progress_bar(total_queries, total_queries, progress_bar_length)
-                print("\n✅ Consultas completadas. Resultados guardados en result.txt")
+            sample_interval = self.sample_interval_ms / 1000 if self.sample_interval_ms else None
+            if sample_interval and not proc_available():
+                print("   ⚠️  /proc no está disponible: no se medirán los recursos del servidor por consulta")
+                sample_interval = None
+            elif sample_interval:
+                print("   ℹ️  El muestreo de recursos corre en el cliente: las latencias del cliente incluyen su costo")
+                if concurrency > 1:
+                    print("   ℹ️  Con concurrencia, los recursos por consulta incluyen los de las consultas solapadas")
+            
+            shards = [queries[i::self.num_servers] for i in range(self.num_servers)]
+            self.query_executors = []
+            servers = self.servers or [None] * self.num_servers
+            for i, (url, server, log_file) in enumerate(zip(self.get_server_urls(), servers, self.server_logs)):
+                output_path = "queries_output.txt" if self.num_servers == 1 else f"queries_output_server{i}.txt"
+                self.query_executors.append(QueryExecutor(url=url, concurrency=concurrency,
+                                                          output_path=output_path, server=server,
+                                                          query_timeout=self.query_timeout,
+                                                          on_record=lambda o, log=log_file: self.journal.record(o, log),
+                                                          sample_interval=sample_interval,
+                                                          query_texts=self.query_catalog.texts))
+            
+            progress_bar_length = 40
+            progress_lock = threading.Lock()
+            progress = {'completed': 0}
+            
+            def report_progress(done, total):
+                with progress_lock:
+                    progress['completed'] += 1
+                    self.print_progress_bar(progress['completed'], total_executions, progress_bar_length)
+            
+            self.print_progress_bar(0, total_executions, progress_bar_length)
+            run_options = {
+                'progress_callback': report_progress,
+                'timeout': timeout,
+                'warmup': self.warmup,
+                'repetitions': self.repetitions,
+                'completed': completed,
+                'adaptive': {'ci_target': self.ci_target, 'max_reps': self.max_reps} if self.adaptive else None,
+                'states': self.measure_states or None,
+                'order': order
+            }
+            
+            def executor_options(executor, log_file, shard, server):
+                options = dict(run_options)
+                if self.adaptive:
+                    options['adaptive'] = dict(run_options['adaptive'],
+                                               samples=self.server_time_sampler(executor, log_file),
+                                               failed=self.earlier_failures(log_file))
+                if self.measure_states:
+                    options['groups'] = self.state_groups(shard)
+                    options['before_cold'] = lambda: self.cold_restart(server)
+                return options
+            
+            if self.num_servers == 1:
+                self.query_executors[0].run(queries, **executor_options(self.query_executors[0], self.server_logs[0],
+                                                                        queries, servers[0]))
+            else:
+                threads = []
+                for executor, shard, log_file, server in zip(self.query_executors, shards, self.server_logs, servers):
+                    thread = threading.Thread(target=executor.run, args=(shard,),
+                                              kwargs=executor_options(executor, log_file, shard, server))
+                    thread.start()
+                    threads.append(thread)
+                for thread in threads:
+                    thread.join()
+            
+            self.log_segments = {}
+            for log_file in self.server_logs:
+                self.log_segments[log_file] = [(start, end, self.journal.segment_outcomes(segment, log_file))
+                                               for segment, start, end in self.journal.log_ranges(log_file)]
+            outcomes = [o for executor in self.query_executors for o in executor.outcomes]
+            
+            failed = [o for o in outcomes if o['status'] not in (200, 'crashed')]
+            crashed = [o for o in outcomes if o['status'] == 'crashed']
+            print(f"\n✅ Consultas completadas. Resultados guardados en {', '.join(self.server_logs)}")
+            if crashed:
+                restarts = sum(server.restarts for server in self.servers)
+                print(f"💥 {len(crashed)} consultas en vuelo durante una caída del servidor ({restarts} reinicios por caída); "
+                      f"se reencolaron")
+            planned = sum(server.planned_restarts for server in self.servers)
+            if planned:
+                print(f"🧊 {planned} reinicios planificados para las mediciones en frío")
+            print(f"📝 Resultado por consulta guardado en queries_output*.txt")
+            print(f"🔀 Plan de ejecución guardado en {self.save_query_schedule()}")
+            if failed:
+                print(f"⚠️  {len(failed)} consultas no respondieron correctamente (ver queries_output*.txt)")
+            client_latency = LatencyHistogram.merged(histogram for executor in self.query_executors
+                                                     for histogram in executor.latency_histograms.values())
+            if client_latency.total:
+                print(f"⏱️  Latencia del cliente: p50 {client_latency.percentile(50):.2f} ms | "
+                      f"p99 {client_latency.percentile(99):.2f} ms | p99.9 {client_latency.percentile(99.9):.2f} ms | "
+                      f"máx {client_latency.max_ms:.2f} ms")
+            if self.adaptive:
+                reps = defaultdict(int)
+                for outcome in outcomes:
+                    if outcome['phase'] == 'measure' and outcome['status'] != 'crashed':
+                        reps[outcome_key(outcome)] += 1
+                if reps:
+                    capped = sum(1 for count in reps.values() if count >= self.max_reps)
+                    print(f"📐 Repeticiones por consulta: media {statistics.mean(reps.values()):.1f}, "
+                          f"máximo {max(reps.values())}; {capped} consultas alcanzaron el tope de {self.max_reps}")
+            
+            return outcomes
                 
         except Exception as e:
             print(f"❌ Error al ejecutar las consultas: {e}")
             import traceback
-            traceback.print_exc()        
+            traceback.print_exc()
+            return []
+        finally:
+            for executor in self.query_executors:
+                executor.close()
+            self.journal.close()
+
     def read_ranking_abstract(self, ranking_folder="rankings"):
-        ranking_path = os.path.join(ranking_folder, self.selected_scale, "abstract_queries_rank.xlsx")
-        if not os.path.exists(ranking_path):
-            print(f"Error: No se encontró {ranking_path}")
+        ranking_path = os.path.join(ranking_folder, self.selected_scale)
+        if not ranking_exists(ranking_path, "abstract_queries_rank"):
+            print(f"Error: No se encontró abstract_queries_rank en {ranking_path}")
             return []
         
-        df = pd.read_excel(ranking_path, sheet_name='Ranking')
+        df = read_ranking(ranking_path, "abstract_queries_rank", 'Ranking')
         return df.to_dict('records')
 
     def read_ranking_templates(self, ranking_folder="rankings", q_number=None):
-        ranking_path = os.path.join(ranking_folder, self.selected_scale, "template_queries_rank.xlsx")
-        if not os.path.exists(ranking_path):
-            print(f"Error: No se encontró {ranking_path}")
+        ranking_path = os.path.join(ranking_folder, self.selected_scale)
+        if not ranking_exists(ranking_path, "template_queries_rank"):
+            print(f"Error: No se encontró template_queries_rank en {ranking_path}")
             return []
         
         sheet_name = f"Q{q_number}" if q_number else 'Q1'
         try:
-            df = pd.read_excel(ranking_path, sheet_name=sheet_name)
+            df = read_ranking(ranking_path, "template_queries_rank", sheet_name)
             return df.to_dict('records')
         except Exception as e:
             print(f"Error leyendo sheet {sheet_name}: {e}")
@@ -2097,36 +2454,12 @@ class PathBenchmark:
         print(f"Excel: {excel_path}")
         print(f"TXT: {txt_path}")
 
-    def generate_query_script_from_pool(self, pool_queries, script_path="selective_query_script.sh"):
+    def generate_query_list_from_pool(self, pool_queries):
         if not pool_queries:
-            print("No hay consultas en el pool para generar script")
-            return None, 0
-        
-        script_content = """#!/bin/bash
-
-    BASE_URL="http://localhost:1234/query"
-
-    PATTERNS=(
-    """
+            print("No hay consultas en el pool para ejecutar")
+            return [], 0
         
-        for query_item in pool_queries:
-            real_query = query_item['Real_Query']
-            script_content += f'"{real_query}"\n'
-        
-        script_content += """)
-
-    for PATTERN in "${PATTERNS[@]}"; do
-        RESPONSE=$(curl -s -X POST "$BASE_URL" -d "$PATTERN")
-        echo "Ejecutando: $PATTERN"
-    done
-
-    echo "Todas las consultas se ejecutaron correctamente."
-    """
-        
-        with open(script_path, "w") as f:
-            f.write(script_content)
-        
-        os.chmod(script_path, 0o755)
+        queries = [query_item['Real_Query'] for query_item in pool_queries]
         
         query_info = {}
         for i, query_item in enumerate(pool_queries):
@@ -2140,7 +2473,7 @@ class PathBenchmark:
         with open("selective_query_info.json", "w") as f:
             json.dump(query_info, f, indent=2)
         
-        return script_path, len(pool_queries)
+        return queries, len(queries)
 
     def extract_node_from_query(self, query):
         match = re.search(r'MATCH \(([^)]+)\)=', query)
@@ -2208,22 +2541,22 @@ class PathBenchmark:
         """Maneja la interrupción del programa con CTRL+C"""
         print("\nInterrumpiendo...")
         
+        # Dejar de enviar consultas antes de detener el servidor para que no se reinicie
+        for executor in self.query_executors:
+            executor.stop()
+        
         # Terminar procesos si están activos
-        if self.server_process and self.server_process.poll() is None:
-            print("Terminando el servidor MillenniumDB...")
-            try:
-                self.server_process.terminate()
-                self.server_process.wait(timeout=5)
-            except:
-                self.server_process.kill()
+        if self.stop_mdb_server():
+            print("Servidor MillenniumDB terminado.")
             
-        if self.query_process and self.query_process.poll() is None:
-            print("Terminando el proceso de consultas...")
-            try:
-                self.query_process.terminate()
-                self.query_process.wait(timeout=5)
-            except:
-                self.query_process.kill()
+        if self.query_executors:
+            print("Cerrando las conexiones de consultas...")
+            for executor in self.query_executors:
+                executor.close()
+        
+        self.journal.close()
+        if self.journal.segments:
+            print(f"📒 Progreso guardado en {self.journal.path}; use --resume para continuar")
             
         print("Procesos terminados. Saliendo.")
         sys.exit(0)  
@@ -2241,13 +2574,13 @@ class PathBenchmark:
                 if not self.validate_rankings_exist():
                     print(f"❌ ERROR: No valid rankings found in rankings/{self.rankings_scale}/")
                     print("💡 Run with --calculate-new to generate rankings from scratch.")
-                    input("\nPress Enter to exit...")
+                    self.pause("\nPress Enter to exit...")
                     return
                 
                 self.generate_pool_from_rankings()
                 
                 #print("\n🎉 Pool generated successfully from existing rankings!")
-                input("\nPress Enter to exit...")
+                self.pause("\nPress Enter to exit...")
             
             else:
                 # BY DEFAULT: ALWAYS use calculate_new (even if operation_mode is "default_rankings" or "calculate_new")
@@ -2280,6 +2613,10 @@ class PathBenchmark:
                     total_nodes = sum(len(nodes) for nodes in self.node_mappings.values())
                     print(f"Mappings loaded: {num_labels} labels with {total_nodes} nodes in total")
                 
+                if not self.use_existing_results and not self.validate_resume():
+                    self.pause()
+                    return
+                
                 self.start_mdb_server()
                 self.run_benchmark()
 
@@ -2403,17 +2740,102 @@ DEFAULT CONFIGURATION:
                         help='Usar archivo de resultados existente (default: True)')
     results_group.add_argument('--calculate-new', action='store_true', default=False,
                         help='Calcular nuevos resultados ejecutando consultas')
-    results_group.add_argument('--result-file', type=str, default='result_1.txt',
-                        help='Archivo de resultados a usar cuando --use-existing está activo (default: result_1.txt)')
+    results_group.add_argument('--result-file', type=str, nargs='+', default=['result_1.txt'], metavar='FILE',
+                        help='Archivo(s) de resultados a usar cuando --use-existing está activo: registros de mediciones '
+                             '(.jsonl) o logs de mdb-server, que se importan y se combinan en un solo ranking (default: result_1.txt)')
+    results_group.add_argument('--parse-workers', type=int, default=None, metavar='N',
+                        help='Procesos para importar los logs; un log grande se divide en bloques entre consultas '
+                             '(default: número de núcleos)')
+    results_group.add_argument('--xlsx', action='store_true', default=False,
+                        help='Exportar también los resultados y rankings a xlsx; por defecto solo se guardan en Parquet '
+                             '(sin pyarrow instalado siempre se exportan)')
     results_group.add_argument('--use-rankings', type=str, metavar='SCALE',
                         help='Usar rankings existentes del scale factor especificado (ej: 01, 03, 1, 3)')
+    results_group.add_argument('--workspace', type=str, default=None, metavar='DIR',
+                        help='Directorio de trabajo propio de la ejecución: result.txt, query_info.json, nodos.txt, '
+                             'queries_output.txt, rankingsNodes/ y los resultados se escriben ahí (default: directorio actual)')
+    results_group.add_argument('--non-interactive', action='store_true', default=False,
+                        help='No esperar Enter al terminar ni ante errores (ejecuciones desatendidas, p. ej. scaleSweep.py)')
+    
+    execution_group = parser.add_argument_group('Ejecución de consultas')
+    execution_group.add_argument('--concurrency', type=int, default=1, metavar='N',
+                        help='Número máximo de consultas en vuelo contra el servidor (default: 1)')
+    execution_group.add_argument('--servers', type=int, default=1, metavar='K',
+                        help='Número de instancias de mdb-server sobre la misma base de datos; el pool se reparte entre ellas (default: 1)')
+    execution_group.add_argument('--base-port', type=int, default=1234,
+                        help='Puerto de la primera instancia; las siguientes usan puertos consecutivos (default: 1234)')
+    execution_group.add_argument('--warmup', type=int, default=0, metavar='W',
+                        help='Pasadas de calentamiento sobre todo el pool que se ejecutan y descartan (default: 0)')
+    execution_group.add_argument('--repetitions', type=int, default=1, metavar='M',
+                        help='Repeticiones medidas por consulta real, intercaladas entre el pool (default: 1)')
+    execution_group.add_argument('--adaptive', action='store_true', default=False,
+                        help='Repetir cada consulta hasta que el IC 95%% de su media sea menor que --ci-target; --repetitions pasa a ser el mínimo (al menos 3)')
+    execution_group.add_argument('--ci-target', type=float, default=5.0, metavar='PCT',
+                        help='Semiancho relativo objetivo del IC de la media en modo --adaptive, en porcentaje (default: 5)')
+    execution_group.add_argument('--max-reps', type=int, default=30, metavar='R',
+                        help='Máximo de repeticiones por consulta en modo --adaptive (default: 30)')
+    execution_group.add_argument('--sweep', type=int, default=None, metavar='N',
+                        help='Tras la medición, reproducir el pool con 1, 2, 4, ... N clientes y generar scalability.xlsx')
+    execution_group.add_argument('--sweep-aq', type=str, default=None, metavar='Q1,Q5',
+                        help='Limitar el barrido de concurrencia a estos AQ (default: todo el pool)')
+    execution_group.add_argument('--engine', choices=['mdb', 'reference'], default='mdb',
+                        help='Backend de consultas: mdb (mdb-server compilado) o reference (motor en Python sobre edges.txt, '
+                             'para escalas pequeñas sin MillenniumDB) (default: mdb)')
+    execution_group.add_argument('--measure-mode', choices=['mixed', 'cold', 'warm', 'both'], default='mixed',
+                        help='mixed: estado que deje el orden del pool; cold: reiniciar el servidor antes de cada grupo; '
+                             'warm: ejecutar cada consulta una vez sin medir justo antes; both: frío y caliente lado a lado (default: mixed)')
+    execution_group.add_argument('--cold-group', choices=['template', 'query'], default='template',
+                        help='Grupo entre reinicios en modo cold/both: todas las consultas de una plantilla o cada consulta (default: template)')
+    execution_group.add_argument('--evict-page-cache', action='store_true', default=False,
+                        help='En los reinicios en frío, descartar los archivos de la base de datos de la caché de páginas (posix_fadvise)')
+    execution_group.add_argument('--schedule', choices=['file', 'shuffle', 'interleave', 'latin'], default='file',
+                        help='Orden de las consultas en cada pasada: file (orden del pool), shuffle (permutación por pasada), '
+                             'interleave (round-robin entre AQ) o latin (cuadrado latino balanceado entre repeticiones) (default: file)')
+    execution_group.add_argument('--seed', type=int, default=None,
+                        help='Semilla de --schedule shuffle/latin; sin ella se genera una y se registra en query_schedule.json')
+    execution_group.add_argument('--sample-interval', type=float, default=0, metavar='MS',
+                        help='Intervalo de muestreo del RSS del servidor durante cada consulta; CPU, fallos de página, '
+                             'cambios de contexto y lecturas se miden al inicio y fin de la consulta. El muestreo corre '
+                             'en un hilo del cliente y compite con las mediciones de latencia, por eso está desactivado '
+                             'por defecto (default: 0)')
+    execution_group.add_argument('--startup-timeout', type=int, default=1800, metavar='SEG',
+                        help='Tiempo máximo de espera a que el servidor responda al sondeo de disponibilidad (default: 1800)')
+    execution_group.add_argument('--resume', action='store_true', default=False,
+                        help='Continuar una ejecución interrumpida desde run_journal.jsonl, omitiendo las consultas ya medidas')
+    execution_group.add_argument('--no-cache', action='store_true', default=False,
+                        help='No leer ni escribir la caché de mediciones por consulta')
+    execution_group.add_argument('--cache-dir', type=str, default='measurement_cache',
+                        help='Directorio de la caché de mediciones, una por huella de base de datos (default: measurement_cache)')
+    execution_group.add_argument('--query-timeout', type=float, default=40, metavar='SEG',
+                        help='Plazo del cliente por consulta; al agotarse se registra como timeout y se sigue con la siguiente (default: 40)')
     
     try:
         args = parser.parse_args()
         
+        if args.concurrency < 1:
+            raise argparse.ArgumentTypeError("--concurrency debe ser mayor que 0")
+        if args.servers < 1:
+            raise argparse.ArgumentTypeError("--servers debe ser mayor que 0")
+        if args.warmup < 0 or args.repetitions < 1:
+            raise argparse.ArgumentTypeError("--warmup debe ser >= 0 y --repetitions mayor que 0")
+        if args.ci_target <= 0 or args.max_reps < 1:
+            raise argparse.ArgumentTypeError("--ci-target y --max-reps deben ser mayores que 0")
+        if args.sweep is not None and args.sweep < 1:
+            raise argparse.ArgumentTypeError("--sweep debe ser mayor que 0")
+        if args.query_timeout <= 0:
+            raise argparse.ArgumentTypeError("--query-timeout debe ser mayor que 0")
+        if args.parse_workers is not None and args.parse_workers < 1:
+            raise argparse.ArgumentTypeError("--parse-workers debe ser mayor que 0")
+        if args.sample_interval < 0:
+            raise argparse.ArgumentTypeError("--sample-interval no puede ser negativo")
+        if args.measure_mode != 'mixed' and (args.adaptive or args.warmup):
+            raise argparse.ArgumentTypeError("--measure-mode no se combina con --adaptive ni --warmup "
+                                             "(el modo warm ya precalienta cada consulta)")
+        
         nodes_per_label_explicit = '--nodes-per-label' in sys.argv
         
-        if args.calculate_new:
+        # --resume continúa una ejecución de --calculate-new
+        if args.calculate_new or args.resume:
             use_existing_results = False
             result_file = "result.txt"
         else:
@@ -2452,6 +2874,16 @@ DEFAULT CONFIGURATION:
         print(f"   Nodos por etiqueta (final): {args.nodes_per_label}")
         print(f"   Modo selección nodos: {args.node_selection_mode}\n")
         
+        if args.workspace:
+            # Las rutas indicadas por el usuario se resuelven antes de cambiar de directorio
+            if args.db_path:
+                args.db_path = os.path.abspath(args.db_path)
+            args.result_file = [os.path.abspath(path) for path in args.result_file]
+            args.cache_dir = os.path.abspath(args.cache_dir)
+            workspace = prepare_workspace(args.workspace, os.getcwd())
+            os.chdir(workspace)
+            print(f"📂 Directorio de trabajo de la ejecución: {workspace}\n")
+        
         benchmark = PathBenchmark(
             patterns_file=patterns_file,
             abstract_patterns_file=abstract_patterns_file,
@@ -2464,7 +2896,32 @@ DEFAULT CONFIGURATION:
             result_file=result_file,
             nodes_per_label_explicit=nodes_per_label_explicit,
             use_rankings=getattr(args, 'use_rankings', None),
-            calculate_new=args.calculate_new
+            calculate_new=args.calculate_new or args.resume,
+            concurrency=args.concurrency,
+            num_servers=args.servers,
+            base_port=args.base_port,
+            startup_timeout=args.startup_timeout,
+            warmup=args.warmup,
+            repetitions=args.repetitions,
+            query_timeout=args.query_timeout,
+            resume=args.resume,
+            use_cache=not args.no_cache,
+            cache_dir=args.cache_dir,
+            adaptive=args.adaptive,
+            ci_target=args.ci_target / 100,
+            max_reps=args.max_reps,
+            sweep_max=args.sweep,
+            sweep_aq=[aq.strip().upper() for aq in args.sweep_aq.split(',')] if args.sweep_aq else None,
+            engine=args.engine,
+            sample_interval_ms=args.sample_interval,
+            measure_mode=args.measure_mode,
+            cold_group=args.cold_group,
+            evict_page_cache=args.evict_page_cache,
+            schedule_order=args.schedule,
+            schedule_seed=args.seed,
+            interactive=not args.non_interactive,
+            parse_workers=args.parse_workers or os.cpu_count() or 1,
+            export_xlsx=args.xlsx
         )
         
         if args.db_path:
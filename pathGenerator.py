@@ -6,12 +6,16 @@ import pandas as pd
 import argparse
 import re
 import csv
+from resultStore import ResultStore, ExcelExport, read_ranking, ranking_exists
 
 class PathBenchAnalizer:
     
-    def __init__(self, selective_queries=None, use_rankings="", node_selection_mode="max", cypher_expressions_path=None):
+    def __init__(self, selective_queries=None, use_rankings="", node_selection_mode="max", cypher_expressions_path=None,
+                 export_xlsx=False):
         self.rankings_scale = use_rankings
         self.cypher_expressions_path = cypher_expressions_path
+        # queries_full se guarda en Parquet; el xlsx solo se genera a pedido (o sin pyarrow)
+        self.export_xlsx = export_xlsx or not ResultStore.available
         
         if selective_queries is None:
             selective_queries = {
@@ -136,15 +140,15 @@ class PathBenchAnalizer:
             print(f"❌ Carpeta no encontrada: {ranking_base_path}")
             return False
         
+        # Cada ranking puede estar en Parquet o en xlsx
         required_files = [
-            "abstract_queries_rank.xlsx",
-            "template_queries_rank.xlsx"
+            "abstract_queries_rank",
+            "template_queries_rank"
         ]
         
         missing_files = []
         for file in required_files:
-            file_path = os.path.join(ranking_base_path, file)
-            if not os.path.exists(file_path):
+            if not ranking_exists(ranking_base_path, file):
                 missing_files.append(file)
             else:
                 print(f"✅ Encontrado: {file}")
@@ -297,16 +301,16 @@ class PathBenchAnalizer:
 
     def read_ranking_abstract_from_rankings(self):
         if self.rankings_scale:
-            ranking_path = os.path.join("rankings", self.rankings_scale, "abstract_queries_rank.xlsx")
+            ranking_path = os.path.join("rankings", self.rankings_scale)
         else:
-            ranking_path = os.path.join("rankings", "abstract_queries_rank.xlsx")
+            ranking_path = "rankings"
             
-        if not os.path.exists(ranking_path):
-            print(f"❌ Error: No se encontró {ranking_path}")
+        if not ranking_exists(ranking_path, "abstract_queries_rank"):
+            print(f"❌ Error: No se encontró abstract_queries_rank en {ranking_path}")
             return []
         
         try:
-            df = pd.read_excel(ranking_path, sheet_name='Ranking')
+            df = read_ranking(ranking_path, "abstract_queries_rank", 'Ranking')
             return df.to_dict('records')
         except Exception as e:
             print(f"❌ Error leyendo {ranking_path}: {e}")
@@ -314,17 +318,17 @@ class PathBenchAnalizer:
 
     def read_ranking_templates_from_rankings(self, q_number):
         if self.rankings_scale:
-            ranking_path = os.path.join("rankings", self.rankings_scale, "template_queries_rank.xlsx")
+            ranking_path = os.path.join("rankings", self.rankings_scale)
         else:
-            ranking_path = os.path.join("rankings", "template_queries_rank.xlsx")
+            ranking_path = "rankings"
         
-        if not os.path.exists(ranking_path):
-            print(f"❌ Error: No se encontró {ranking_path}")
+        if not ranking_exists(ranking_path, "template_queries_rank"):
+            print(f"❌ Error: No se encontró template_queries_rank en {ranking_path}")
             return []
         
         sheet_name = f"Q{q_number}"
         try:
-            df = pd.read_excel(ranking_path, sheet_name=sheet_name)
+            df = read_ranking(ranking_path, "template_queries_rank", sheet_name)
             return df.to_dict('records')
         except Exception as e:
             print(f"❌ Error leyendo sheet {sheet_name} de {ranking_path}: {e}")
@@ -676,15 +680,22 @@ class PathBenchAnalizer:
                         failed_transforms += 1
                 
                 results_df = pd.DataFrame(results)
-                excel_output_path = os.path.join(output_folder, "queries_full.xlsx")
-                results_df.to_excel(excel_output_path, index=False)
+                parquet_output_path = ResultStore(output_folder).write("queries_full", results_df)
+                excel_output_path = None
+                if self.export_xlsx:
+                    excel_output_path = os.path.join(output_folder, "queries_full.xlsx")
+                    with ExcelExport(excel_output_path) as export:
+                        export.write_frame('Sheet1', results_df)
                 
                 txt_output_path = self.save_transformed_queries_txt(results_df, output_folder)
                 
                 # Mostrar estadísticas finales
                 print(f"\n✅ Transformación completada!")
                 print(f"📁 Archivos generados:")
-                print(f"   📊 Excel: {excel_output_path}")
+                if parquet_output_path:
+                    print(f"   🗃️  Parquet: {parquet_output_path}")
+                if excel_output_path:
+                    print(f"   📊 Excel: {excel_output_path}")
                 if txt_output_path:
                     print(f"   📄 TXT: {txt_output_path}")
                 print(f"📈 Total de queries procesadas: {len(results_df)}")
@@ -810,6 +821,9 @@ Ejemplos de uso:
                         help='Modo de selección de nodos: max, med, min, .25, .75 (default: max)')
     parser.add_argument('--file-expressions', type=str, default=None,
                         help='Archivo Excel con expresiones Cypher para transformación automática (opcional)')
+    parser.add_argument('--xlsx', action='store_true', default=False,
+                        help='Exportar también queries_full a xlsx; por defecto solo se guarda en Parquet '
+                             '(sin pyarrow instalado siempre se exporta)')
     
     args = parser.parse_args()
     
@@ -828,7 +842,8 @@ Ejemplos de uso:
         selective_queries=selective_queries,
         use_rankings=args.use_rankings,
         node_selection_mode=args.node_selection_mode,
-        cypher_expressions_path=args.file_expressions  # CORREGIDO
+        cypher_expressions_path=args.file_expressions,  # CORREGIDO
+        export_xlsx=args.xlsx
     )
     
     benchmark.run()
\ No newline at end of file
@@ -0,0 +1,110 @@
+import json
+import os
+import hashlib
+
+
+# Bits del identificador: por debajo de 10^15, así que Excel lo conserva exacto
+ID_BITS = 48
+
+
+def content_id(query, original=None, abstract_pattern=None):
+    """
+    Identificador derivado del contenido de una consulta real: su AQ, su plantilla y
+    su texto (que incluye el nodo ancla). No depende de la posición en el pool, así
+    que se mantiene aunque cambien --rq, los nodos por etiqueta, los modos de
+    selección o el resto de las plantillas
+    """
+    key = "\x1f".join([abstract_pattern or "", original or "", query])
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big') >> (64 - ID_BITS)
+
+
+class QueryCatalog:
+    """
+    Consultas reales del pool, cada una con un identificador entero derivado de su
+    contenido (ver content_id) que acompaña a la consulta en la ejecución, el
+    journal, el registro de mediciones y el análisis. Como no depende del orden del
+    pool, una ejecución reanudada con otro pool sigue asociando cada medición a su
+    consulta. La misma consulta real generada desde dos plantillas (o dos AQ) recibe
+    dos identificadores, así que sus mediciones no se mezclan.
+
+    Se guarda en query_info.json como {"<id>": {"query", "original",
+    "abstract_pattern", "template_id", "node_id", "label"}}, donde template_id es la
+    posición de la plantilla en el archivo de plantillas. Un query_info.json antiguo,
+    indexado por el texto de la consulta, se convierte al cargarlo.
+    """
+
+    def __init__(self, path="query_info.json"):
+        self.path = path
+        self.queries = {}
+        self._ids_by_text = {}
+
+    def add(self, query, **info):
+        """
+        Registra una consulta real y devuelve su identificador. Si ya está registrada
+        (mismo texto, plantilla y AQ) devuelve el identificador existente; ante una
+        colisión del hash con otra consulta se usa el siguiente identificador libre
+        """
+        query_id = content_id(query, info.get('original'), info.get('abstract_pattern'))
+        while query_id in self.queries:
+            existing = self.queries[query_id]
+            if (existing['query'], existing.get('original'), existing.get('abstract_pattern')) == \
+                    (query, info.get('original'), info.get('abstract_pattern')):
+                return query_id
+            query_id = (query_id + 1) % (1 << ID_BITS)
+        self.queries[query_id] = dict(info, query=query)
+        self._ids_by_text.setdefault(query, query_id)
+        return query_id
+
+    def get(self, query_id):
+        """Datos de la consulta; vacío si el identificador no es del catálogo"""
+        return self.queries.get(query_id, {})
+
+    def text(self, query_id):
+        return self.queries[query_id]['query']
+
+    @property
+    def texts(self):
+        """Identificador → texto, para el ejecutor de consultas"""
+        return {query_id: info['query'] for query_id, info in self.queries.items()}
+
+    def lookup(self, query):
+        """
+        Identificador de una consulta a partir de su texto (el primero, si se generó
+        más de una vez), o None. Solo se usa para logs importados sin los resultados
+        del cliente, que no traen el identificador
+        """
+        return self._ids_by_text.get(query)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def __contains__(self, query_id):
+        return query_id in self.queries
+
+    def save(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({str(query_id): info for query_id, info in self.queries.items()}, f, indent=2,
+                      ensure_ascii=False)
+        return self.path
+
+    def load(self):
+        """Lee query_info.json si existe; un archivo ilegible deja el catálogo vacío"""
+        self.queries = {}
+        self._ids_by_text = {}
+        if not os.path.exists(self.path):
+            return self
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Advertencia: No se pudo cargar info de consultas: {e}")
+            return self
+        if all('query' in info for info in data.values()):
+            for query_id, info in data.items():
+                self.queries[int(query_id)] = info
+                self._ids_by_text.setdefault(info['query'], int(query_id))
+        else:
+            # Formato anterior: las claves son los textos de las consultas
+            for query, info in data.items():
+                self.add(query, **info)
+        return self
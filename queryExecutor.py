@@ -0,0 +1,564 @@
+import time
+import queue
+import socket
+import threading
+import http.client
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from timingStats import relative_ci, LatencyHistogram
+from resourceSampler import ResourceSampler, RESOURCE_KEYS
+
+
+# Tamaño de los bloques en que se lee el cuerpo de la respuesta
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Última línea del cuerpo cuando el servidor corta la consulta por su propio timeout
+TIMEOUT_LINE = "Query timeout"
+
+STREAM_COLUMNS = ['Paths Recibidos', 'Bytes Respuesta', 'TTFB (ms)', 'Paths/s', 'Bytes/s']
+
+
+def outcome_key(outcome):
+    """Consulta con la que se programó una ejecución: su identificador o, sin catálogo, su texto"""
+    return outcome['query'] if outcome.get('query_id') is None else outcome['query_id']
+
+
+class ResultStream:
+    """
+    Consumidor incremental del cuerpo de una respuesta de mdb-server: recibe los
+    bloques a medida que llegan y solo conserva la línea incompleta del final, así
+    que la memoria no crece con el tamaño del resultado (ALL TRAILS puede devolver
+    millones de paths).
+
+    Cada línea no vacía después del encabezado de variables (?p1) es un path; su
+    largo es la cantidad de aristas, es decir, de flechas -> o <- que contiene. La
+    línea TIMEOUT_LINE no es un path: marca que el servidor cortó la consulta
+    (timed_out).
+    """
+
+    def __init__(self):
+        self.bytes = 0
+        self.paths = 0
+        self.path_lengths = {}
+        self.timed_out = False
+        self._pending = b''
+        self._header = True
+
+    def feed(self, chunk):
+        self.bytes += len(chunk)
+        lines = (self._pending + chunk).split(b'\n')
+        self._pending = lines.pop()
+        for line in lines:
+            self._consume(line)
+
+    def close(self):
+        if self._pending:
+            self._consume(self._pending)
+            self._pending = b''
+
+    def _consume(self, line):
+        line = line.strip()
+        if not line:
+            return
+        if self._header:
+            self._header = False
+            if line.startswith(b'?'):
+                return
+        if line == TIMEOUT_LINE.encode('ascii'):
+            self.timed_out = True
+            return
+        length = line.count(b'->') + line.count(b'<-')
+        self.paths += 1
+        self.path_lengths[length] = self.path_lengths.get(length, 0) + 1
+
+
+def stream_columns(outcomes):
+    """
+    Paths y bytes recibidos por ejecución, tiempo al primer byte y tasas de
+    transferencia (paths/s y bytes/s sobre la latencia total) de una consulta
+    """
+    outcomes = [o for o in outcomes if o.get('ttfb_ms') is not None]
+    if not outcomes:
+        return {column: float('nan') for column in STREAM_COLUMNS}
+    seconds = sum(o['latency_ms'] for o in outcomes) / 1000
+    return {
+        'Paths Recibidos': sum(o['paths'] for o in outcomes) / len(outcomes),
+        'Bytes Respuesta': sum(o['bytes'] for o in outcomes) / len(outcomes),
+        'TTFB (ms)': sum(o['ttfb_ms'] for o in outcomes) / len(outcomes),
+        'Paths/s': sum(o['paths'] for o in outcomes) / seconds if seconds else float('nan'),
+        'Bytes/s': sum(o['bytes'] for o in outcomes) / seconds if seconds else float('nan')
+    }
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones HTTP persistentes (keep-alive) hacia el endpoint de consultas
+    de MillenniumDB. Las conexiones se crean bajo demanda y se reutilizan entre consultas.
+    """
+
+    def __init__(self, url="http://localhost:1234/query", size=1, timeout=None):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 80
+        self.path = parsed.path or "/"
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new_connection(self):
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def acquire(self):
+        """Obtiene una conexión libre del pool, creando una nueva si aún hay cupo"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self._new_connection()
+
+        return self._idle.get()
+
+    def release(self, conn, reusable=True):
+        """Devuelve una conexión al pool; si no es reutilizable se reemplaza por una nueva"""
+        if not reusable:
+            conn.close()
+            conn = self._new_connection()
+        self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+        with self._lock:
+            self._created = 0
+
+
+class QueryExecutor:
+    """
+    Ejecutor de consultas en proceso: envía cada consulta real por HTTP reutilizando
+    conexiones del pool y registra el resultado de cada una (estado, bytes y latencia
+    del cliente) a medida que se completa. El cuerpo de la respuesta se consume en
+    bloques con ResultStream: no se guarda, pero se cuentan sus paths, el histograma
+    de largos (path_lengths) y el tiempo hasta el primer byte del cuerpo (ttfb_ms).
+
+    Con concurrency > 1 se mantienen hasta N consultas en vuelo simultáneamente. Cada
+    resultado guarda su orden de envío (seq) y de finalización (done), que luego usa
+    logParser para atribuir los tiempos del servidor aunque el log se entrelace.
+
+    query_timeout (segundos) es el plazo del cliente para cada consulta completa,
+    desde el envío hasta el último byte de la respuesta: si se agota, la consulta se
+    registra con estado 'timeout' y la conexión se descarta. No basta con el timeout
+    del socket, que limita cada lectura por separado; un servidor que sigue enviando
+    bloques con pausas cortas lo superaría. Una respuesta que termina con TIMEOUT_LINE
+    (el servidor cortó la consulta por su propio timeout) también queda como 'timeout',
+    pero la conexión se conserva.
+
+    Si se entrega un MdbServer, un fallo de conexión se contrasta con el estado del
+    proceso: cuando el servidor se cayó se reinicia, la consulta en vuelo se registra
+    con estado 'crashed' y se vuelve a encolar (hasta max_requeues veces).
+
+    La latencia del cliente de cada ejecución medida y exitosa se acumula además en
+    un histograma por consulta (latency_histograms), combinable por plantilla o AQ. Los
+    percentiles de los rankings no salen de aquí sino del tiempo del servidor (ver
+    PathBenchmark.ranking_tables).
+    Con keep_outcomes=False no se conservan ni los resultados ni los histogramas, para
+    ejecuciones largas que llevan su propio registro (por ejemplo, loadGenerator).
+
+    on_record, si se indica, se invoca con cada resultado en cuanto se registra
+    (por ejemplo para anexarlo al journal de la ejecución).
+
+    Con sample_interval (segundos) y un MdbServer, cada resultado incluye además los
+    recursos que consumió el proceso del servidor durante la consulta (ver
+    ResourceSampler): CPU, pico de RSS, fallos de página, cambios de contexto y lecturas.
+
+    Con query_texts (identificador → texto, ver QueryCatalog) las consultas que
+    reciben run y execute son identificadores: se envía su texto y cada resultado
+    guarda ambos (query_id y query). Sin él las consultas son los textos.
+    """
+
+    def __init__(self, url="http://localhost:1234/query", concurrency=1, output_path="queries_output.txt",
+                 query_timeout=None, server=None, max_requeues=1, on_record=None, sample_interval=None,
+                 query_texts=None, keep_outcomes=True):
+        self.url = url
+        self.query_texts = query_texts
+        self.server = server
+        self.max_requeues = max_requeues
+        self.query_timeout = query_timeout
+        self.concurrency = max(1, concurrency)
+        self.pool = ConnectionPool(url, size=self.concurrency, timeout=query_timeout)
+        self.output_path = output_path
+        self.outcomes = []
+        self.keep_outcomes = keep_outcomes
+        self._done = 0
+        # Plan de ejecución (consulta, fase, repetición, estado) en el orden en que se encoló
+        self.schedule = []
+        self.latency_histograms = defaultdict(LatencyHistogram)
+        self.on_record = on_record
+        self.sampler = None
+        if server and sample_interval:
+            self.sampler = ResourceSampler(lambda: server.process.pid if server.is_alive() else None,
+                                           interval=sample_interval)
+        self._stopped = threading.Event()
+        self._output_file = None
+        self._output_lock = threading.Lock()
+        self._seq = 0
+
+    @staticmethod
+    def _remaining(deadline):
+        """Segundos que le quedan a la consulta antes de su plazo; TimeoutError si ya se agotó"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Plazo de la consulta agotado")
+        return remaining
+
+    def _post(self, conn, query, deadline=None):
+        """
+        Envía la consulta y consume la respuesta en bloques; devuelve (respuesta, stream,
+        instante del primer byte del cuerpo). Los encabezados no cuentan: un servidor que
+        transmite en bloques los envía antes de tener el primer resultado. Con deadline (time.monotonic()) el timeout del socket
+        de cada operación es el tiempo que le queda a la consulta, y entre bloques se
+        comprueba que no se haya agotado
+        """
+        body = query.encode('utf-8')
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Content-Length': str(len(body)),
+            'Connection': 'keep-alive'
+        }
+        if deadline is not None:
+            conn.timeout = self._remaining(deadline)
+            if conn.sock:
+                conn.sock.settimeout(conn.timeout)
+        conn.request('POST', self.pool.path, body=body, headers=headers)
+        # La respuesta puede cerrar la conexión (conn.sock = None) y seguir leyendo del socket
+        sock = conn.sock
+        if deadline is not None:
+            sock.settimeout(self._remaining(deadline))
+        response = conn.getresponse()
+        first_byte = None
+        stream = ResultStream()
+        while True:
+            if deadline is not None:
+                sock.settimeout(self._remaining(deadline))
+            # read1 devuelve lo que ya llegó (hasta STREAM_CHUNK_SIZE) sin esperar a completar el bloque
+            chunk = response.read1(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            if first_byte is None:
+                first_byte = time.perf_counter()
+            stream.feed(chunk)
+        stream.close()
+        if first_byte is None:
+            # Respuesta sin cuerpo: el primer byte es el final de la respuesta
+            first_byte = time.perf_counter()
+        return response, stream, first_byte
+
+    def execute(self, query, phase='measure', repetition=0, state=None):
+        """
+        Ejecuta una consulta (identificador o texto) y devuelve un diccionario con su
+        resultado. state indica el modo de medición explícito ('cold' o 'warm') o None
+        si no hay uno
+        """
+        query_id = query if self.query_texts is not None else None
+        if query_id is not None:
+            query = self.query_texts[query_id]
+        with self._output_lock:
+            seq = self._seq
+            self._seq += 1
+
+        outcome = {
+            'seq': seq,
+            'done': None,
+            'query_id': query_id,
+            'query': query,
+            'phase': phase,
+            'repetition': repetition,
+            'state': state,
+            'status': None,
+            'bytes': 0,
+            'latency_ms': None,
+            'ttfb_ms': None,
+            'paths': None,
+            'path_lengths': None,
+            'error': None
+        }
+        outcome.update(dict.fromkeys(RESOURCE_KEYS))
+
+        generation = self.server.restarts if self.server else 0
+        conn = self.pool.acquire()
+        reusable = True
+        token = self.sampler.begin() if self.sampler else None
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.query_timeout if self.query_timeout else None
+        try:
+            try:
+                response, stream, first_byte = self._post(conn, query, deadline)
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest, BrokenPipeError,
+                    ConnectionResetError):
+                # El servidor cerró la conexión keep-alive: reintentar una vez con una conexión nueva
+                conn.close()
+                start = time.perf_counter()
+                deadline = time.monotonic() + self.query_timeout if self.query_timeout else None
+                response, stream, first_byte = self._post(conn, query, deadline)
+
+            outcome['latency_ms'] = (time.perf_counter() - start) * 1000
+            outcome['ttfb_ms'] = (first_byte - start) * 1000
+            outcome['status'] = response.status
+            outcome['bytes'] = stream.bytes
+            if stream.timed_out:
+                outcome['status'] = 'timeout'
+                outcome['error'] = f"El servidor cortó la consulta por timeout tras {stream.paths} paths"
+            elif response.status == 200:
+                outcome['paths'] = stream.paths
+                outcome['path_lengths'] = stream.path_lengths
+            if response.will_close:
+                reusable = False
+        except (TimeoutError, socket.timeout):
+            # Antes de Python 3.10 socket.timeout no es subclase de TimeoutError
+            outcome['latency_ms'] = (time.perf_counter() - start) * 1000
+            outcome['status'] = 'timeout'
+            outcome['error'] = f"Sin respuesta completa tras {self.query_timeout} s"
+            connection_lost = False
+            reusable = False
+        except Exception as e:
+            outcome['latency_ms'] = (time.perf_counter() - start) * 1000
+            outcome['status'] = 'error'
+            outcome['error'] = str(e)
+            connection_lost = isinstance(e, (ConnectionError, http.client.HTTPException))
+            reusable = False
+        else:
+            connection_lost = False
+        finally:
+            self.pool.release(conn, reusable=reusable)
+            if self.sampler:
+                outcome.update(self.sampler.end(token))
+
+        if connection_lost and self.server and not self._stopped.is_set():
+            self.server.ensure_running()
+            if self.server.restarts != generation:
+                outcome['status'] = 'crashed'
+
+        self._record(outcome)
+        return outcome
+
+    def _record(self, outcome):
+        with self._output_lock:
+            outcome['done'] = self._done
+            self._done += 1
+            if self.keep_outcomes:
+                self.outcomes.append(outcome)
+                if outcome['status'] == 200 and outcome['phase'] == 'measure':
+                    self.latency_histograms[outcome_key(outcome)].record(outcome['latency_ms'])
+            if self._output_file:
+                latency = f"{outcome['latency_ms']:.3f}" if outcome['latency_ms'] is not None else ""
+                ttfb = f"{outcome['ttfb_ms']:.3f}" if outcome['ttfb_ms'] is not None else ""
+                paths = outcome['paths'] if outcome['paths'] is not None else ""
+                query_id = outcome['query_id'] if outcome['query_id'] is not None else ""
+                self._output_file.write(f"{outcome['seq']}\t{outcome['done']}\t{query_id}\t{outcome['phase']}\t"
+                                        f"{outcome['repetition']}\t{outcome['status']}\t"
+                                        f"{outcome['bytes']}\t{paths}\t{ttfb}\t{latency}\t{outcome['query']}\n")
+                self._output_file.flush()
+            if self.on_record:
+                self.on_record(outcome)
+
+    @staticmethod
+    def build_schedule(queries, warmup=0, repetitions=1, completed=None, order=None):
+        """
+        Intercala las iteraciones sobre todo el pool: primero `warmup` pasadas que se
+        descartan y luego `repetitions` pasadas medidas. Así ninguna consulta repite
+        de inmediato y los efectos de primer acceso quedan en el calentamiento.
+
+        completed es un conjunto de pares (consulta, repetición) ya medidos en una
+        ejecución anterior: se omiten, y el calentamiento solo se repite para las
+        consultas a las que aún les queda alguna repetición.
+
+        order(consultas, pasada, total de pasadas) da el orden de cada pasada (por
+        ejemplo un QueryOrder); sin él se usa el orden de la lista.
+        """
+        completed = completed or set()
+        pending = [q for q in queries if any((q, r) not in completed for r in range(repetitions))]
+        passes = warmup + repetitions
+        schedule = []
+        for iteration in range(passes):
+            if iteration < warmup:
+                phase, repetition = 'warmup', iteration
+            else:
+                phase, repetition = 'measure', iteration - warmup
+            for query in (order(pending, iteration, passes) if order else pending):
+                if phase == 'measure' and (query, repetition) in completed:
+                    continue
+                schedule.append((query, phase, repetition, None))
+        return schedule
+
+    @staticmethod
+    def build_state_segments(groups, states, repetitions=1, completed=None, order=None):
+        """
+        Tramos de ejecución para los modos de medición explícitos. Por cada repetición,
+        grupo y estado se genera un tramo (frío, schedule): los tramos fríos se ejecutan
+        tras reiniciar el servidor, y en los calientes cada consulta se ejecuta una vez
+        sin medir justo antes de su medición. Con ambos estados, cada grupo se mide
+        primero en frío y luego en caliente.
+
+        completed contiene ternas (consulta, repetición, estado) ya medidas, que se omiten.
+        order, si se indica, ordena los grupos de cada repetición como en build_schedule.
+        """
+        completed = completed or set()
+        segments = []
+        for repetition in range(repetitions):
+            for group in (order(groups, repetition, repetitions) if order else groups):
+                for state in states:
+                    schedule = [(query, 'measure', repetition, state) for query in group
+                                if (query, repetition, state) not in completed]
+                    if schedule:
+                        segments.append((state == 'cold', schedule))
+        return segments
+
+    def unconverged_queries(self, queries, ci_target, samples=None, failed=None):
+        """
+        Consultas cuyo intervalo de confianza relativo sigue por encima de ci_target.
+        samples es un diccionario consulta -> tiempos medidos; si no se entrega se usa
+        la latencia del cliente. Las que tuvieron un timeout o error no se repiten más,
+        ni las de failed (por ejemplo, las que fallaron antes de reanudar).
+        """
+        latencies = defaultdict(list)
+        failed = set(failed or ())
+        for outcome in self.outcomes:
+            if outcome['phase'] != 'measure' or outcome['status'] == 'crashed':
+                continue
+            if outcome['status'] == 200:
+                latencies[outcome_key(outcome)].append(outcome['latency_ms'])
+            else:
+                failed.add(outcome_key(outcome))
+        if samples is None:
+            samples = latencies
+        return [query for query in dict.fromkeys(queries)
+                if query not in failed and relative_ci(samples.get(query, [])) > ci_target]
+
+    def run(self, queries, progress_callback=None, timeout=None, warmup=0, repetitions=1, completed=None,
+            adaptive=None, states=None, groups=None, before_cold=None, order=None):
+        """
+        Ejecuta la lista de consultas con self.concurrency hilos que toman trabajo de
+        una cola común, con `warmup` pasadas de calentamiento y `repetitions` pasadas
+        medidas. Si se indica un timeout global (segundos) se dejan de enviar
+        consultas una vez superado.
+
+        Con adaptive = {'ci_target': ..., 'max_reps': ...} las `repetitions` pasadas son
+        el mínimo: después se agregan pasadas solo con las consultas cuyo intervalo de
+        confianza relativo de la media sigue siendo mayor que ci_target, hasta max_reps.
+        adaptive['samples'], si existe, es una función sin argumentos que devuelve los
+        tiempos medidos por consulta (por ejemplo, los del log del servidor), y
+        adaptive['failed'] las consultas que ya fallaron en una ejecución anterior.
+
+        Con states (['cold'], ['warm'] o ambos) se mide por grupos de consultas (groups,
+        por defecto una sola) según build_state_segments, y before_cold se invoca antes
+        de cada tramo frío para reiniciar el servidor; warmup no se usa en este modo.
+
+        order define el orden de cada pasada (ver build_schedule). El plan efectivo,
+        incluidas las pasadas adaptativas, queda en self.schedule.
+        """
+        if states:
+            segments = self.build_state_segments(groups or [queries], states, repetitions=repetitions,
+                                                 completed=completed, order=order)
+        else:
+            segments = [(False, self.build_schedule(queries, warmup=warmup, repetitions=repetitions,
+                                                    completed=completed, order=order))]
+        deadline = time.time() + timeout if timeout is not None else None
+        timed_out = threading.Event()
+        progress_lock = threading.Lock()
+        progress = {'completed': 0, 'total': 0}
+
+        def execute_pass(schedule):
+            work = queue.Queue()
+            self.schedule.extend(schedule)
+            for query, phase, repetition, state in schedule:
+                work.put((query, phase, repetition, state, 0))
+            progress['total'] += len(schedule)
+
+            def worker():
+                while True:
+                    try:
+                        query, phase, repetition, state, requeues = work.get_nowait()
+                    except queue.Empty:
+                        return
+                    if self._stopped.is_set():
+                        return
+                    if deadline is not None and time.time() > deadline:
+                        timed_out.set()
+                        return
+
+                    if state == 'warm':
+                        # Precalentar: la misma consulta se ejecuta una vez sin medir justo antes
+                        self.execute(query, phase='warmup', repetition=repetition, state=state)
+                    outcome = self.execute(query, phase=phase, repetition=repetition, state=state)
+                    if outcome['status'] == 'crashed' and requeues < self.max_requeues:
+                        # Reencolar la consulta que estaba en vuelo cuando el servidor se cayó
+                        work.put((query, phase, repetition, state, requeues + 1))
+                        continue
+
+                    with progress_lock:
+                        progress['completed'] += 1
+                        if progress_callback:
+                            progress_callback(progress['completed'], progress['total'])
+
+            if self.concurrency == 1:
+                worker()
+            else:
+                threads = [threading.Thread(target=worker) for _ in range(self.concurrency)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+        self._output_file = open(self.output_path, 'w', encoding='utf-8') if self.output_path else None
+        try:
+            if self._output_file:
+                self._output_file.write("seq\tdone\tquery_id\tphase\trepetition\tstatus\tbytes\tpaths\tttfb_ms\tlatency_ms\tquery\n")
+
+            for cold, schedule in segments:
+                if timed_out.is_set() or self._stopped.is_set():
+                    break
+                if cold and before_cold:
+                    before_cold()
+                execute_pass(schedule)
+
+            if adaptive:
+                repetition = repetitions
+                while repetition < adaptive['max_reps'] and not timed_out.is_set() and not self._stopped.is_set():
+                    samples = adaptive['samples']() if adaptive.get('samples') else None
+                    pending = self.unconverged_queries(queries, adaptive['ci_target'], samples,
+                                                       adaptive.get('failed'))
+                    if not pending:
+                        break
+                    if order:
+                        pending = order(pending, warmup + repetition, warmup + adaptive['max_reps'])
+                    execute_pass([(query, 'measure', repetition, None) for query in pending
+                                  if (query, repetition) not in (completed or ())])
+                    repetition += 1
+
+            if timed_out.is_set():
+                print(f"\nTimeout después de {timeout} segundos. Se detuvo el envío de consultas.")
+        finally:
+            if self._output_file:
+                self._output_file.close()
+                self._output_file = None
+
+        return self.outcomes
+
+    def stop(self):
+        """Deja de tomar consultas de la cola; las que están en vuelo terminan normalmente"""
+        self._stopped.set()
+
+    def close(self):
+        self.pool.close()
+        if self.sampler:
+            self.sampler.stop()
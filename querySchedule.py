@@ -0,0 +1,79 @@
+import random
+
+
+# Estrategias de orden de las consultas dentro de cada pasada sobre el pool
+SCHEDULE_ORDERS = ['file', 'shuffle', 'interleave', 'latin']
+
+
+def new_seed():
+    """Semilla aleatoria para cuando no se indica una; se registra para poder reproducir el orden"""
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+def williams_sequence(n):
+    """
+    Primera fila de un cuadrado latino balanceado de Williams: 0, 1, n-1, 2, n-2, ...
+    La fila r se obtiene sumando r módulo n. Con n par, en el cuadrado completo cada
+    elemento ocupa cada posición una vez y precede a cada uno de los demás una vez.
+    """
+    sequence = [0]
+    for step in range(1, n):
+        sequence.append((sequence[-1] + (step if step % 2 else -step)) % n)
+    return sequence
+
+
+class QueryOrder:
+    """
+    Orden reproducible de las consultas en cada pasada sobre el pool.
+
+    - file: el orden del pool (consultas de una misma plantilla y nodo seguidas).
+    - shuffle: permutación aleatoria distinta en cada pasada, derivada de la semilla.
+    - interleave: round-robin entre AQ (una consulta de cada AQ por turno), con el
+      AQ inicial rotando entre pasadas.
+    - latin: las pasadas son filas espaciadas de un cuadrado latino balanceado de
+      Williams sobre una permutación de la semilla, así que cada consulta cambia de
+      posición entre repeticiones y ninguna sigue siempre a la misma.
+
+    group_of devuelve el AQ de una consulta (para interleave). Los elementos pueden ser
+    consultas o listas de consultas (grupos de la medición en frío), que se ordenan
+    como una unidad según su primera consulta.
+    """
+
+    def __init__(self, strategy="file", seed=None, group_of=None):
+        self.strategy = strategy
+        self.seed = seed
+        self.group_of = group_of or (lambda query: query)
+
+    def describe(self):
+        if self.strategy in ('shuffle', 'latin'):
+            return f"{self.strategy} (semilla {self.seed})"
+        return self.strategy
+
+    def _group(self, item):
+        return self.group_of(item[0] if isinstance(item, list) else item)
+
+    def __call__(self, items, iteration=0, passes=1):
+        """Orden de items para la pasada `iteration` de un total de `passes`"""
+        items = list(items)
+        if self.strategy == 'file' or len(items) < 2:
+            return items
+        if self.strategy == 'shuffle':
+            random.Random(f"{self.seed}:{iteration}").shuffle(items)
+            return items
+        if self.strategy == 'interleave':
+            groups = {}
+            for item in items:
+                groups.setdefault(self._group(item), []).append(item)
+            queues = list(groups.values())
+            shift = iteration % len(queues)
+            queues = queues[shift:] + queues[:shift]
+            ordered = []
+            for turn in range(max(len(q) for q in queues)):
+                ordered.extend(q[turn] for q in queues if turn < len(q))
+            return ordered
+        if self.strategy == 'latin':
+            random.Random(f"{self.seed}").shuffle(items)
+            n = len(items)
+            row = iteration * max(1, n // max(1, passes)) % n
+            return [items[(position + row) % n] for position in williams_sequence(n)]
+        raise ValueError(f"Estrategia de orden desconocida: {self.strategy}")
@@ -0,0 +1,495 @@
+import os
+import re
+import sys
+import time
+import argparse
+import threading
+from array import array
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from queryExecutor import TIMEOUT_LINE
+
+
+# MATCH (anchor)=[ALL TRAILS ?p1 <expresión>]=>(?y) RETURN ?p1
+QUERY_PATTERN = re.compile(
+    r"^MATCH\s*\((?P<anchor>[^?)][^)]*)\)\s*=\[\s*ALL\s+TRAILS\s+\?(?P<path>\w+)\s+(?P<rpq>.+)\]=>\s*"
+    r"\(\?(?P<target>\w+)\)\s*RETURN\s+\?(?P<ret>\w+)\s*$"
+)
+# Consulta de sondeo de serverManager
+NODE_PATTERN = re.compile(r"^MATCH\s*\(\?(?P<var>\w+)\)\s*RETURN\s+\?\w+(?:\s+LIMIT\s+(?P<limit>\d+))?\s*$")
+
+# Cada cuántas aristas recorridas se revisa el timeout durante la enumeración
+TIMEOUT_CHECK_EVERY = 1024
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+class Graph:
+    """
+    Grafo de edges.txt (origen,etiqueta,destino por línea) en arreglos compactos: los
+    nodos y las etiquetas se numeran, y las aristas de cada etiqueta se guardan en
+    formato CSR (offsets por nodo origen y destinos contiguos). El identificador de
+    una arista es su posición global, que es lo que se usa para la restricción TRAILS.
+    """
+
+    def __init__(self):
+        self.node_names = []
+        self.node_ids = {}
+        self.labels = {}
+        self.offsets = []
+        self.targets = []
+        self.bases = []
+
+    def _node(self, name):
+        node = self.node_ids.get(name)
+        if node is None:
+            node = self.node_ids[name] = len(self.node_names)
+            self.node_names.append(name)
+        return node
+
+    @classmethod
+    def load(cls, edges_path):
+        graph = cls()
+        sources, labels, targets = array('l'), array('l'), array('l')
+        with open(edges_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.strip().split(',')
+                if len(parts) < 3:
+                    continue
+                label = graph.labels.setdefault(parts[1], len(graph.labels))
+                sources.append(graph._node(parts[0]))
+                labels.append(label)
+                targets.append(graph._node(parts[2]))
+
+        # Ordenamiento por conteo: aristas agrupadas por etiqueta y luego por origen
+        n_nodes = len(graph.node_names)
+        counts = [array('l', [0]) * (n_nodes + 1) for _ in graph.labels]
+        for source, label in zip(sources, labels):
+            counts[label][source + 1] += 1
+        base = 0
+        for label in range(len(graph.labels)):
+            offsets = counts[label]
+            for node in range(n_nodes):
+                offsets[node + 1] += offsets[node]
+            graph.offsets.append(offsets)
+            graph.bases.append(base)
+            base += offsets[n_nodes]
+        graph.targets = [array('l', [0]) * graph.offsets[label][n_nodes] for label in range(len(graph.labels))]
+        cursor = [array('l', offsets) for offsets in graph.offsets]
+        for source, label, target in zip(sources, labels, targets):
+            position = cursor[label][source]
+            graph.targets[label][position] = target
+            cursor[label][source] += 1
+        graph.label_names = {label: name for name, label in graph.labels.items()}
+        return graph
+
+    @property
+    def edge_count(self):
+        return sum(len(targets) for targets in self.targets)
+
+    def neighbors(self, node, label):
+        """(id de arista, destino) de las aristas salientes de node con la etiqueta dada"""
+        offsets = self.offsets[label]
+        targets = self.targets[label]
+        base = self.bases[label]
+        for position in range(offsets[node], offsets[node + 1]):
+            yield base + position, targets[position]
+
+
+class Automaton:
+    """
+    Autómata finito no determinista (construcción de Thompson) de una expresión de
+    caminos con etiquetas (:a), concatenación (/), alternativa (|), opcional (?),
+    clausuras (* y +) y repetición acotada ({m,n}). Los conjuntos de estados se
+    determinizan a demanda, así que cada secuencia de aristas se recorre una sola vez.
+    """
+
+    def __init__(self, expression):
+        self.epsilon = []
+        self.moves = []
+        self.text = expression
+        self.pos = 0
+        start, end = self._alternative()
+        self._skip_spaces()
+        if self.pos != len(self.text):
+            raise QuerySyntaxError(f"Carácter inesperado '{self.text[self.pos]}' en la posición {self.pos}")
+        self.accept = end
+        self.start = self.closure({start})
+        self._steps = {}
+
+    def _state(self):
+        self.epsilon.append([])
+        self.moves.append([])
+        return len(self.epsilon) - 1
+
+    def _skip_spaces(self):
+        while self.pos < len(self.text) and self.text[self.pos].isspace():
+            self.pos += 1
+
+    def _peek(self):
+        self._skip_spaces()
+        return self.text[self.pos] if self.pos < len(self.text) else ''
+
+    def _alternative(self):
+        start, end = self._sequence()
+        while self._peek() == '|':
+            self.pos += 1
+            other_start, other_end = self._sequence()
+            new_start, new_end = self._state(), self._state()
+            self.epsilon[new_start] += [start, other_start]
+            self.epsilon[end].append(new_end)
+            self.epsilon[other_end].append(new_end)
+            start, end = new_start, new_end
+        return start, end
+
+    def _sequence(self):
+        start, end = self._postfix()
+        while self._peek() == '/':
+            self.pos += 1
+            next_start, next_end = self._postfix()
+            self.epsilon[end].append(next_start)
+            end = next_end
+        return start, end
+
+    def _postfix(self):
+        atom_start = self.pos
+        start, end = self._atom()
+        atom_end = self.pos
+        while self._peek() in ('?', '*', '+', '{'):
+            operator = self.text[self.pos]
+            self.pos += 1
+            if operator == '{':
+                match = re.compile(r"\s*(\d+)\s*,\s*(\d+)\s*}").match(self.text, self.pos)
+                if not match:
+                    raise QuerySyntaxError(f"Repetición inválida en la posición {self.pos}")
+                self.pos = match.end()
+                minimum, maximum = int(match.group(1)), int(match.group(2))
+                if minimum > maximum:
+                    raise QuerySyntaxError(f"Repetición {{{minimum},{maximum}}} inválida")
+                start, end = self._repeat(atom_start, atom_end, start, end, minimum, maximum)
+            else:
+                new_start, new_end = self._state(), self._state()
+                self.epsilon[new_start].append(start)
+                self.epsilon[end].append(new_end)
+                if operator in ('?', '*'):
+                    self.epsilon[new_start].append(new_end)
+                if operator in ('*', '+'):
+                    self.epsilon[end].append(start)
+                start, end = new_start, new_end
+            atom_start, atom_end = None, None
+        return start, end
+
+    def _copy(self, atom_start, atom_end):
+        """Vuelve a construir el átomo entre atom_start y atom_end (para expandir {m,n})"""
+        saved = self.pos
+        self.pos = atom_start
+        fragment = self._atom()
+        self.pos = saved
+        return fragment
+
+    def _repeat(self, atom_start, atom_end, start, end, minimum, maximum):
+        if atom_start is None:
+            raise QuerySyntaxError("Una repetición {m,n} debe aplicarse directamente a una etiqueta o un grupo")
+        fragments = [(start, end)] + [self._copy(atom_start, atom_end) for _ in range(max(maximum, 1) - 1)]
+        new_start, new_end = self._state(), self._state()
+        if maximum == 0:
+            self.epsilon[new_start].append(new_end)
+            return new_start, new_end
+        self.epsilon[new_start].append(fragments[0][0])
+        if minimum == 0:
+            self.epsilon[new_start].append(new_end)
+        for i, (_, fragment_end) in enumerate(fragments):
+            if i + 1 >= minimum:
+                self.epsilon[fragment_end].append(new_end)
+            if i + 1 < len(fragments):
+                self.epsilon[fragment_end].append(fragments[i + 1][0])
+        return new_start, new_end
+
+    def _atom(self):
+        char = self._peek()
+        if char == '(':
+            self.pos += 1
+            fragment = self._alternative()
+            if self._peek() != ')':
+                raise QuerySyntaxError(f"Falta ')' en la posición {self.pos}")
+            self.pos += 1
+            return fragment
+        if char == ':':
+            match = re.compile(r":(\w+)").match(self.text, self.pos)
+            if not match:
+                raise QuerySyntaxError(f"Etiqueta inválida en la posición {self.pos}")
+            self.pos = match.end()
+            start, end = self._state(), self._state()
+            self.moves[start].append((match.group(1), end))
+            return start, end
+        raise QuerySyntaxError(f"Se esperaba una etiqueta o '(' en la posición {self.pos}")
+
+    def closure(self, states):
+        stack = list(states)
+        seen = set(states)
+        while stack:
+            for target in self.epsilon[stack.pop()]:
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        return frozenset(seen)
+
+    def is_accepting(self, states):
+        return self.accept in states
+
+    def steps(self, states):
+        """Transiciones (etiqueta, conjunto siguiente) desde un conjunto de estados"""
+        steps = self._steps.get(states)
+        if steps is None:
+            by_label = {}
+            for state in states:
+                for label, target in self.moves[state]:
+                    by_label.setdefault(label, set()).add(target)
+            steps = [(label, self.closure(targets)) for label, targets in by_label.items()]
+            self._steps[states] = steps
+        return steps
+
+
+class ReferenceEngine:
+    """
+    Motor de referencia en Python puro para las consultas ALL TRAILS de las plantillas.
+    Enumera, desde el nodo ancla, todos los caminos sin aristas repetidas que cumplen
+    la expresión, recorriendo en profundidad el producto grafo × autómata.
+    """
+
+    def __init__(self, graph, timeout_ms=None):
+        self.graph = graph
+        self.timeout_ms = timeout_ms
+
+    def prepare(self, query):
+        """Analiza la consulta y construye el autómata. Devuelve (ancla, autómata, variable)"""
+        match = QUERY_PATTERN.match(query.strip())
+        if not match:
+            raise QuerySyntaxError("Solo se admiten consultas MATCH (nodo)=[ALL TRAILS ?p <expresión>]=>(?y) RETURN ?p")
+        if match.group('ret') != match.group('path'):
+            raise QuerySyntaxError(f"La variable ?{match.group('ret')} no está definida")
+        return match.group('anchor').strip(), Automaton(match.group('rpq')), match.group('path')
+
+    def resolve(self, anchor, automaton):
+        """Traduce el ancla y las etiquetas del autómata a identificadores del grafo"""
+        labels = self.graph.labels
+        automaton.moves = [[(labels[label], target) for label, target in moves if label in labels]
+                           for moves in automaton.moves]
+        automaton._steps = {}
+        return self.graph.node_ids.get(anchor)
+
+    def trails(self, anchor, automaton, deadline=None):
+        """Genera cada camino como lista de (etiqueta, nodo destino) a partir del ancla"""
+        if anchor is None:
+            return
+        if automaton.is_accepting(automaton.start):
+            yield []
+        path = []
+        used = set()
+        steps = 0
+        stack = [self._expand(anchor, automaton.start, automaton)]
+        while stack:
+            for edge, label, target, states in stack[-1]:
+                if edge in used:
+                    continue
+                steps += 1
+                if deadline is not None and steps % TIMEOUT_CHECK_EVERY == 0 and time.perf_counter() > deadline:
+                    raise QueryTimeout()
+                used.add(edge)
+                path.append((edge, label, target))
+                if automaton.is_accepting(states):
+                    yield [(label, target) for _, label, target in path]
+                stack.append(self._expand(target, states, automaton))
+                break
+            else:
+                stack.pop()
+                if path:
+                    used.discard(path.pop()[0])
+
+    def _expand(self, node, states, automaton):
+        for label, next_states in automaton.steps(states):
+            for edge, target in self.graph.neighbors(node, label):
+                yield edge, label, target, next_states
+
+    def format_path(self, anchor, path):
+        names = self.graph.node_names
+        label_names = self.graph.label_names
+        return f"({names[anchor]})" + "".join(f"-[:{label_names[label]}]->({names[target]})" for label, target in path)
+
+
+class EngineHandler(BaseHTTPRequestHandler):
+    """
+    Endpoint /query compatible con mdb-server: la respuesta se envía en bloques
+    (chunked) con una línea por path, y en la salida estándar se escriben las mismas
+    líneas que mdb-server (Query received, Results, Parser/Optimizer/Execution
+    duration) que consume logParser. Si la consulta supera el timeout del motor, la
+    respuesta se cierra igualmente con TIMEOUT_LINE como última línea.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # La respuesta se escribe en varios bloques: sin esto Nagle y el ACK diferido suman ~40 ms
+    disable_nagle_algorithm = True
+    engine = None
+    log_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def log(self, *lines):
+        with self.log_lock:
+            sys.stdout.write("".join(f"{line}\n" for line in lines))
+            sys.stdout.flush()
+
+    def send_error_text(self, status, message):
+        body = f"{message}\n".encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        # Se registra tal como llegó: logParser la atribuye comparando el texto con el del cliente
+        query = self.rfile.read(length).decode('utf-8', errors='replace')
+        if self.path != '/query':
+            self.send_error_text(404, f"Ruta desconocida: {self.path}")
+            return
+        self.log("Query received:", query)
+
+        node_match = NODE_PATTERN.match(query.strip())
+        if node_match:
+            limit = int(node_match.group('limit')) if node_match.group('limit') else None
+            names = self.engine.graph.node_names[:limit]
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            body = (f"?{node_match.group('var')}\n" + "".join(f"({name})\n" for name in names)).encode('utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            self.log(f"Results: {len(names)}", "Parser duration: 0.000 ms",
+                     "Optimizer duration: 0.000 ms", "Execution duration: 0.000 ms")
+            return
+
+        start = time.perf_counter()
+        try:
+            anchor, automaton, variable = self.engine.prepare(query)
+        except QuerySyntaxError as e:
+            self.log(f"Query error: {e}")
+            self.send_error_text(400, f"Error de sintaxis: {e}")
+            return
+        parsed = time.perf_counter()
+        anchor_id = self.engine.resolve(anchor, automaton)
+        optimized = time.perf_counter()
+        deadline = optimized + self.engine.timeout_ms / 1000 if self.engine.timeout_ms else None
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        results = 0
+        buffer = [f"?{variable}\n"]
+        buffered = 0
+        try:
+            for path in self.engine.trails(anchor_id, automaton, deadline):
+                buffer.append(self.engine.format_path(anchor_id, path) + "\n")
+                results += 1
+                buffered += 1
+                if buffered >= 512:
+                    self.write_chunk("".join(buffer).encode('utf-8'))
+                    buffer, buffered = [], 0
+        except QueryTimeout:
+            # La respuesta se cierra con TIMEOUT_LINE: el cliente la registra como timeout y no
+            # como una conexión perdida, que lo haría esperar una posible caída del servidor
+            buffer.append(f"{TIMEOUT_LINE}\n")
+            self.write_chunk("".join(buffer).encode('utf-8'))
+            with self.log_lock:
+                sys.stdout.write(f"Query timeout: se superaron {self.engine.timeout_ms} ms tras {results} resultados\n")
+                sys.stdout.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            return
+        if buffer:
+            self.write_chunk("".join(buffer).encode('utf-8'))
+        finished = time.perf_counter()
+        # Las métricas se registran antes de cerrar la respuesta y bajo el mismo candado,
+        # para que el orden del log coincida con el orden en que terminan los clientes
+        with self.log_lock:
+            sys.stdout.write(f"Results: {results}\n"
+                             f"Parser duration: {(parsed - start) * 1000:.3f} ms\n"
+                             f"Optimizer duration: {(optimized - parsed) * 1000:.3f} ms\n"
+                             f"Execution duration: {(finished - optimized) * 1000:.3f} ms\n")
+            sys.stdout.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+
+def edges_file(path):
+    """Acepta edges.txt directamente o un directorio que lo contenga"""
+    if os.path.isdir(path):
+        return os.path.join(path, "edges.txt")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Motor de referencia en Python para consultas ALL TRAILS, compatible con el endpoint de mdb-server',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+
+  # Servir el grafo del scale factor 0.1 en el puerto por defecto
+  python referenceEngine.py MillenniumDB/data/ldbc/01/edges.txt
+
+  # Evaluar una consulta sin levantar el servidor
+  python referenceEngine.py MillenniumDB/data/ldbc/01 --query "MATCH (n1)=[ALL TRAILS ?p1 (:knows{1,3})]=>(?y) RETURN ?p1"
+        """
+    )
+    parser.add_argument('edges', type=str, help='Archivo edges.txt (origen,etiqueta,destino) o directorio que lo contiene')
+    parser.add_argument('--port', type=int, default=1234, help='Puerto HTTP (default: 1234)')
+    parser.add_argument('--timeout', type=int, default=35000, metavar='MS',
+                        help='Tiempo máximo de ejecución por consulta en milisegundos (default: 35000)')
+    parser.add_argument('--query', type=str, default=None,
+                        help='Evaluar esta consulta, imprimir los paths y salir')
+    args = parser.parse_args()
+
+    path = edges_file(args.edges)
+    if not os.path.exists(path):
+        print(f"❌ Error: No se encontró {path}")
+        sys.exit(1)
+
+    load_start = time.time()
+    engine = ReferenceEngine(Graph.load(path), timeout_ms=args.timeout)
+    print(f"Grafo cargado desde {path}: {len(engine.graph.node_names)} nodos, {engine.graph.edge_count} aristas, "
+          f"{len(engine.graph.labels)} etiquetas ({time.time() - load_start:.1f} s)", flush=True)
+
+    if args.query:
+        try:
+            anchor, automaton, variable = engine.prepare(args.query)
+        except QuerySyntaxError as e:
+            print(f"❌ Error de sintaxis: {e}")
+            sys.exit(1)
+        anchor_id = engine.resolve(anchor, automaton)
+        print(f"?{variable}")
+        count = 0
+        for path in engine.trails(anchor_id, automaton):
+            print(engine.format_path(anchor_id, path))
+            count += 1
+        print(f"Results: {count}")
+        sys.exit(0)
+
+    EngineHandler.engine = engine
+    server = ThreadingHTTPServer(('localhost', args.port), EngineHandler)
+    server.daemon_threads = True
+    print(f"Motor de referencia escuchando en http://localhost:{args.port}/query", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,178 @@
+import os
+import threading
+
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_KB = (os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096) // 1024
+
+# Métricas de recursos del servidor que el ejecutor agrega a cada resultado
+RESOURCE_KEYS = ['cpu_ms', 'rss_peak_delta_kb', 'minor_faults', 'major_faults', 'ctx_switches', 'read_bytes']
+
+RESOURCE_COLUMNS = ['CPU (ms)', 'Δ RSS Pico (KB)', 'Fallos de Página', 'Fallos Mayores', 'Cambios de Contexto',
+                    'Lectura Disco (KB)']
+
+
+def proc_available():
+    return os.path.exists("/proc/self/stat")
+
+
+def read_stat(pid):
+    """CPU (ticks), fallos de página y RSS (KB) desde /proc/<pid>/stat"""
+    with open(f"/proc/{pid}/stat", 'rb') as f:
+        data = f.read()
+    # El nombre del proceso va entre paréntesis y puede contener espacios
+    fields = data[data.rindex(b')') + 2:].split()
+    return {
+        'cpu_ticks': int(fields[11]) + int(fields[12]),
+        'minor_faults': int(fields[7]),
+        'major_faults': int(fields[9]),
+        'rss_kb': int(fields[21]) * PAGE_KB
+    }
+
+
+def read_context_switches(pid):
+    """Cambios de contexto voluntarios e involuntarios sumados sobre todos los hilos"""
+    total = 0
+    task_dir = f"/proc/{pid}/task"
+    for tid in os.listdir(task_dir):
+        try:
+            with open(os.path.join(task_dir, tid, "status"), 'r') as f:
+                for line in f:
+                    if line.startswith(('voluntary_ctxt_switches:', 'nonvoluntary_ctxt_switches:')):
+                        total += int(line.split()[1])
+        except OSError:
+            # El hilo terminó entre el listado y la lectura
+            continue
+    return total
+
+
+def read_io(pid):
+    """Bytes leídos del almacenamiento (read_bytes de /proc/<pid>/io); None si no hay permiso"""
+    try:
+        with open(f"/proc/{pid}/io", 'r') as f:
+            for line in f:
+                if line.startswith('read_bytes:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def read_snapshot(pid):
+    snapshot = read_stat(pid)
+    snapshot['ctx_switches'] = read_context_switches(pid)
+    snapshot['read_bytes'] = read_io(pid)
+    return snapshot
+
+
+class ResourceSampler:
+    """
+    Muestreo de los recursos del proceso del servidor durante cada consulta.
+
+    Al empezar y al terminar una consulta se toma una instantánea de /proc/<pid>/stat,
+    status (de cada hilo) e io, y la diferencia da el tiempo de CPU, los fallos de
+    página, los cambios de contexto y los bytes leídos. Mientras haya consultas en
+    curso, un hilo lee el RSS cada `interval` segundos para obtener el pico de memoria
+    sobre el RSS inicial.
+
+    Los contadores son del proceso completo: con varias consultas en vuelo, cada una
+    incluye también el consumo de las que se solaparon con ella.
+
+    pid_source es una función sin argumentos que devuelve el PID actual del servidor
+    (o None), para seguir al proceso tras un reinicio.
+    """
+
+    def __init__(self, pid_source, interval=0.005):
+        self.pid_source = pid_source
+        self.interval = interval
+        self._windows = {}
+        self._next_token = 0
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._active.wait()
+            if self._stopped.is_set():
+                return
+            with self._lock:
+                pids = {window['pid'] for window in self._windows.values()}
+            for pid in pids:
+                try:
+                    rss_kb = read_stat(pid)['rss_kb']
+                except (OSError, ValueError, IndexError):
+                    continue
+                with self._lock:
+                    for window in self._windows.values():
+                        if window['pid'] == pid and rss_kb > window['peak_kb']:
+                            window['peak_kb'] = rss_kb
+            self._stopped.wait(self.interval)
+
+    def begin(self):
+        """Registra el inicio de una consulta; devuelve un token para end() o None si no hay proceso"""
+        pid = self.pid_source()
+        if pid is None:
+            return None
+        try:
+            start = read_snapshot(pid)
+        except (OSError, ValueError, IndexError):
+            return None
+        with self._lock:
+            token = self._next_token
+            self._next_token += 1
+            self._windows[token] = {'pid': pid, 'start': start, 'peak_kb': start['rss_kb']}
+            self._active.set()
+        return token
+
+    def end(self, token):
+        """Diferencias de recursos desde begin(); vacío si el proceso cambió o ya no existe"""
+        if token is None:
+            return {}
+        with self._lock:
+            window = self._windows.pop(token)
+            if not self._windows:
+                self._active.clear()
+        try:
+            end = read_snapshot(window['pid'])
+        except (OSError, ValueError, IndexError):
+            return {}
+        if self.pid_source() != window['pid']:
+            return {}
+        start = window['start']
+        read_bytes = None
+        if start['read_bytes'] is not None and end['read_bytes'] is not None:
+            read_bytes = end['read_bytes'] - start['read_bytes']
+        return {
+            'cpu_ms': (end['cpu_ticks'] - start['cpu_ticks']) * 1000 / CLOCK_TICKS,
+            'rss_peak_delta_kb': max(window['peak_kb'], end['rss_kb']) - start['rss_kb'],
+            'minor_faults': end['minor_faults'] - start['minor_faults'],
+            'major_faults': end['major_faults'] - start['major_faults'],
+            'ctx_switches': end['ctx_switches'] - start['ctx_switches'],
+            'read_bytes': read_bytes
+        }
+
+    def stop(self):
+        self._stopped.set()
+        self._active.set()
+        self._thread.join(timeout=1)
+
+
+def resource_columns(outcomes):
+    """Promedio por ejecución de las métricas de recursos de una consulta"""
+    outcomes = [o for o in outcomes if o.get('cpu_ms') is not None]
+
+    def mean(key, scale=1):
+        values = [o[key] for o in outcomes if o.get(key) is not None]
+        return sum(values) / len(values) / scale if values else float('nan')
+
+    return {
+        'CPU (ms)': mean('cpu_ms'),
+        'Δ RSS Pico (KB)': mean('rss_peak_delta_kb'),
+        'Fallos de Página': mean('minor_faults'),
+        'Fallos Mayores': mean('major_faults'),
+        'Cambios de Contexto': mean('ctx_switches'),
+        'Lectura Disco (KB)': mean('read_bytes', 1024)
+    }
@@ -0,0 +1,139 @@
+import os
+import math
+
+import pandas as pd
+import xlsxwriter
+
+try:
+    import pyarrow  # noqa: F401 (motor de pandas para Parquet)
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+class ResultStore:
+    """
+    Almacén columnar de los resultados de una carpeta: cada tabla se guarda como
+    <carpeta>/<nombre>.parquet, con columnas tipadas y sin límite de filas, y se
+    vuelve a leer sin pasar por Excel. Las tablas que en los xlsx se reparten en
+    varias hojas (una por AQ) se guardan enteras, con la columna del AQ.
+
+    Requiere pyarrow; sin él, available es False y los resultados quedan solo en
+    los xlsx.
+    """
+
+    available = PARQUET_AVAILABLE
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def path(self, name):
+        return os.path.join(self.folder, f"{name}.parquet")
+
+    def exists(self, name):
+        return self.available and os.path.exists(self.path(name))
+
+    def write(self, name, frame):
+        if not self.available:
+            return None
+        os.makedirs(self.folder, exist_ok=True)
+        # Parquet exige un tipo por columna: las de texto con valores de varios tipos se guardan como texto
+        mixed = [column for column in frame.columns if frame[column].dtype == object
+                 and frame[column].dropna().map(type).nunique() > 1]
+        if mixed:
+            frame = frame.assign(**{column: frame[column].map(str, na_action='ignore') for column in mixed})
+        frame.to_parquet(self.path(name), index=False)
+        return self.path(name)
+
+    def read(self, name, columns=None):
+        return pd.read_parquet(self.path(name), columns=columns)
+
+
+def read_ranking(folder, name, sheet):
+    """
+    Lee una hoja de un ranking (abstract_queries_rank o template_queries_rank) de
+    folder: de la tabla Parquet si existe, o si no del xlsx. En el ranking de
+    plantillas la hoja es el código del AQ (Q<n>), que en la tabla es la columna
+    'AQ Code'. Lanza FileNotFoundError si no existe ninguno de los dos.
+    """
+    store = ResultStore(folder)
+    if store.exists(name):
+        frame = store.read(name)
+        if name == "template_queries_rank":
+            frame = frame[frame['AQ Code'] == sheet].drop(columns=['AQ Code', 'AQ']).reset_index(drop=True)
+        return frame
+    xlsx_path = os.path.join(folder, f"{name}.xlsx")
+    if not os.path.exists(xlsx_path):
+        raise FileNotFoundError(xlsx_path)
+    return pd.read_excel(xlsx_path, sheet_name=sheet)
+
+
+def ranking_exists(folder, name):
+    return ResultStore(folder).exists(name) or os.path.exists(os.path.join(folder, f"{name}.xlsx"))
+
+
+class ExcelExport:
+    """
+    Libro xlsx escrito con xlsxwriter en modo constant_memory: cada fila se vuelca
+    al disco en cuanto se pasa a la siguiente, así que la memoria no depende del
+    tamaño de las hojas. Por eso las filas de cada hoja deben escribirse en orden
+    (primero la tabla y después las filas de resumen que van debajo).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        self.sheets = {}
+        self.header_format = self.workbook.add_format({'bold': True, 'border': 1, 'align': 'center',
+                                                       'valign': 'top'})
+        self.bold_format = self.workbook.add_format({'bold': True})
+        self.num_format = self.workbook.add_format({'num_format': '0'})
+        self.bold_num_format = self.workbook.add_format({'bold': True, 'num_format': '0'})
+
+    @staticmethod
+    def cell(value):
+        """
+        Valor escribible de una celda: None para las vacías (NaN o None) y 'inf' o
+        '-inf' para los infinitos, como los escribe pandas
+        """
+        if hasattr(value, 'item'):
+            value = value.item()
+        if value is None:
+            return None
+        if isinstance(value, float):
+            if math.isnan(value):
+                return None
+            if math.isinf(value):
+                return 'inf' if value > 0 else '-inf'
+        return value
+
+    def write_frame(self, sheet_name, frame, number_columns=()):
+        """
+        Escribe el DataFrame (encabezado y filas) en una hoja nueva; las columnas de
+        number_columns se muestran sin decimales. Devuelve la hoja
+        """
+        worksheet = self.workbook.add_worksheet(sheet_name)
+        self.sheets[sheet_name] = worksheet
+        for col, column in enumerate(frame.columns):
+            if column in number_columns:
+                worksheet.set_column(col, col, None, self.num_format)
+        worksheet.write_row(0, 0, [str(column) for column in frame.columns], self.header_format)
+        for row, values in enumerate(frame.itertuples(index=False, name=None), start=1):
+            for col, value in enumerate(values):
+                value = self.cell(value)
+                if isinstance(value, str):
+                    # Sin interpretar fórmulas ni URLs dentro del texto de las consultas
+                    worksheet.write_string(row, col, value)
+                elif value is not None:
+                    worksheet.write(row, col, value)
+        return worksheet
+
+    def close(self):
+        self.workbook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
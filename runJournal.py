@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import threading
+
+from queryExecutor import outcome_key
+
+
+# Estados que se consideran definitivos: al reanudar no se vuelven a ejecutar
+FINAL_STATUSES = (200, 'timeout')
+
+
+class RunJournal:
+    """
+    Journal de solo anexado de una ejecución del analizador (JSON Lines).
+
+    Cada vez que se lanza el pool se escribe un registro 'segment' con la posición
+    (en bytes) de cada log de mdb-server en ese momento, y cada consulta terminada
+    se anexa como un registro 'outcome' con sus mediciones del cliente. Los tiempos
+    del servidor quedan en los logs, que con --resume se continúan en lugar de
+    truncarse, así que un segmento del journal más su tramo de log bastan para
+    reconstruir todas las mediciones tras una interrupción.
+    """
+
+    def __init__(self, path="run_journal.jsonl"):
+        self.path = path
+        self.segments = []
+        self.outcomes = []
+        self._file = None
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def load(self):
+        """Lee el journal existente; una última línea incompleta (corte abrupto) se ignora"""
+        self.segments = []
+        self.outcomes = []
+        if not os.path.exists(self.path):
+            return self
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get('type') == 'segment':
+                    self.segments.append(record)
+                elif record.get('type') == 'outcome':
+                    self.outcomes.append(record)
+        return self
+
+    def completed(self):
+        """
+        Pares (consulta, repetición) medidos con un estado definitivo; con un modo de
+        medición explícito, ternas (consulta, repetición, 'cold'/'warm'). La consulta es
+        su identificador (ver QueryCatalog)
+        """
+        return {(outcome_key(o), o['repetition']) if o.get('state') is None
+                else (outcome_key(o), o['repetition'], o['state'])
+                for o in self.outcomes if o.get('phase') == 'measure' and o.get('status') in FINAL_STATUSES}
+
+    def segment_outcomes(self, segment, log_file):
+        return [o for o in self.outcomes if o['segment'] == segment and o['log'] == log_file]
+
+    def log_ranges(self, log_file):
+        """Tramos (segmento, inicio, fin) del log que corresponden a cada segmento; fin=None es hasta el final"""
+        starts = [(s['segment'], s['logs'][log_file]) for s in self.segments if log_file in s['logs']]
+        ranges = []
+        for i, (segment, start) in enumerate(starts):
+            end = starts[i + 1][1] if i + 1 < len(starts) else None
+            ranges.append((segment, start, end))
+        return ranges
+
+    def open(self, reset=False):
+        self._file = open(self.path, 'w' if reset else 'a', encoding='utf-8')
+        if reset:
+            self.segments = []
+            self.outcomes = []
+        return self
+
+    def _append(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def start_segment(self, log_files, config=None):
+        """Registra el inicio de un tramo de ejecución y la posición actual de cada log"""
+        segment = {
+            'type': 'segment',
+            'segment': len(self.segments),
+            'started': time.time(),
+            'logs': {log: os.path.getsize(log) if os.path.exists(log) else 0 for log in log_files},
+            'config': config or {}
+        }
+        with self._lock:
+            self._append(segment)
+            self.segments.append(segment)
+        return segment['segment']
+
+    def record(self, outcome, log_file):
+        """Anexa el resultado de una consulta del segmento actual"""
+        record = dict(outcome, type='outcome', segment=len(self.segments) - 1, log=log_file)
+        with self._lock:
+            self._append(record)
+            self.outcomes.append(record)
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,45 @@
+import os
+
+
+# Entradas de solo lectura que todas las ejecuciones comparten: la base de datos, los
+# edges.txt y el binario del servidor
+SHARED_ENTRIES = ['MillenniumDB']
+
+# Subcarpetas de rankings/ que se escriben en cada ejecución y no deben compartirse
+PRIVATE_RANKINGS = ['rankingsNodes']
+
+
+def prepare_workspace(workspace, source_dir):
+    """
+    Crea el directorio de trabajo de una ejecución. El analizador escribe result.txt,
+    query_info.json, nodos.txt, queries_output.txt, rankingsNodes/, el journal y los
+    resultados en el directorio actual, así que dos ejecuciones solo pueden convivir
+    si cada una trabaja en su propio directorio.
+
+    Las entradas compartidas de source_dir se enlazan (symlink) en el workspace. De
+    rankings/ se enlazan las carpetas por scale factor, que se leen con
+    --use-rankings, pero los archivos que el análisis copia a rankings/ quedan dentro
+    del workspace. Devuelve la ruta absoluta del workspace.
+    """
+    workspace = os.path.abspath(workspace)
+    source_dir = os.path.abspath(source_dir)
+    os.makedirs(workspace, exist_ok=True)
+    if workspace == source_dir:
+        return workspace
+
+    def link(source, target):
+        if os.path.exists(source) and not os.path.lexists(target):
+            os.symlink(source, target, target_is_directory=os.path.isdir(source))
+
+    for name in SHARED_ENTRIES:
+        link(os.path.join(source_dir, name), os.path.join(workspace, name))
+
+    rankings_source = os.path.join(source_dir, "rankings")
+    if os.path.isdir(rankings_source):
+        rankings_target = os.path.join(workspace, "rankings")
+        os.makedirs(rankings_target, exist_ok=True)
+        for name in os.listdir(rankings_source):
+            source = os.path.join(rankings_source, name)
+            if os.path.isdir(source) and name not in PRIVATE_RANKINGS:
+                link(source, os.path.join(rankings_target, name))
+    return workspace
@@ -0,0 +1,218 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+from datetime import datetime
+
+import pandas as pd
+
+from resultStore import ResultStore
+
+
+SCALE_FACTORS = ['01', '03', '1', '3']
+
+# Opciones de pathAnalizer.py que el barrido fija por cada scale factor
+RESERVED_OPTIONS = ['--workspace', '--db-path', '--base-port', '--use-existing', '--result-file', '--use-rankings',
+                    '--resume']
+
+
+class ScaleSweep:
+    """
+    Analiza varios scale factors a la vez. Cada uno se ejecuta como un proceso
+    pathAnalizer.py --calculate-new independiente, con su propio workspace
+    (<root>/sf<SCALE>), su propio servidor y un rango de puertos propio. Al terminar
+    todos, se comparan sus rankings en scale_comparison.xlsx.
+    """
+
+    def __init__(self, scales, root=None, base_port=1234, port_stride=16, analyzer_args=None):
+        self.scales = scales
+        self.root = os.path.abspath(root or os.path.join("sweeps", datetime.now().strftime("%Y%m%d_%H%M%S")))
+        self.base_port = base_port
+        self.port_stride = port_stride
+        self.analyzer_args = analyzer_args or []
+        self.analyzer = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pathAnalizer.py")
+        self.runs = []
+
+    @staticmethod
+    def scale_available(scale):
+        """Hay base de datos o edges.txt para el scale factor (este último basta con --engine reference)"""
+        return (os.path.isdir(os.path.join("MillenniumDB", "data", "db", scale))
+                or os.path.exists(os.path.join("MillenniumDB", "data", "ldbc", scale, "edges.txt")))
+
+    def launch(self, scale, port):
+        workspace = os.path.join(self.root, f"sf{scale}")
+        os.makedirs(workspace, exist_ok=True)
+        log_path = os.path.join(workspace, "analyzer.log")
+        command = [sys.executable, self.analyzer, '--calculate-new', '--non-interactive',
+                   '--workspace', workspace,
+                   '--db-path', os.path.join("MillenniumDB", "data", "db", scale),
+                   '--base-port', str(port)] + self.analyzer_args
+        log = open(log_path, 'w', encoding='utf-8')
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT)
+        return {'scale': scale, 'port': port, 'workspace': workspace, 'log': log, 'log_path': log_path,
+                'process': process, 'start': time.time(), 'end': None}
+
+    def run(self):
+        scales = [scale for scale in self.scales if self.scale_available(scale)]
+        for scale in self.scales:
+            if scale not in scales:
+                print(f"⚠️  Se omite el scale factor {scale}: no existe MillenniumDB/data/db/{scale} "
+                      f"ni MillenniumDB/data/ldbc/{scale}/edges.txt")
+        if not scales:
+            print("❌ Error: Ningún scale factor tiene datos disponibles")
+            return False
+
+        print(f"🚀 Analizando los scale factors {', '.join(scales)} en paralelo")
+        print(f"📂 Workspaces en {self.root}")
+        for i, scale in enumerate(scales):
+            run = self.launch(scale, self.base_port + i * self.port_stride)
+            self.runs.append(run)
+            print(f"   SF {scale}: puerto {run['port']}, salida en {run['log_path']}")
+
+        try:
+            pending = list(self.runs)
+            while pending:
+                for run in list(pending):
+                    code = run['process'].poll()
+                    if code is None:
+                        continue
+                    run['end'] = time.time()
+                    run['log'].close()
+                    pending.remove(run)
+                    status = "✅" if code == 0 else f"❌ código {code}"
+                    print(f"   SF {run['scale']} terminado en {run['end'] - run['start']:.1f} s {status}")
+                time.sleep(1)
+        except KeyboardInterrupt:
+            # Cada pathAnalizer.py recibe también el Ctrl+C y detiene su servidor
+            print("\n🛑 Barrido interrumpido; esperando a que terminen los análisis en curso...")
+            for run in self.runs:
+                run['process'].wait()
+                run['log'].close()
+            return False
+
+        return self.save_comparison()
+
+    @staticmethod
+    def read_ranking(workspace, scale, name):
+        """
+        Ranking de un scale factor: la tabla Parquet completa (el de plantillas, con
+        las de todos los AQ y su 'AQ Code') o, si no existe, la primera hoja del xlsx
+        """
+        folder = os.path.join(workspace, f"resultados_analizer{scale}")
+        store = ResultStore(folder)
+        if store.exists(name):
+            return store.read(name)
+        path = os.path.join(folder, f"{name}.xlsx")
+        if not os.path.exists(path):
+            return None
+        ranking = pd.read_excel(path)
+        # Se descartan las filas de resumen que van al final del ranking de plantillas
+        ranking['Ranking'] = pd.to_numeric(ranking['Ranking'], errors='coerce')
+        return ranking.dropna(subset=['Ranking']).astype({'Ranking': int})
+
+    def compare(self, name, key):
+        """
+        Ranking y tiempo promedio de cada elemento (AQ o plantilla) por scale factor,
+        con el desplazamiento máximo de su posición entre escalas
+        """
+        merged = None
+        scales = []
+        for run in self.runs:
+            ranking = self.read_ranking(run['workspace'], run['scale'], name)
+            if ranking is None or ranking.empty:
+                continue
+            scale = run['scale']
+            scales.append(scale)
+            columns = {'Ranking': f'Ranking SF{scale}', 'Tiempo Promedio (ms)': f'Tiempo SF{scale} (ms)'}
+            # Una plantilla puede estar en más de un AQ: se distingue por su AQ si el ranking lo trae
+            keys = [key] + [column for column in ['AQ Code', 'AQ'] if column != key and column in ranking.columns]
+            frame = ranking[keys + list(columns)].rename(columns=columns)
+            merged = frame if merged is None else merged.merge(frame, on=keys, how='outer')
+        if merged is None:
+            return None, scales
+        rank_cols = [f'Ranking SF{scale}' for scale in scales]
+        if len(scales) > 1:
+            merged['Desplazamiento Máx'] = merged[rank_cols].max(axis=1) - merged[rank_cols].min(axis=1)
+            first, last = scales[0], scales[-1]
+            merged[f'Razón Tiempo SF{last}/SF{first}'] = merged[f'Tiempo SF{last} (ms)'] / merged[f'Tiempo SF{first} (ms)']
+        # Las plantillas se ordenan por su ranking dentro de cada AQ
+        order = (['AQ Code'] if key != 'AQ Code' and 'AQ Code' in merged.columns else []) + rank_cols[:1]
+        return merged.sort_values(order), scales
+
+    def save_comparison(self):
+        summary = [{
+            'Scale Factor': run['scale'],
+            'Puerto': run['port'],
+            'Código de Salida': run['process'].returncode,
+            'Duración (s)': run['end'] - run['start'],
+            'Workspace': run['workspace']
+        } for run in self.runs]
+
+        aq_frame, aq_scales = self.compare("abstract_queries_rank", 'AQ Code')
+        template_frame, _ = self.compare("template_queries_rank", 'Template Query')
+
+        report_path = os.path.join(self.root, "scale_comparison.xlsx")
+        with pd.ExcelWriter(report_path, engine='xlsxwriter') as writer:
+            pd.DataFrame(summary).to_excel(writer, sheet_name='Ejecuciones', index=False)
+            if aq_frame is not None:
+                aq_frame.to_excel(writer, sheet_name='AQ por Escala', index=False)
+                if len(aq_scales) > 1:
+                    # Correlación de Spearman entre los rankings de AQ de cada par de escalas
+                    ranks = aq_frame[[f'Ranking SF{scale}' for scale in aq_scales]]
+                    ranks.corr(method='spearman').to_excel(writer, sheet_name='Correlación Rankings')
+            if template_frame is not None:
+                template_frame.to_excel(writer, sheet_name='Plantillas por Escala', index=False)
+
+        failed = [run['scale'] for run in self.runs if run['process'].returncode != 0]
+        print(f"\n📊 Comparación entre escalas guardada en {report_path}")
+        if failed:
+            print(f"⚠️  Fallaron los scale factors {', '.join(failed)}; revise su analyzer.log")
+        return not failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Ejecuta pathAnalizer.py sobre varios scale factors en paralelo y compara sus rankings',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Las opciones no reconocidas se pasan a cada pathAnalizer.py.
+
+Ejemplos de uso:
+
+  # Los cuatro scale factors, 3 consultas por plantilla
+  python scaleSweep.py --rq 3
+
+  # Solo 01 y 03 con el motor de referencia y 2 repeticiones
+  python scaleSweep.py --scales 01,03 --engine reference --repetitions 2
+        """
+    )
+
+    parser.add_argument('--scales', type=str, default=','.join(SCALE_FACTORS),
+                        help=f'Scale factors a analizar, separados por comas (default: {",".join(SCALE_FACTORS)})')
+    parser.add_argument('--sweep-dir', type=str, default=None, metavar='DIR',
+                        help='Carpeta de los workspaces y del reporte (default: sweeps/<fecha_hora>)')
+    parser.add_argument('--base-port', type=int, default=1234,
+                        help='Puerto del primer scale factor (default: 1234)')
+    parser.add_argument('--port-stride', type=int, default=16,
+                        help='Separación entre los puertos base de cada scale factor; debe cubrir --servers (default: 16)')
+
+    args, analyzer_args = parser.parse_known_args()
+
+    scales = [scale.strip() for scale in args.scales.split(',') if scale.strip()]
+    invalid = [scale for scale in scales if scale not in SCALE_FACTORS]
+    if invalid or not scales:
+        print(f"❌ Error: Scale factors no válidos: {', '.join(invalid) or args.scales} "
+              f"(válidos: {', '.join(SCALE_FACTORS)})")
+        sys.exit(1)
+    reserved = [arg for arg in analyzer_args if arg.split('=')[0] in RESERVED_OPTIONS]
+    if reserved:
+        print(f"❌ Error: {', '.join(reserved)} lo fija el barrido para cada scale factor")
+        sys.exit(1)
+    if args.port_stride < 1:
+        print("❌ Error: --port-stride debe ser mayor que 0")
+        sys.exit(1)
+
+    sweep = ScaleSweep(scales, root=args.sweep_dir, base_port=args.base_port, port_stride=args.port_stride,
+                       analyzer_args=analyzer_args)
+    sys.exit(0 if sweep.run() else 1)
@@ -0,0 +1,182 @@
+import os
+import time
+import threading
+import subprocess
+import http.client
+
+from logParser import SERVER_RESTART_MARKER
+
+
+# Consulta trivial usada para comprobar que el servidor ya acepta consultas
+PROBE_QUERY = "MATCH (?x) RETURN ?x LIMIT 1"
+
+
+def evict_page_cache(path):
+    """
+    Pide al kernel que descarte de la caché de páginas los archivos de la base de datos
+    (posix_fadvise DONTNEED). Solo se descartan páginas limpias y no requiere permisos
+    especiales, pero no está disponible en todos los sistemas.
+    Devuelve (archivos procesados, archivos con error) o None si no está soportado.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return None
+    if os.path.isdir(path):
+        files = [os.path.join(root, name) for root, _, names in os.walk(path) for name in names]
+    else:
+        files = [path]
+    evicted, failed = 0, 0
+    for file_path in files:
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except OSError:
+            failed += 1
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            evicted += 1
+        except OSError:
+            failed += 1
+        finally:
+            os.close(fd)
+    return evicted, failed
+
+
+class MdbServer:
+    """
+    Ciclo de vida de una instancia de mdb-server: arranque con sondeo de disponibilidad,
+    detección de caídas durante la ejecución y reinicio automático sobre el mismo log.
+
+    server_bin puede ser la ruta del ejecutable o una lista con el comando completo
+    (por ejemplo, el motor de referencia: [python, referenceEngine.py]).
+    """
+
+    def __init__(self, server_bin, db_path, port=1234, log_file="result.txt", timeout_ms=35000,
+                 startup_timeout=1800):
+        self.server_bin = server_bin
+        self.db_path = db_path
+        self.port = port
+        self.log_file = log_file
+        self.timeout_ms = timeout_ms
+        self.startup_timeout = startup_timeout
+        self.process = None
+        # Reinicios por caídas (ensure_running) y reinicios planificados (mediciones en frío)
+        self.restarts = 0
+        self.planned_restarts = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://localhost:{self.port}/query"
+
+    def command(self):
+        command = list(self.server_bin) if isinstance(self.server_bin, (list, tuple)) else [self.server_bin]
+        command += [self.db_path, "--timeout", str(self.timeout_ms)]
+        if self.port != 1234:
+            command += ["--port", str(self.port)]
+        return command
+
+    def start(self, append=False):
+        """
+        Lanza el proceso. Con append=True (reinicios y ejecuciones reanudadas) se
+        conserva el log anterior y se deja una marca para que el parser descarte las
+        consultas que quedaron abiertas
+        """
+        with open(self.log_file, "a" if append else "w") as output_file:
+            if append:
+                output_file.write(f"\n{SERVER_RESTART_MARKER}\n")
+                output_file.flush()
+            self.process = subprocess.Popen(
+                self.command(),
+                stdout=output_file,
+                stderr=output_file
+            )
+        return self.process
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def probe(self):
+        """Envía la consulta de sondeo; cualquier respuesta HTTP indica que el servidor está listo"""
+        conn = http.client.HTTPConnection("localhost", self.port, timeout=5)
+        try:
+            body = PROBE_QUERY.encode('utf-8')
+            conn.request('POST', '/query', body=body,
+                         headers={'Content-Type': 'application/x-www-form-urlencoded'})
+            conn.getresponse().read()
+            return True
+        except (OSError, http.client.HTTPException):
+            return False
+        finally:
+            conn.close()
+
+    def wait_until_ready(self, initial_delay=0.1, max_delay=5.0):
+        """
+        Sondea el servidor con backoff exponencial hasta que responde, el proceso
+        termina o se supera startup_timeout. Devuelve True si quedó listo.
+        """
+        deadline = time.time() + self.startup_timeout
+        delay = initial_delay
+        while time.time() < deadline:
+            if not self.is_alive():
+                return False
+            if self.probe():
+                return True
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
+        return False
+
+    def restart(self, evict=False, crash=False):
+        """
+        Reinicia el servidor sobre el mismo log. Con evict=True, mientras el proceso
+        está detenido se descartan además los archivos de la base de datos de la caché
+        de páginas, para que el siguiente acceso sea realmente en frío.
+
+        Solo los reinicios tras una caída (crash=True) cuentan en `restarts`, que el
+        ejecutor compara para decidir si una consulta se vio afectada por la caída; los
+        planificados (por ejemplo, antes de un tramo en frío) van a `planned_restarts`
+        """
+        self.stop()
+        if evict:
+            evict_page_cache(self.db_path)
+        self.start(append=True)
+        ready = self.wait_until_ready()
+        # Se incrementa al final para que las consultas enviadas durante el reinicio
+        # también se consideren afectadas por la caída
+        if crash:
+            self.restarts += 1
+        else:
+            self.planned_restarts += 1
+        return ready
+
+    def ensure_running(self, grace=1.0):
+        """
+        Comprueba si el servidor sigue vivo y lo reinicia si se cayó. El socket puede
+        cerrarse antes de que el proceso termine, por eso se espera hasta `grace`
+        segundos antes de darlo por vivo. Es seguro llamarlo desde varios hilos: solo
+        el primero que detecta la caída reinicia el proceso.
+        Devuelve True si hubo que reiniciarlo.
+        """
+        with self._lock:
+            if self.is_alive():
+                try:
+                    self.process.wait(timeout=grace)
+                except subprocess.TimeoutExpired:
+                    return False
+            print(f"\n💥 mdb-server (puerto {self.port}) se cayó con código {self.process.poll()}. Reiniciando...")
+            if self.restart(crash=True):
+                print(f"🟢 mdb-server (puerto {self.port}) reiniciado")
+            else:
+                print(f"❌ No se pudo reiniciar mdb-server (puerto {self.port}). Revise {self.log_file}")
+            return True
+
+    def stop(self):
+        """Termina el proceso si sigue activo. Devuelve True si estaba corriendo"""
+        if not self.is_alive():
+            return False
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        return True
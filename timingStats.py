@@ -0,0 +1,163 @@
+import math
+import statistics
+
+
+# Cuantiles t de Student de dos colas al 95% por grados de libertad (1..30); más allá se usa la normal
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def t_quantile_95(degrees_of_freedom):
+    if degrees_of_freedom < 1:
+        return float('inf')
+    if degrees_of_freedom <= len(T_95):
+        return T_95[degrees_of_freedom - 1]
+    return 1.96
+
+
+def relative_ci(samples):
+    """
+    Semiancho relativo del intervalo de confianza al 95% de la media
+    (t * s / sqrt(n) / media). Devuelve inf con menos de dos muestras.
+    """
+    n = len(samples)
+    if n < 2:
+        return float('inf')
+    mean = statistics.mean(samples)
+    if mean <= 0:
+        return 0.0 if statistics.stdev(samples) == 0 else float('inf')
+    return t_quantile_95(n - 1) * statistics.stdev(samples) / math.sqrt(n) / mean
+
+
+def percentile(sorted_samples, q):
+    """Percentil q (0-100) por rango más cercano sobre una lista ya ordenada; NaN si está vacía"""
+    if not sorted_samples:
+        return float('nan')
+    rank = max(1, math.ceil(q / 100 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+class LatencyHistogram:
+    """
+    Histograma de latencias de rango dinámico alto (al estilo HdrHistogram): los
+    valores se guardan en microsegundos en cubetas log-lineales con
+    `significant_figures` cifras significativas de precisión, así que el tamaño no
+    depende de la cantidad de muestras. Dos histogramas se combinan sumando sus
+    cubetas, lo que permite agregar consultas en plantillas y plantillas en AQ.
+    """
+
+    def __init__(self, significant_figures=3):
+        self.significant_figures = significant_figures
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_figures))
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count >> 1
+        self.counts = {}
+        self.total = 0
+        self.min_us = None
+        self.max_us = None
+
+    def _index(self, value):
+        if value < self.sub_bucket_count:
+            return value
+        bucket = value.bit_length() - self.sub_bucket_bits
+        return bucket * self.sub_bucket_half + (value >> bucket)
+
+    def _highest_equivalent(self, index):
+        if index < self.sub_bucket_count:
+            return index
+        bucket = index // self.sub_bucket_half - 1
+        sub_bucket = index - bucket * self.sub_bucket_half
+        return ((sub_bucket + 1) << bucket) - 1
+
+    def record(self, value_ms, count=1):
+        value = max(0, int(round(value_ms * 1000)))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+        self.max_us = value if self.max_us is None else max(self.max_us, value)
+
+    def merge(self, other):
+        """Suma las cubetas de otro histograma con la misma precisión"""
+        if other.significant_figures != self.significant_figures:
+            raise ValueError("No se pueden combinar histogramas con distinta precisión")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        if other.total:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+            self.max_us = other.max_us if self.max_us is None else max(self.max_us, other.max_us)
+        return self
+
+    @classmethod
+    def merged(cls, histograms, significant_figures=3):
+        result = cls(significant_figures)
+        for histogram in histograms:
+            result.merge(histogram)
+        return result
+
+    def percentile(self, q):
+        """Valor (ms) bajo el cual queda el q% de las muestras; NaN si el histograma está vacío"""
+        if not self.total:
+            return float('nan')
+        target = max(1, math.ceil(q / 100 * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    @property
+    def max_ms(self):
+        return self.max_us / 1000 if self.total else float('nan')
+
+    def __len__(self):
+        return self.total
+
+
+HISTOGRAM_PERCENTILES = [50, 90, 99, 99.9]
+PERCENTILE_COLUMNS = [f"p{q:g} (ms)" for q in HISTOGRAM_PERCENTILES] + ['Máximo (ms)']
+
+
+def percentile_columns(histogram):
+    """Columnas p50/p90/p99/p99.9 y máximo de un histograma, para los reportes"""
+    columns = {f"p{q:g} (ms)": histogram.percentile(q) for q in HISTOGRAM_PERCENTILES}
+    columns['Máximo (ms)'] = histogram.max_ms
+    return columns
+
+
+STATE_COLUMNS = ['Tiempo Frío (ms)', 'Tiempo Caliente (ms)', 'Razón Frío/Caliente']
+
+
+def state_columns(cold_times, warm_times):
+    """
+    Tiempos medios en frío y en caliente, y su razón cuando hay ambos: una razón alta
+    indica que la consulta depende de la E/S (o de estructuras que se cargan al primer uso)
+    """
+    columns = {}
+    if cold_times:
+        columns['Tiempo Frío (ms)'] = statistics.mean(cold_times)
+    if warm_times:
+        columns['Tiempo Caliente (ms)'] = statistics.mean(warm_times)
+    if cold_times and warm_times:
+        warm = columns['Tiempo Caliente (ms)']
+        columns['Razón Frío/Caliente'] = columns['Tiempo Frío (ms)'] / warm if warm > 0 else float('nan')
+    return columns
+
+
+# Componentes del tiempo del servidor (campos del registro de mediciones) y sus columnas en los reportes
+PHASES = [('parser_ms', 'Parser'), ('optimizer_ms', 'Optimizador'), ('execution_ms', 'Ejecución Plan')]
+PHASE_COLUMNS = [f"{name} (ms)" for _, name in PHASES]
+PHASE_SHARE_COLUMNS = [f"{name} (%)" for _, name in PHASES]
+
+
+def phase_columns(records):
+    """Tiempo medio de cada componente (parser, optimizador y ejecución del plan) en las ejecuciones de una consulta"""
+    columns = {}
+    for (key, _), column in zip(PHASES, PHASE_COLUMNS):
+        values = [r[key] for r in records if r.get(key) is not None]
+        columns[column] = statistics.mean(values) if values else float('nan')
+    return columns
+